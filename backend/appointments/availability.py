@@ -0,0 +1,132 @@
+import hashlib
+import time
+from datetime import timedelta
+
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from doctors.models import DoctorProfile
+from .models import Appointment
+
+SLOTS = [value for value, _ in Appointment.TIME_SLOT_CHOICES]
+ALL_SLOTS = (1 << len(SLOTS)) - 1
+# Hex digits per day in the compact form
+DAY_DIGITS = (len(SLOTS) + 3) // 4
+BLOCKING_STATUSES = ('confirmed', 'pending')
+# Same horizon as Appointment.clean
+BOOKING_HORIZON_DAYS = 60
+MAX_RANGE_DAYS = 60
+CACHE_TIMEOUT = 3600
+
+
+def _month(day):
+    return day.strftime('%Y-%m')
+
+
+def _months(start, end):
+    months, day = [], start.replace(day=1)
+    while day <= end:
+        months.append(_month(day))
+        day = (day + timedelta(days=32)).replace(day=1)
+    return months
+
+
+def _version_keys(doctor_ids, months):
+    """Cache version keys covering a query; one per (doctor, month) plus the doctor's profile"""
+    owners = ['all'] if doctor_ids is None else sorted(doctor_ids)
+    return [f'availability:{owner}:{month}' for owner in owners for month in months + ['profile']]
+
+
+def _versions(keys):
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def invalidate_availability(doctor_id, day=None):
+    """Orphan cached availability for a doctor's month (or profile) once the transaction commits"""
+    part = _month(day) if day is not None else 'profile'
+    keys = [f'availability:{doctor_id}:{part}', f'availability:all:{part}']
+
+    def bump():
+        version = time.time_ns()
+        cache.set_many({key: version for key in keys}, timeout=None)
+
+    transaction.on_commit(bump)
+
+
+def slot_masks(start, end, doctor_ids=None):
+    """{doctor id: [free slot bitmask per day from start to end]}.
+
+    Bit n of a mask is set when SLOTS[n] is free. A day is 0 when it is in
+    the past, beyond the booking horizon or not one of the doctor's
+    weekdays. Two queries whatever the range: the doctors' weekdays and the
+    booked times grouped by doctor and day.
+    """
+    today = timezone.now().date()
+    horizon = today + timedelta(days=BOOKING_HORIZON_DAYS)
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+    doctors = DoctorProfile.objects.all()
+    if doctor_ids is not None:
+        doctors = doctors.filter(id__in=doctor_ids)
+    weekdays = dict(doctors.values_list('id', 'availability_mask'))
+
+    booked = Appointment.objects.filter(
+        date__range=(max(start, today), min(end, horizon)), status__in=BLOCKING_STATUSES,
+    )
+    if doctor_ids is not None:
+        booked = booked.filter(doctor_id__in=doctor_ids)
+    taken = {}
+    for row in booked.values('doctor_id', 'date').annotate(times=ArrayAgg('time')).order_by():
+        mask = 0
+        for value in row['times']:
+            if value in SLOTS:
+                mask |= 1 << SLOTS.index(value)
+        taken[(row['doctor_id'], row['date'])] = mask
+
+    masks = {}
+    for pk, working_days in weekdays.items():
+        masks[pk] = [
+            ALL_SLOTS & ~taken.get((pk, day), 0)
+            if today <= day <= horizon and working_days & (1 << day.weekday()) else 0
+            for day in days
+        ]
+    return masks
+
+
+def availability(start, end, doctor_ids=None):
+    """Cached month-range availability as returned by the API.
+
+    Each doctor's days are DAY_DIGITS hex digits each, so with four slots a
+    60 day calendar is a 60 character string. Returns (data, cache key);
+    the key changes whenever a booking or weekday change touches the range.
+    """
+    versions = _versions(_version_keys(doctor_ids, _months(start, end)))
+    today = timezone.now().date()
+    parts = (start, end, sorted(doctor_ids) if doctor_ids is not None else 'all', today, *versions)
+    key = 'availability:' + hashlib.sha1('|'.join(map(str, parts)).encode()).hexdigest()
+
+    data = cache.get(key)
+    if data is None:
+        masks = slot_masks(start, end, doctor_ids)
+        data = {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'slots': SLOTS,
+            'doctors': {
+                str(pk): ''.join(format(mask, f'0{DAY_DIGITS}x') for mask in days)
+                for pk, days in sorted(masks.items())
+            },
+        }
+        cache.set(key, data, CACHE_TIMEOUT)
+    return data, key
+
+
+def free_slots(mask):
+    return [slot for index, slot in enumerate(SLOTS) if mask & (1 << index)]
@@ -0,0 +1,27 @@
+from django.db import IntegrityError, transaction
+
+SLOT_CONSTRAINT = 'appointment_slot_booked_uniq'
+
+
+class SlotTaken(Exception):
+    """The doctor already has a confirmed or pending appointment in that slot"""
+
+    def __init__(self, message='This time slot is already booked.'):
+        super().__init__(message)
+
+
+def save_booking(serializer, **fields):
+    """Save an appointment serializer in one insert/update attempt.
+
+    The partial unique constraint on (doctor, date, time) is the only
+    double booking check, so two concurrent requests for one slot can't
+    both pass. The save runs in a savepoint: losing the race raises
+    SlotTaken and leaves the surrounding transaction usable.
+    """
+    try:
+        with transaction.atomic():
+            return serializer.save(**fields)
+    except IntegrityError as exc:
+        if SLOT_CONSTRAINT in str(exc):
+            raise SlotTaken() from exc
+        raise
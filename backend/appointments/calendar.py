@@ -0,0 +1,111 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .availability import BOOKING_HORIZON_DAYS
+from .models import Appointment
+
+PRODID = '-//Thusha Optical//Appointments//EN'
+LOCATION = 'Thusha Optical, Hospital road, Jaffna'
+# Rolling window of the feed around today
+PAST_DAYS = 30
+FUTURE_DAYS = BOOKING_HORIZON_DAYS
+EVENT_MINUTES = 30
+CHUNK_SIZE = 500
+
+SLOT_TIMES = {value: time.fromisoformat(value) for value, _ in Appointment.TIME_SLOT_CHOICES}
+SLOT_LABELS = dict(Appointment.TIME_SLOT_CHOICES)
+EVENT_STATUS = {
+    'pending': 'TENTATIVE',
+    'confirmed': 'CONFIRMED',
+    'completed': 'CONFIRMED',
+    'cancelled': 'CANCELLED',
+}
+FIELDS = (
+    'id', 'date', 'time', 'status', 'reason', 'updated_at', 'patient_id',
+    'patient__name', 'doctor__user__name', 'doctor__specialization',
+)
+
+
+def feed_queryset(user):
+    """The user's appointments, as patient or doctor, within the rolling window"""
+    today = timezone.now().date()
+    window = (today - timedelta(days=PAST_DAYS), today + timedelta(days=FUTURE_DAYS))
+    return Appointment.objects.involving(user).filter(date__range=window)
+
+
+def feed_state(queryset):
+    """(latest updated_at, row count) of the feed; together they change whenever an event does"""
+    state = queryset.order_by().aggregate(last=Max('updated_at'), count=Count('id'))
+    return state['last'], state['count']
+
+
+def escape(text):
+    """TEXT value escaping from RFC 5545 3.3.11"""
+    return (
+        str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def fold(line):
+    """Fold a content line at 75 octets, continuation lines start with a space"""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Never split a UTF-8 sequence
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start, limit = end, 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def event_lines(row, user_id):
+    pk, day, slot, status, reason, updated_at, patient_id, patient, doctor, specialization = row
+    start = datetime.combine(day, SLOT_TIMES.get(slot, time(9)), tzinfo=timezone.get_default_timezone())
+    if patient_id == user_id:
+        summary = f'Eye appointment with Dr. {doctor}'
+    else:
+        summary = f'Appointment: {patient}'
+    description = f'{SLOT_LABELS.get(slot, slot)} with Dr. {doctor} ({specialization}). Reason: {reason}'
+    return [
+        'BEGIN:VEVENT',
+        f'UID:appointment-{pk}@thusha-optical',
+        f'DTSTAMP:{_utc(updated_at)}',
+        f'LAST-MODIFIED:{_utc(updated_at)}',
+        f'DTSTART:{_utc(start)}',
+        f'DTEND:{_utc(start + timedelta(minutes=EVENT_MINUTES))}',
+        f'SUMMARY:{escape(summary)}',
+        f'DESCRIPTION:{escape(description)}',
+        f'LOCATION:{escape(LOCATION)}',
+        f'STATUS:{EVENT_STATUS.get(status, "CONFIRMED")}',
+        'END:VEVENT',
+    ]
+
+
+def ics_lines(queryset, user, chunk_size=CHUNK_SIZE):
+    """Yield the calendar one folded line at a time.
+
+    Rows come from a server-side cursor (`values_list().iterator()`), so
+    memory stays flat however long the schedule is.
+    """
+    yield fold('BEGIN:VCALENDAR')
+    yield fold('VERSION:2.0')
+    yield fold(f'PRODID:{PRODID}')
+    yield fold('CALSCALE:GREGORIAN')
+    yield fold('METHOD:PUBLISH')
+    yield fold(f'X-WR-CALNAME:{escape("Thusha Optical appointments")}')
+    rows = queryset.order_by('date', 'time', 'id').values_list(*FIELDS).iterator(chunk_size=chunk_size)
+    for row in rows:
+        for line in event_lines(row, user.pk):
+            yield fold(line)
+    yield fold('END:VCALENDAR')
@@ -0,0 +1,17 @@
+import django_filters
+
+from .models import Appointment
+
+
+class CharInFilter(django_filters.BaseInFilter, django_filters.CharFilter):
+    """Comma separated values, e.g. ?status=confirmed,pending"""
+
+
+class AppointmentFilter(django_filters.FilterSet):
+    date_from = django_filters.DateFilter(field_name='date', lookup_expr='gte')
+    date_to = django_filters.DateFilter(field_name='date', lookup_expr='lte')
+    status = CharInFilter(field_name='status')
+
+    class Meta:
+        model = Appointment
+        fields = ['doctor', 'date']
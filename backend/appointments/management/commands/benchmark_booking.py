@@ -0,0 +1,126 @@
+import multiprocessing
+import operator
+import statistics
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from functools import reduce
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from appointments.availability import BLOCKING_STATUSES, SLOTS
+from appointments.models import Appointment
+from appointments.views import AppointmentCreateView
+from core.models import OutboundEmail, User
+from doctors.models import DoctorProfile
+from doctors.weekdays import WEEKDAYS
+
+
+def book(attempt):
+    """POST one booking through the real view, from a worker process"""
+    user_id, payload = attempt
+    request = APIRequestFactory().post('/api/appointments/appointments/', payload, format='json')
+    force_authenticate(request, user=User.objects.get(pk=user_id))
+    started = time.perf_counter()
+    response = AppointmentCreateView.as_view()(request)
+    return response.status_code, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire many concurrent bookings at the same appointment slots and check that each slot "
+        "is booked exactly once, the losers get a 409 and a cancelled booking doesn't hold the "
+        "slot. The synthetic doctor, patients, appointments and emails are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=500, help='Booking requests to send')
+        parser.add_argument('--slots', type=int, default=1, help='Contested slots the requests are spread over')
+        parser.add_argument('--workers', type=int, default=32, help='Client processes, one connection each (keep below max_connections)')
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        doctor_user = User.objects.create(email=f'booking-{tag}-doctor@example.com', name='Benchmark Doctor', role='doctor')
+        doctor = DoctorProfile.objects.create(
+            user=doctor_user, specialization='Optometry', experience_years=1,
+            qualifications='Benchmark', biography='Benchmark doctor', availability=WEEKDAYS,
+        )
+        patients = User.objects.bulk_create([
+            User(email=f'booking-{tag}-{n}@example.com', name=f'Patient {n}', role='customer')
+            for n in range(options['workers'])
+        ])
+        users = [doctor_user] + patients
+        try:
+            self.run(doctor, patients, options)
+        finally:
+            OutboundEmail.objects.filter(reduce(operator.or_, [Q(to__contains=[user.email]) for user in users])).delete()
+            Appointment.objects.filter(doctor=doctor).delete()
+            doctor.delete()
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def run(self, doctor, patients, options):
+        first_day = timezone.now().date() + timedelta(days=7)
+        slots = [
+            (first_day + timedelta(days=n // len(SLOTS)), SLOTS[n % len(SLOTS)])
+            for n in range(options['slots'])
+        ]
+        # A cancelled booking in every slot must not stop it being booked again
+        Appointment.objects.bulk_create([
+            Appointment(
+                patient=patients[0], doctor=doctor, date=day, time=slot,
+                reason='Cancelled benchmark booking', phone='0000000000', status='cancelled',
+            )
+            for day, slot in slots
+        ])
+        attempts = []
+        for n in range(options['bookings']):
+            day, slot = slots[n % len(slots)]
+            attempts.append((patients[n % len(patients)].pk, {
+                'doctor': doctor.pk, 'date': day.isoformat(), 'time': slot,
+                'reason': 'Benchmark eye examination', 'phone': '0000000000',
+            }))
+
+        started = time.perf_counter()
+        # Processes rather than threads so the GIL doesn't serialise the clients;
+        # each forked worker opens its own database connection
+        connection.close()
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=options['workers'], mp_context=context) as pool:
+            results = list(pool.map(book, attempts, chunksize=4))
+        elapsed = time.perf_counter() - started
+
+        codes = [code for code, _ in results]
+        latencies = sorted(latency for _, latency in results)
+        booked = codes.count(201)
+        conflicts = codes.count(409)
+        others = len(codes) - booked - conflicts
+        live = (
+            Appointment.objects.filter(doctor=doctor, status__in=BLOCKING_STATUSES)
+            .values('date', 'time').annotate(count=Count('id')).order_by()
+        )
+        double_booked = sum(row['count'] - 1 for row in live if row['count'] > 1)
+
+        self.stdout.write(
+            f"{len(attempts)} bookings for {len(slots)} slot(s) on {options['workers']} connections "
+            f"in {elapsed:.2f}s, {len(attempts) / elapsed:.0f} req/s"
+        )
+        self.stdout.write(
+            f"booked {booked}, 409 conflicts {conflicts}, other responses {others}, double bookings {double_booked}"
+        )
+        self.stdout.write(
+            f"latency p50 {statistics.median(latencies) * 1000:.1f} ms, "
+            f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms"
+        )
+
+        expected = min(len(slots), len(attempts))
+        if booked != expected or double_booked or others or len(live) != expected:
+            raise CommandError(
+                f'Inconsistent result: expected {expected} bookings, got {booked} '
+                f'({double_booked} double bookings, {others} unexpected responses).'
+            )
+        self.stdout.write(self.style.SUCCESS('Every slot booked exactly once, every loser got a 409.'))
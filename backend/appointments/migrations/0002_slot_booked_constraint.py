@@ -0,0 +1,22 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0001_initial'),
+        ('doctors', '0005_availability_mask'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='appointment',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['confirmed', 'pending'])), fields=('doctor', 'date', 'time'), name='appointment_slot_booked_uniq'),
+        ),
+    ]
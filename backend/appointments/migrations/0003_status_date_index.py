@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_slot_booked_constraint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status', 'date'], include=('id',), name='appointment_status_date_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_status_date_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'date', 'status'], name='appointment_doctor_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'date'], name='appointment_patient_date_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:20
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0005_calendar_feed'),
+        ('doctors', '0005_availability_mask'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('time', models.CharField(choices=[('09:00', '09:00 AM'), ('10:30', '10:30 AM'), ('13:00', '01:00 PM'), ('15:30', '03:30 PM')], max_length=5)),
+                ('reason', models.CharField(max_length=100, validators=[django.core.validators.MinLengthValidator(10)])),
+                ('phone', models.CharField(max_length=20, validators=[django.core.validators.MinLengthValidator(10)])),
+                ('status', models.CharField(choices=[('waiting', 'Waiting'), ('promoted', 'Promoted'), ('withdrawn', 'Withdrawn')], default='waiting', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('promoted_at', models.DateTimeField(blank=True, null=True)),
+                ('appointment', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waitlist_entry', to='appointments.appointment')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='doctors.doctorprofile')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(condition=models.Q(('status', 'waiting')), fields=['doctor', 'date', 'time', 'created_at'], name='waitlist_queue_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'waiting')), fields=('patient', 'doctor', 'date', 'time'), name='waitlist_entry_waiting_uniq')],
+            },
+        ),
+    ]
@@ -1,3 +1,5 @@
+import secrets
+
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.dispatch import receiver
@@ -6,10 +8,26 @@ from django.core.validators import MinLengthValidator
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from datetime import timedelta
-from django.db.models.signals import pre_save  
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver 
 User = get_user_model()
 
+class AppointmentQuerySet(models.QuerySet):
+    def with_related(self):
+        """Join everything AppointmentSerializer reads, so a page is one query"""
+        return self.select_related('doctor', 'doctor__user', 'patient')
+
+    def involving(self, user):
+        """Appointments the user is the patient or the doctor of.
+
+        The doctor side compares against a scalar subquery for the user's
+        profile rather than joining it, so each side of the OR can use its
+        own (patient, date) or (doctor, date, status) index.
+        """
+        profile = DoctorProfile.objects.filter(user=user).values('pk')[:1]
+        return self.filter(models.Q(patient=user) | models.Q(doctor_id=models.Subquery(profile)))
+
+
 class Appointment(models.Model):
     TIME_SLOT_CHOICES = [
         ('09:00', '09:00 AM'),
@@ -57,12 +75,35 @@ class Appointment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AppointmentQuerySet.as_manager()
+
     class Meta:
-        unique_together = ('doctor', 'date', 'time')
+        constraints = [
+            # One live booking per slot; cancelled and completed rows don't hold it
+            models.UniqueConstraint(
+                fields=['doctor', 'date', 'time'], name='appointment_slot_booked_uniq',
+                condition=models.Q(status__in=['confirmed', 'pending']),
+            ),
+        ]
+        indexes = [
+            # Covers the status sweep's scan (and status/date filters) as an index-only scan
+            models.Index(fields=['status', 'date'], include=['id'], name='appointment_status_date_idx'),
+            # A doctor's or patient's appointments in a date range
+            models.Index(fields=['doctor', 'date', 'status'], name='appointment_doctor_date_idx'),
+            models.Index(fields=['patient', 'date'], name='appointment_patient_date_idx'),
+        ]
         ordering = ['-date', 'time']
         verbose_name = 'Appointment'
         verbose_name_plural = 'Appointments'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The slot as loaded, so a reschedule frees the old day without re-reading the row
+        if 'doctor_id' in instance.__dict__ and 'date' in instance.__dict__:
+            instance._stored_slot = (instance.doctor_id, instance.date)
+        return instance
+
     def __str__(self):
         return f"{self.patient.get_full_name()} with Dr. {self.doctor.user.get_full_name()} on {self.date} at {self.get_time_display()}"
     
@@ -80,9 +121,80 @@ class Appointment(models.Model):
         """Returns time in 12-hour format with AM/PM"""
         return dict(self.TIME_SLOT_CHOICES).get(self.time, self.time)
     
-# Signal registration
-@receiver(pre_save, sender=Appointment)
-def update_appointment_status(sender, instance, **kwargs):
-    """Automatically update status for past appointments"""
-    if instance.date < timezone.now().date():
-        instance.status = 'completed'
\ No newline at end of file
+class WaitlistEntry(models.Model):
+    """A patient queued for a full slot; promoted to an appointment when the slot frees up"""
+    STATUS_CHOICES = [
+        ('waiting', 'Waiting'),
+        ('promoted', 'Promoted'),
+        ('withdrawn', 'Withdrawn'),
+    ]
+
+    patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='waitlist_entries')
+    doctor = models.ForeignKey(DoctorProfile, on_delete=models.CASCADE, related_name='waitlist_entries')
+    date = models.DateField()
+    time = models.CharField(max_length=5, choices=Appointment.TIME_SLOT_CHOICES)
+    # Copied onto the appointment on promotion
+    reason = models.CharField(max_length=100, validators=[MinLengthValidator(10)])
+    phone = models.CharField(max_length=20, validators=[MinLengthValidator(10)])
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='waiting')
+    appointment = models.OneToOneField(
+        Appointment, on_delete=models.SET_NULL, null=True, blank=True, related_name='waitlist_entry'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    promoted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['patient', 'doctor', 'date', 'time'], name='waitlist_entry_waiting_uniq',
+                condition=models.Q(status='waiting'),
+            ),
+        ]
+        indexes = [
+            # Head of a slot's queue
+            models.Index(
+                fields=['doctor', 'date', 'time', 'created_at'], name='waitlist_queue_idx',
+                condition=models.Q(status='waiting'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.patient} waiting for Dr. {self.doctor.user.name} on {self.date} at {self.time}"
+
+
+def new_feed_token():
+    return secrets.token_urlsafe(32)
+
+
+class CalendarFeed(models.Model):
+    """Secret URL token for a user's appointments as an iCalendar feed"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='calendar_feed')
+    token = models.CharField(max_length=64, unique=True, default=new_feed_token)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def rotate(self):
+        """Invalidate the current feed URL"""
+        self.token = new_feed_token()
+        self.save(update_fields=['token'])
+
+    def __str__(self):
+        return f"Calendar feed of {self.user}"
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_appointment_availability(sender, instance, **kwargs):
+    from .availability import invalidate_availability
+    invalidate_availability(instance.doctor_id, instance.date)
+    stored = getattr(instance, '_stored_slot', None)
+    if stored and stored != (instance.doctor_id, instance.date):
+        invalidate_availability(*stored)
+    instance._stored_slot = (instance.doctor_id, instance.date)
+
+
+@receiver(post_save, sender=DoctorProfile)
+@receiver(post_delete, sender=DoctorProfile)
+def invalidate_doctor_availability(sender, instance, **kwargs):
+    from .availability import invalidate_availability
+    invalidate_availability(instance.pk)
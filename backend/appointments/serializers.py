@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from doctors.serializers import DoctorProfileSerializer 
-from .models import Appointment
+from .models import Appointment, WaitlistEntry
 from django.utils import timezone
+from core.fieldsets import SparseFieldsMixin
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     doctor_name = serializers.CharField(source='doctor.user.name', read_only=True)
     doctor_specialization = serializers.CharField(source='doctor.specialization', read_only=True)
     doctor_details = serializers.SerializerMethodField(read_only=True)
@@ -11,6 +12,13 @@ class AppointmentSerializer(serializers.ModelSerializer):
     patient_name = serializers.CharField(source='patient.name', read_only=True)
     patient_email = serializers.EmailField(source='patient.email', read_only=True)
 
+    only_fields = {
+        'doctor_details': [
+            'doctor__user__name', 'doctor__user__email', 'doctor__specialization',
+            'doctor__experience_years', 'doctor__qualifications', 'doctor__availability',
+        ],
+    }
+
     class Meta:
         model = Appointment
         fields = [
@@ -22,6 +30,9 @@ class AppointmentSerializer(serializers.ModelSerializer):
             'doctor': {'write_only': True},
             # We allow status updates, so do NOT set 'read_only' on status here
         }
+        # Double bookings are caught by the slot constraint on insert (see
+        # appointments.booking), not by a racy exists() check beforehand
+        validators = []
 
     def get_doctor_details(self, obj):
         return {
@@ -42,16 +53,23 @@ class AppointmentSerializer(serializers.ModelSerializer):
         if 'date' in data and data['date'] < timezone.now().date():
             raise serializers.ValidationError("Appointment date cannot be in the past.")
 
-        if all(k in data for k in ['doctor', 'date', 'time']):
-            conflicts = Appointment.objects.filter(
-                doctor=data['doctor'],
-                date=data['date'],
-                time=data['time'],
-                status__in=['confirmed', 'pending']
-            )
-            if self.instance:
-                conflicts = conflicts.exclude(pk=self.instance.pk)
-            if conflicts.exists():
-                raise serializers.ValidationError("This time slot is already booked.")
-
         return data
+
+
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    doctor_name = serializers.CharField(source='doctor.user.name', read_only=True)
+
+    class Meta:
+        model = WaitlistEntry
+        fields = [
+            'id', 'doctor', 'doctor_name', 'date', 'time', 'reason', 'phone',
+            'status', 'appointment', 'created_at', 'promoted_at',
+        ]
+        read_only_fields = ['status', 'appointment', 'created_at', 'promoted_at']
+        # Joining twice is handled by appointments.waitlist.join_waitlist
+        validators = []
+
+    def validate_date(self, value):
+        if value < timezone.now().date():
+            raise serializers.ValidationError("Appointment date cannot be in the past.")
+        return value
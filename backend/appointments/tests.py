@@ -1,3 +1,412 @@
-from django.test import TestCase
+from datetime import timedelta
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from core.models import OutboundEmail, User
+from core.outbox import drain
+from doctors.models import DoctorProfile
+from doctors.weekdays import WEEKDAYS
+from .models import Appointment, WaitlistEntry
+
+
+class CountingEmailBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return super().open()
+
+
+class RejectingEmailBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise SMTPException('421 Service not available')
+
+
+class AppointmentReadQueriesTests(APITestCase):
+    """Appointment read endpoints run a fixed number of queries however many rows they return"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = User.objects.create_user(email='patient@example.com', name='Patient', password='x')
+        cls.other_patient = User.objects.create_user(email='other@example.com', name='Other', password='x')
+        cls.doctors = [
+            DoctorProfile.objects.create(
+                user=User.objects.create_user(email=f'doctor{n}@example.com', name=f'Doctor {n}', password='x', role='doctor'),
+                specialization='Optometry', experience_years=5, qualifications='OD', biography='Bio',
+                availability=['monday', 'wednesday'],
+            )
+            for n in range(3)
+        ]
+        today = timezone.now().date()
+        cls.today = today
+        slots = [value for value, _ in Appointment.TIME_SLOT_CHOICES]
+        cls.appointments = Appointment.objects.bulk_create([
+            Appointment(
+                patient=cls.patient, doctor=cls.doctors[n % 3], date=today + timedelta(days=n),
+                time=slots[n % len(slots)], reason='Routine eye exam', phone='0771234567',
+                status='cancelled' if n % 4 == 3 else 'confirmed',
+            )
+            for n in range(12)
+        ])
+        # Someone else's appointment, visible to the doctor but not the patient
+        Appointment.objects.create(
+            patient=cls.other_patient, doctor=cls.doctors[0], date=today + timedelta(days=20),
+            time=slots[0], reason='Routine eye exam', phone='0771234567',
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.patient)
+
+    def test_list_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('appointment-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 12)
+        self.assertEqual(response.data[0]['doctor_details']['name'], 'Doctor 2')
+
+    def test_paginated_list_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('appointment-list'), {'page_size': 5})
+        self.assertEqual(len(response.data['results']), 5)
+        with self.assertNumQueries(1):
+            response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_pages_cover_the_list_in_order(self):
+        expected = [row['id'] for row in self.client.get(reverse('appointment-list')).data]
+        response = self.client.get(reverse('appointment-list'), {'page_size': 5})
+        pages = [response.data]
+        while pages[-1]['next']:
+            pages.append(self.client.get(pages[-1]['next']).data)
+        self.assertEqual([row['id'] for page in pages for row in page['results']], expected)
+
+        previous = self.client.get(pages[-1]['previous']).data
+        self.assertEqual(previous['results'], pages[-2]['results'])
+
+    def test_unknown_cursor_is_not_found(self):
+        response = self.client.get(reverse('appointment-list'), {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_date_range_and_status_filters(self):
+        params = {
+            'date_from': (self.today + timedelta(days=2)).isoformat(),
+            'date_to': (self.today + timedelta(days=8)).isoformat(),
+            'status': 'confirmed,pending',
+        }
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('appointment-list'), params)
+        expected = [
+            appointment.id for appointment in self.appointments
+            if 2 <= (appointment.date - self.today).days <= 8 and appointment.status == 'confirmed'
+        ]
+        self.assertEqual(sorted(row['id'] for row in response.data), sorted(expected))
+
+    def test_invalid_date_is_rejected(self):
+        response = self.client.get(reverse('appointment-list'), {'date_from': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_doctor_sees_their_appointments(self):
+        self.client.force_authenticate(self.doctors[0].user)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('appointment-list'))
+        patients = {row['patient_email'] for row in response.data}
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(patients, {'patient@example.com', 'other@example.com'})
+
+    def test_detail_is_one_query(self):
+        appointment = self.appointments[0]
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('appointment-detail', args=[appointment.id]))
+        self.assertEqual(response.data['doctor_details']['email'], 'doctor0@example.com')
+        self.assertEqual(response.data['patient_name'], 'Patient')
+
+
+class CalendarFeedTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = User.objects.create_user(email='patient@example.com', name='Patient', password='x')
+        cls.doctor = DoctorProfile.objects.create(
+            user=User.objects.create_user(email='doctor@example.com', name='Doctor', password='x', role='doctor'),
+            specialization='Optometry', experience_years=5, qualifications='OD', biography='Bio',
+        )
+        cls.appointment = Appointment.objects.create(
+            patient=cls.patient, doctor=cls.doctor, date=timezone.now().date() + timedelta(days=3),
+            time='10:30', reason='Blurry vision; headaches', phone='0771234567',
+        )
+
+    def feed_path(self, user):
+        self.client.force_authenticate(user)
+        url = self.client.get(reverse('calendar-feed-url')).data['url']
+        self.client.force_authenticate(None)
+        return url.split('testserver', 1)[1]
+
+    def test_feed_lists_the_users_appointments(self):
+        response = self.client.get(self.feed_path(self.patient))
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        self.assertIn(f'UID:appointment-{self.appointment.id}@thusha-optical\r\n', body)
+        self.assertIn('SUMMARY:Eye appointment with Dr. Doctor\r\n', body)
+        # Unfolded, the reason is escaped per RFC 5545
+        self.assertIn(r'Reason: Blurry vision\; headaches', body.replace('\r\n ', ''))
+
+    def test_unchanged_feed_is_a_cheap_304(self):
+        path = self.feed_path(self.doctor.user)
+        etag = self.client.get(path)['ETag']
+        with self.assertNumQueries(2):
+            response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.appointment.status = 'cancelled'
+        self.appointment.save()
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'STATUS:CANCELLED', b''.join(response.streaming_content))
+
+    def test_rotated_token_stops_working(self):
+        path = self.feed_path(self.patient)
+        self.client.force_authenticate(self.patient)
+        self.client.post(reverse('calendar-feed-url'))
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(path).status_code, 404)
+
+
+class WaitlistTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = User.objects.create_user(email='patient@example.com', name='Patient', password='x')
+        cls.waiting = [
+            User.objects.create_user(email=f'waiting{n}@example.com', name=f'Waiting {n}', password='x')
+            for n in range(2)
+        ]
+        cls.doctor = DoctorProfile.objects.create(
+            user=User.objects.create_user(email='doctor@example.com', name='Doctor', password='x', role='doctor'),
+            specialization='Optometry', experience_years=5, qualifications='OD', biography='Bio',
+        )
+        cls.date = timezone.now().date() + timedelta(days=3)
+        cls.appointment = Appointment.objects.create(
+            patient=cls.patient, doctor=cls.doctor, date=cls.date, time='10:30',
+            reason='Routine eye exam', phone='0771234567',
+        )
+
+    def join(self, user, time='10:30'):
+        self.client.force_authenticate(user)
+        return self.client.post(reverse('waitlist'), {
+            'doctor': self.doctor.id, 'date': self.date.isoformat(), 'time': time,
+            'reason': 'Follow-up examination', 'phone': '0779999999',
+        }, format='json')
+
+    def test_free_slot_cannot_be_waitlisted(self):
+        response = self.join(self.waiting[0], time='09:00')
+        self.assertEqual(response.status_code, 409)
+
+    def test_cancellation_promotes_the_head_of_the_queue(self):
+        first = self.join(self.waiting[0]).data['id']
+        second = self.join(self.waiting[1]).data['id']
+
+        self.client.force_authenticate(self.patient)
+        url = reverse('appointment-detail', args=[self.appointment.id])
+        response = self.client.patch(url, {'status': 'cancelled'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        promoted = WaitlistEntry.objects.get(pk=first)
+        self.assertEqual(promoted.status, 'promoted')
+        self.assertEqual(promoted.appointment.patient, self.waiting[0])
+        self.assertEqual(promoted.appointment.status, 'confirmed')
+        self.assertEqual(WaitlistEntry.objects.get(pk=second).status, 'waiting')
+        # Queued with the booking, not sent inline
+        self.assertTrue(OutboundEmail.objects.filter(to=['waiting0@example.com']).exists())
+
+
+class DoubleBookingTests(APITestCase):
+    """The slot constraint is the only double booking check, a lost race is a 409"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patients = [
+            User.objects.create_user(email=f'patient{n}@example.com', name=f'Patient {n}', password='x')
+            for n in range(2)
+        ]
+        cls.doctor = DoctorProfile.objects.create(
+            user=User.objects.create_user(email='doctor@example.com', name='Doctor', password='x', role='doctor'),
+            specialization='Optometry', experience_years=5, qualifications='OD', biography='Bio',
+        )
+        cls.date = timezone.now().date() + timedelta(days=3)
+
+    def book(self, patient, url='appointment-create', time='10:30'):
+        self.client.force_authenticate(patient)
+        return self.client.post(reverse(url), {
+            'doctor': self.doctor.id, 'date': self.date.isoformat(), 'time': time,
+            'reason': 'Routine eye exam', 'phone': '0771234567',
+        }, format='json')
+
+    def test_second_booking_of_a_slot_is_a_conflict(self):
+        self.assertEqual(self.book(self.patients[0]).status_code, 201)
+        emails = OutboundEmail.objects.count()
+        for url in ('appointment-create', 'appointment-list'):
+            response = self.book(self.patients[1], url=url)
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(response.data['error'], 'This time slot is already booked.')
+        self.assertEqual(Appointment.objects.count(), 1)
+        # The losing booking's emails rolled back with it
+        self.assertEqual(OutboundEmail.objects.count(), emails)
+
+    def test_rescheduling_onto_a_taken_slot_is_a_conflict(self):
+        self.book(self.patients[0])
+        moving = self.book(self.patients[1], time='09:00').data['id']
+        response = self.client.patch(reverse('appointment-detail', args=[moving]), {'time': '10:30'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Appointment.objects.get(pk=moving).time, '09:00')
+
+    def test_cancelled_slot_can_be_booked_again(self):
+        first = self.book(self.patients[0]).data['id']
+        response = self.client.patch(reverse('appointment-detail', args=[first]), {'status': 'cancelled'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.book(self.patients[1])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            Appointment.objects.filter(doctor=self.doctor, date=self.date, time='10:30').count(), 2,
+        )
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class AvailabilityInvalidationTests(APITestCase):
+    """Cached availability follows bookings, cancellations and reschedules"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = User.objects.create_user(email='patient@example.com', name='Patient', password='x')
+        cls.doctor = DoctorProfile.objects.create(
+            user=User.objects.create_user(email='doctor@example.com', name='Doctor', password='x', role='doctor'),
+            specialization='Optometry', experience_years=5, qualifications='OD', biography='Bio',
+            availability=WEEKDAYS,
+        )
+        cls.date = timezone.now().date() + timedelta(days=3)
+        # Another month, so the reschedule has to free a different cache entry
+        cls.later = cls.date + timedelta(days=35)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.patient)
+
+    def free_slots(self, date):
+        response = self.client.get(reverse('available-slots', args=[self.doctor.id]), {'date': date.isoformat()})
+        return response.data['available_slots']
+
+    def write(self, method, url, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertIn(response.status_code, (200, 201))
+        return response.data
+
+    def test_booking_cancelling_and_rescheduling_move_availability(self):
+        self.assertIn('10:30', self.free_slots(self.date))
+        etag = self.client.get(reverse('availability'), {'doctor': self.doctor.id})['ETag']
+
+        appointment = self.write('post', reverse('appointment-create'), {
+            'doctor': self.doctor.id, 'date': self.date.isoformat(), 'time': '10:30',
+            'reason': 'Routine eye exam', 'phone': '0771234567',
+        })
+        self.assertNotIn('10:30', self.free_slots(self.date))
+        self.assertNotEqual(self.client.get(reverse('availability'), {'doctor': self.doctor.id})['ETag'], etag)
+
+        url = reverse('appointment-detail', args=[appointment['id']])
+        self.write('patch', url, {'date': self.later.isoformat()})
+        self.assertIn('10:30', self.free_slots(self.date))
+        self.assertNotIn('10:30', self.free_slots(self.later))
+
+        self.write('patch', url, {'status': 'cancelled'})
+        self.assertIn('10:30', self.free_slots(self.later))
+
+    def test_status_change_does_not_reread_the_row(self):
+        appointment = Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, date=self.date, time='09:00',
+            reason='Routine eye exam', phone='0771234567',
+        )
+        appointment = Appointment.objects.get(pk=appointment.pk)
+        with self.assertNumQueries(1):
+            appointment.status = 'cancelled'
+            appointment.save()
+
+
+class BookingEmailOutboxTests(APITestCase):
+    """Booking emails are queued with the booking and sent by core.outbox.drain"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = User.objects.create_user(email='patient@example.com', name='Patient', password='x')
+        cls.doctor = DoctorProfile.objects.create(
+            user=User.objects.create_user(email='doctor@example.com', name='Doctor', password='x', role='doctor'),
+            specialization='Optometry', experience_years=5, qualifications='OD', biography='Bio',
+        )
+        cls.date = timezone.now().date() + timedelta(days=3)
+
+    def setUp(self):
+        self.client.force_authenticate(self.patient)
+
+    def book(self, time='10:30'):
+        return self.client.post(reverse('appointment-create'), {
+            'doctor': self.doctor.id, 'date': self.date.isoformat(), 'time': time,
+            'reason': 'Routine eye exam', 'phone': '0771234567',
+        }, format='json')
+
+    def test_emails_are_queued_not_sent(self):
+        response = self.book()
+        self.assertEqual(response.status_code, 201)
+        queued = OutboundEmail.objects.order_by('id')
+        self.assertEqual([email.to for email in queued], [['patient@example.com'], ['doctor@example.com']])
+        self.assertEqual({email.status for email in queued}, {'pending'})
+        self.assertEqual(mail.outbox, [])
+
+    @override_settings(EMAIL_OUTBOX_DRAIN_ON_COMMIT=True)
+    def test_commit_kicks_a_drain(self):
+        with mock.patch('core.outbox._kick') as kick:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.book()
+        kick.assert_called()
+
+    def test_rolled_back_booking_queues_nothing(self):
+        with mock.patch('appointments.views.queue_email', side_effect=[None, RuntimeError('boom')]):
+            with self.assertRaises(RuntimeError):
+                self.book()
+        self.assertFalse(Appointment.objects.exists())
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    @override_settings(EMAIL_BACKEND='appointments.tests.CountingEmailBackend')
+    def test_drain_sends_the_batch_over_one_connection(self):
+        self.book(time='09:00')
+        self.book(time='10:30')
+        CountingEmailBackend.opened = 0
+
+        stats = drain()
+        self.assertEqual(stats, {'claimed': 4, 'sent': 4, 'retried': 0, 'failed': 0})
+        self.assertEqual(CountingEmailBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertFalse(OutboundEmail.objects.exclude(status='sent').exists())
+        self.assertEqual(drain()['claimed'], 0)
+
+    @override_settings(EMAIL_OUTBOX_RETRY_BASE_SECONDS=30)
+    def test_failed_send_is_retried_with_backoff(self):
+        self.book()
+        with override_settings(EMAIL_BACKEND='appointments.tests.RejectingEmailBackend'):
+            stats = drain()
+        self.assertEqual(stats['retried'], 2)
+
+        email = OutboundEmail.objects.order_by('id').first()
+        self.assertEqual((email.status, email.attempts), ('pending', 1))
+        self.assertIn('421 Service not available', email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=25))
+        # Not due yet, so it is left alone until the backoff passes
+        self.assertEqual(drain()['claimed'], 0)
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(drain()['sent'], 2)
+        self.assertEqual(len(mail.outbox), 2)
@@ -1,11 +1,17 @@
 from django.urls import path
-from .views import DoctorListView,AvailableDoctorsView, AvailableSlotsView, AppointmentCreateView,AppointmentDetailView,AppointmentListView
+from .views import DoctorListView,AvailableDoctorsView, AvailableSlotsView, AppointmentCreateView,AppointmentDetailView,AppointmentListView,AppointmentExportView, AvailabilityView, CalendarFeedView, calendar_feed, WaitlistView, WaitlistEntryView
 
 urlpatterns = [
     path('doctors/', DoctorListView.as_view(), name='doctor-list'),
     path('doctors/<int:doctor_id>/slots/', AvailableSlotsView.as_view(), name='available-slots'),
     path('appointments/', AppointmentCreateView.as_view(), name='appointment-create'),
+    path('availability/', AvailabilityView.as_view(), name='availability'),
     path('doctors/available/', AvailableDoctorsView.as_view(), name='available-doctors'),
     path('', AppointmentListView.as_view(), name='appointment-list'),
+    path('export/', AppointmentExportView.as_view(), name='appointment-export'),
     path('<int:pk>/', AppointmentDetailView.as_view(), name='appointment-detail'),
+    path('waitlist/', WaitlistView.as_view(), name='waitlist'),
+    path('waitlist/<int:pk>/', WaitlistEntryView.as_view(), name='waitlist-entry'),
+    path('calendar/', CalendarFeedView.as_view(), name='calendar-feed-url'),
+    path('calendar/<str:token>.ics', calendar_feed, name='calendar-feed'),
 ]
\ No newline at end of file
@@ -1,22 +1,35 @@
-from django.conf import settings
-from django.core.mail import send_mail
+from django.db import transaction
+from django.http import HttpResponseNotFound, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import require_safe
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
-from datetime import datetime
+from datetime import datetime, timedelta
+from django.utils import timezone
 from rest_framework import generics, status, filters
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q
 from django_filters.rest_framework import DjangoFilterBackend
 
-from appointments.models import Appointment
-from appointments.serializers import AppointmentSerializer
+from appointments.models import Appointment, CalendarFeed, WaitlistEntry
+from appointments.serializers import AppointmentSerializer, WaitlistEntrySerializer
 from doctors.models import DoctorProfile
 from doctors.serializers import DoctorProfileSerializer
+from core.pagination import AppointmentCursorPagination
+from core.permission import IsAdmin
+from core.fieldsets import SparseQuerysetMixin
+from core.streaming import export_response, get_export_format
+from core.conditional import make_etag, not_modified, set_validators
+from core.outbox import queue_email
+from appointments.availability import BLOCKING_STATUSES, MAX_RANGE_DAYS, availability, free_slots
+from appointments.booking import SlotTaken, save_booking
+from appointments.filters import AppointmentFilter
+from appointments.calendar import feed_queryset, feed_state, ics_lines
+from appointments.waitlist import SlotNotFull, freed_slot, join_waitlist, promote_next
 
 
 def send_appointment_emails(appointment, doctor_profile):
-    """Send confirmation emails to patient and doctor"""
+    """Queue confirmation emails to patient and doctor"""
     doctor = doctor_profile
     patient = appointment.patient
     
@@ -51,29 +64,25 @@ def send_appointment_emails(appointment, doctor_profile):
     }
     doctor_html_message = render_to_string('emails/doctor_notification.html', doctor_context)
 
-    # Send email to patient
-    send_mail(
+    # Queued in the caller's transaction, core.outbox sends them after commit
+    queue_email(
         subject=patient_subject,
-        message=strip_tags(patient_html_message),
-        html_message=patient_html_message,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[patient.email],
-        fail_silently=False
+        body=strip_tags(patient_html_message),
+        html_body=patient_html_message,
+        to=[patient.email],
     )
 
-    # Send email to doctor (if email exists)
+    # Email the doctor too (if email exists)
     if doctor.user.email:
-        send_mail(
+        queue_email(
             subject=doctor_subject,
-            message=strip_tags(doctor_html_message),
-            html_message=doctor_html_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[doctor.user.email],
-            fail_silently=False
+            body=strip_tags(doctor_html_message),
+            html_body=doctor_html_message,
+            to=[doctor.user.email],
         )
 
 
-class DoctorListView(generics.ListAPIView):
+class DoctorListView(SparseQuerysetMixin, generics.ListAPIView):
     serializer_class = DoctorProfileSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
@@ -87,30 +96,14 @@ class DoctorListView(generics.ListAPIView):
         if date_str:
             try:
                 date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
-                weekday = date_obj.strftime('%A').lower()
-                from django.db.models import Q
-
-                possible_keys = [
-                    weekday,
-                    f"{weekday}'",
-                    f"{weekday}*",
-                    f"'{weekday}'",
-                    f'"{weekday}"'
-                ]
-
-                query = Q()
-                for key in possible_keys:
-                    query |= Q(availability__has_key=key) & Q(availability__contains={key: True})
-
-                queryset = queryset.filter(query)
-
+                queryset = queryset.available_on(date_obj)
             except ValueError:
                 pass
 
         return queryset
 
 
-class AvailableDoctorsView(generics.ListAPIView):
+class AvailableDoctorsView(SparseQuerysetMixin, generics.ListAPIView):
     serializer_class = DoctorProfileSerializer
     permission_classes = [IsAuthenticated]
 
@@ -121,9 +114,7 @@ class AvailableDoctorsView(generics.ListAPIView):
         if date_str:
             try:
                 date = datetime.strptime(date_str, '%Y-%m-%d').date()
-                weekday = date.strftime('%A').lower()
-
-                queryset = queryset.filter(availability__contains=[weekday])
+                queryset = queryset.available_on(date)
 
                 appointments = Appointment.objects.filter(
                     date=date,
@@ -141,6 +132,19 @@ class AvailableDoctorsView(generics.ListAPIView):
         return queryset
 
 
+class SlotConflictMixin:
+    """Answer a lost race for a slot with 409 instead of a 500"""
+
+    def handle_exception(self, exc):
+        if isinstance(exc, SlotTaken):
+            return Response({'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+        return super().handle_exception(exc)
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
 class AvailableSlotsView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
 
@@ -151,32 +155,65 @@ class AvailableSlotsView(generics.GenericAPIView):
 
         try:
             date = datetime.strptime(date_str, '%Y-%m-%d').date()
-            doctor = DoctorProfile.objects.get(id=doctor_id)
-
-            booked_slots = Appointment.objects.filter(
-                doctor=doctor,
-                date=date,
-                status__in=['confirmed', 'pending']
-            ).values_list('time', flat=True)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
 
-            available_slots = [
-                slot[0] for slot in Appointment.TIME_SLOT_CHOICES
-                if slot[0] not in booked_slots
-            ]
+        data, _ = availability(date, date, [doctor_id])
+        days = data['doctors'].get(str(doctor_id))
+        if days is None:
+            return Response({'error': 'Doctor not found'}, status=404)
+        available = free_slots(int(days, 16))
+        # Booked slots can be waitlisted instead of polled
+        booked = set(Appointment.objects.filter(
+            doctor_id=doctor_id, date=date, status__in=BLOCKING_STATUSES,
+        ).values_list('time', flat=True))
+        waitlist = [slot for slot, _ in Appointment.TIME_SLOT_CHOICES if slot in booked]
+        return Response({'available_slots': available, 'waitlist_slots': waitlist})
+
+
+class AvailabilityView(generics.GenericAPIView):
+    """Free slots of one, several or all doctors over up to 60 days, in one response.
+
+    `?start=YYYY-MM-DD&end=YYYY-MM-DD&doctor=1,2`. Each doctor maps to a
+    string with DAY_DIGITS hex digits per day from `start`; bit n of a day
+    is set when `slots[n]` is free.
+    """
+    permission_classes = [IsAuthenticated]
 
-            return Response({'available_slots': available_slots})
+    def get(self, request):
+        params = request.query_params
+        try:
+            start = parse_date(params.get('start')) or timezone.now().date()
+            end = parse_date(params.get('end')) or start + timedelta(days=MAX_RANGE_DAYS - 1)
+        except ValueError:
+            return Response({'error': 'start and end must be YYYY-MM-DD dates.'}, status=400)
+        if end < start or (end - start).days >= MAX_RANGE_DAYS:
+            return Response({'error': f'end must be within {MAX_RANGE_DAYS} days after start.'}, status=400)
+
+        doctor_ids = None
+        if params.get('doctor'):
+            try:
+                doctor_ids = [int(value) for value in params['doctor'].split(',') if value.strip()]
+            except ValueError:
+                return Response({'error': 'doctor must be a comma separated list of ids.'}, status=400)
 
-        except Exception as e:
-            return Response({'error': str(e)}, status=400)
+        data, key = availability(start, end, doctor_ids)
+        etag = make_etag(key, request.accepted_renderer.format)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        return set_validators(Response(data), etag)
 
 
-class AppointmentCreateView(generics.CreateAPIView):
+class AppointmentCreateView(SlotConflictMixin, generics.CreateAPIView):
     queryset = Appointment.objects.all()
     serializer_class = AppointmentSerializer
     permission_classes = [IsAuthenticated]
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        appointment = serializer.save(
+        appointment = save_booking(
+            serializer,
             patient=self.request.user,
             status='confirmed'  # Or default status you want
         )
@@ -189,29 +226,147 @@ class AppointmentCreateView(generics.CreateAPIView):
         return response
 
 
-class AppointmentListView(generics.ListCreateAPIView):
+class AppointmentListView(SlotConflictMixin, SparseQuerysetMixin, generics.ListCreateAPIView):
     serializer_class = AppointmentSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['status', 'doctor', 'date']
+    filterset_class = AppointmentFilter
+    pagination_class = AppointmentCursorPagination
 
     def get_queryset(self):
-        user = self.request.user
-        return Appointment.objects.filter(
-            Q(patient=user) | Q(doctor__user=user)
-        ).select_related('doctor', 'patient', 'doctor__user')
+        return Appointment.objects.involving(self.request.user).with_related()
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        appointment = serializer.save(patient=self.request.user)
+        appointment = save_booking(serializer, patient=self.request.user)
         send_appointment_emails(appointment, appointment.doctor)
 
 
-class AppointmentDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Appointment.objects.all()
+class AppointmentExportView(generics.GenericAPIView):
+    """Stream every appointment as CSV or NDJSON for reporting"""
+    permission_classes = [IsAuthenticated, IsAdmin]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = AppointmentFilter
+    queryset = Appointment.objects.order_by('-date', 'time', '-id')
+    export_fields = [
+        ('id', 'id'), ('date', 'date'), ('time', 'time'), ('status', 'status'),
+        ('patient', 'patient__name'), ('patient_email', 'patient__email'), ('phone', 'phone'),
+        ('doctor', 'doctor__user__name'), ('reason', 'reason'), ('created_at', 'created_at'),
+    ]
+
+    def get(self, request):
+        file_format = get_export_format(request)
+        if file_format is None:
+            return Response({'error': 'file_format must be csv or ndjson.'}, status=400)
+        queryset = self.filter_queryset(self.get_queryset())
+        return export_response(queryset, self.export_fields, file_format, 'appointments')
+
+
+class AppointmentDetailView(SlotConflictMixin, SparseQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Appointment.objects.with_related()
     serializer_class = AppointmentSerializer
     permission_classes = [IsAuthenticated]
 
+    @staticmethod
+    def slot_state(appointment):
+        return (appointment.doctor_id, appointment.date, appointment.time, appointment.status)
+
+    def promote_waitlist(self, before, after=None):
+        """Give a slot the change released to the head of its waitlist"""
+        slot = freed_slot(before, after)
+        promoted = promote_next(*slot) if slot else None
+        if promoted is not None:
+            send_appointment_emails(promoted, promoted.doctor)
+
+    @transaction.atomic
     def perform_update(self, serializer):
-        appointment = serializer.save()
+        before = self.slot_state(serializer.instance)
+        appointment = save_booking(serializer)
         if 'status' in serializer.validated_data:
             send_appointment_emails(appointment, appointment.doctor)
+        self.promote_waitlist(before, self.slot_state(appointment))
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        before = self.slot_state(instance)
+        instance.delete()
+        self.promote_waitlist(before)
+
+
+class CalendarFeedView(generics.GenericAPIView):
+    """The user's private iCalendar feed URL; POST replaces it with a new one"""
+    permission_classes = [IsAuthenticated]
+
+    def feed_response(self, feed):
+        url = self.request.build_absolute_uri(reverse('calendar-feed', args=[feed.token]))
+        return Response({'url': url, 'created_at': feed.created_at})
+
+    def get(self, request):
+        feed, _ = CalendarFeed.objects.get_or_create(user=request.user)
+        return self.feed_response(feed)
+
+    def post(self, request):
+        feed, created = CalendarFeed.objects.get_or_create(user=request.user)
+        if not created:
+            feed.rotate()
+        return self.feed_response(feed)
+
+
+@require_safe
+def calendar_feed(request, token):
+    """Appointments as text/calendar for calendar apps; the token in the URL is the credential.
+
+    Clients poll this every few minutes, so a request whose ETag still
+    matches is answered with a 304 after two small queries. Otherwise
+    the events are streamed straight from a server-side cursor.
+    """
+    feed = CalendarFeed.objects.select_related('user').filter(token=token).first()
+    if feed is None or not feed.user.is_active:
+        return HttpResponseNotFound('Unknown calendar feed.', content_type='text/plain')
+
+    queryset = feed_queryset(feed.user)
+    last_updated, count = feed_state(queryset)
+    # The window moves daily, so today is part of the validator
+    etag = make_etag('calendar', feed.token, timezone.now().date(), last_updated, count)
+    last_modified = last_updated.timestamp() if last_updated else None
+    response = not_modified(request, etag, last_modified, private=True)
+    if response is not None:
+        return response
+
+    response = StreamingHttpResponse(ics_lines(queryset, feed.user), content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = 'inline; filename="appointments.ics"'
+    # Keep proxies such as nginx from buffering the whole body
+    response['X-Accel-Buffering'] = 'no'
+    return set_validators(response, etag, last_modified, private=True)
+
+
+class WaitlistView(generics.ListCreateAPIView):
+    """The user's waitlist entries; POST queues them for a full slot"""
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return WaitlistEntry.objects.filter(patient=self.request.user).select_related('doctor__user')
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            entry = join_waitlist(request.user, **serializer.validated_data)
+        except SlotNotFull as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(entry).data, status=status.HTTP_201_CREATED)
+
+
+class WaitlistEntryView(generics.RetrieveDestroyAPIView):
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return WaitlistEntry.objects.filter(patient=self.request.user).select_related('doctor__user')
+
+    def perform_destroy(self, instance):
+        # Keep promoted entries, they link to the appointment
+        if instance.status == 'waiting':
+            instance.status = 'withdrawn'
+            instance.save(update_fields=['status'])
@@ -0,0 +1,81 @@
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .availability import BLOCKING_STATUSES
+from .booking import SLOT_CONSTRAINT
+from .models import Appointment, WaitlistEntry
+
+
+class SlotNotFull(Exception):
+    """The slot is free, so there is nothing to wait for"""
+
+    def __init__(self, message='This time slot is free, book it directly.'):
+        super().__init__(message)
+
+
+def slot_taken(doctor_id, date, time):
+    return Appointment.objects.filter(
+        doctor_id=doctor_id, date=date, time=time, status__in=BLOCKING_STATUSES,
+    ).exists()
+
+
+def join_waitlist(patient, doctor, date, time, reason, phone):
+    """Queue `patient` for a full slot; joining twice returns the existing entry"""
+    if not slot_taken(doctor.pk, date, time):
+        raise SlotNotFull()
+    try:
+        with transaction.atomic():
+            return WaitlistEntry.objects.create(
+                patient=patient, doctor=doctor, date=date, time=time, reason=reason, phone=phone,
+            )
+    except IntegrityError:
+        return WaitlistEntry.objects.get(patient=patient, doctor=doctor, date=date, time=time, status='waiting')
+
+
+def freed_slot(before, after=None):
+    """The (doctor id, date, time) an appointment change released, or None.
+
+    `before` and `after` are (doctor id, date, time, status) tuples; no
+    `after` means the appointment was deleted.
+    """
+    if before[3] not in BLOCKING_STATUSES:
+        return None
+    if after is None or after[3] not in BLOCKING_STATUSES or after[:3] != before[:3]:
+        return before[:3]
+    return None
+
+
+def promote_next(doctor_id, date, time):
+    """Book the slot for the first patient waiting for it, in the caller's transaction.
+
+    The queue head is claimed with SELECT ... FOR UPDATE SKIP LOCKED, so
+    concurrent cancellations never wait on each other's queue rows. If
+    someone else books the slot first, the booking hits the slot
+    constraint, the savepoint rolls back and the entry keeps waiting.
+    Returns the new appointment or None.
+    """
+    if date < timezone.now().date():
+        return None
+    entry = (
+        WaitlistEntry.objects.select_for_update(skip_locked=True)
+        .filter(doctor_id=doctor_id, date=date, time=time, status='waiting')
+        .order_by('created_at', 'id')
+        .first()
+    )
+    if entry is None:
+        return None
+    try:
+        with transaction.atomic():
+            appointment = Appointment.objects.create(
+                patient_id=entry.patient_id, doctor_id=doctor_id, date=date, time=time,
+                reason=entry.reason, phone=entry.phone, status='confirmed',
+            )
+    except IntegrityError as exc:
+        if SLOT_CONSTRAINT in str(exc):
+            return None
+        raise
+    entry.status = 'promoted'
+    entry.appointment = appointment
+    entry.promoted_at = timezone.now()
+    entry.save(update_fields=['status', 'appointment', 'promoted_at'])
+    return appointment
@@ -21,7 +21,7 @@ DEBUG = os.getenv('DEBUG', 'True') == 'True'
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
 
 # Email
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_PORT = int(os.getenv('EMAIL_PORT', 587))
 EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
@@ -29,6 +29,20 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Email outbox (core.outbox). By default each commit that queues email drains the
+# outbox from a background thread; retries go out with the next drain. At scale,
+# run `manage.py send_outbox --loop` as a worker and set EMAIL_OUTBOX_DRAIN_ON_COMMIT=False
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', 100))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 8))
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = int(os.getenv('EMAIL_OUTBOX_RETRY_BASE_SECONDS', 30))
+EMAIL_OUTBOX_RETRY_MAX_SECONDS = int(os.getenv('EMAIL_OUTBOX_RETRY_MAX_SECONDS', 3600))
+EMAIL_OUTBOX_DRAIN_ON_COMMIT = os.getenv('EMAIL_OUTBOX_DRAIN_ON_COMMIT', 'True') == 'True'
+
+# Status sweeper (core.sweeper): `manage.py sweep_statuses` from cron, or a
+# background thread in each web process every STATUS_SWEEP_INTERVAL seconds (0 = off)
+STATUS_SWEEP_INTERVAL = int(os.getenv('STATUS_SWEEP_INTERVAL', 0))
+STATUS_SWEEP_BATCH_SIZE = int(os.getenv('STATUS_SWEEP_BATCH_SIZE', 1000))
+
 AUTH_USER_MODEL = 'core.User'
 
 # CORS
@@ -59,6 +73,8 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
+    'x-cart-token',
 ]
 TEMPLATES = [
     {
@@ -86,6 +102,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
    'django.contrib.sites',  # Needed for some auth packages
     'django.contrib.humanize',
+    'django.contrib.postgres',
     # Third-party
     'rest_framework',
     'corsheaders',
@@ -101,7 +118,7 @@ INSTALLED_APPS = [
     'appointments',
     'prescriptions',
     'products',
-    # 'orders',
+    'orders',
     # 'reviews',
    'face_shape',
 ]
@@ -130,6 +147,17 @@ MIDDLEWARE = [
 
 ...
 
+# Cache
+# File based by default so every worker process shares the catalog version
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / '.cache')),
+        'TIMEOUT': 300,
+    }
+}
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 600))
+
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / "staticfiles"
@@ -138,13 +166,27 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Product image variants, bounding boxes in pixels
+PRODUCT_IMAGE_VARIANTS = {
+    'thumbnail': (150, 150),
+    'card': (400, 400),
+    'zoom': (1200, 1200),
+}
+PRODUCT_IMAGE_WORKERS = int(os.getenv('PRODUCT_IMAGE_WORKERS', 2))
+PRODUCT_IMAGE_ASYNC = os.getenv('PRODUCT_IMAGE_ASYNC', 'True') == 'True'
+
+# Memory mapped "similar frames" feature matrix, shared by all workers on a host
+SIMILARITY_INDEX_DIR = os.getenv('SIMILARITY_INDEX_DIR', str(BASE_DIR / 'var' / 'similarity'))
+# Resume position of the media garbage collector, see core.media_gc
+MEDIA_GC_STATE_FILE = os.getenv('MEDIA_GC_STATE_FILE', str(BASE_DIR / 'var' / 'media_gc.json'))
+
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
       ),
       'DEFAULT_FILTER_BACKENDS': (
-        'django_filters.rest_framework.DjangoFilterBackend'
+        'django_filters.rest_framework.DjangoFilterBackend',
       ),
 }
 
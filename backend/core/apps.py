@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        if settings.STATUS_SWEEP_INTERVAL > 0:
+            # Started by the first request rather than here, so migrate, shell
+            # and other management commands don't spawn it
+            from .sweeper import start_periodic_sweeper
+            request_started.connect(start_periodic_sweeper, dispatch_uid='core.start_periodic_sweeper')
@@ -0,0 +1,37 @@
+# core/conditional.py
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """Strong ETag from the string form of `parts`"""
+    raw = '|'.join(str(part) for part in parts)
+    return '"%s"' % hashlib.sha1(raw.encode()).hexdigest()
+
+
+def set_validators(response, etag=None, last_modified=None, private=False):
+    """Attach ETag / Last-Modified and ask clients to revalidate before reuse"""
+    if etag:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    if private:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def not_modified(request, etag=None, last_modified=None, private=False):
+    """Return a 304 (or 412) response when the request's validators still match.
+
+    `last_modified` is a Unix timestamp. Call this before fetching or
+    serializing anything so a matching request costs nothing but the
+    validator lookup. Returns None when the full response is needed.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        return None
+    return set_validators(response, etag, last_modified, private)
@@ -0,0 +1,118 @@
+# core/fieldsets.py
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import BaseSerializer
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def _split(value):
+    return {name.strip() for name in value.split(',') if name.strip()} if value else set()
+
+
+def requested_fields(request):
+    """Return (selected names or None, omitted names) from ?fields= / ?omit="""
+    if request is None or request.method not in SAFE_METHODS:
+        return None, set()
+    params = getattr(request, 'query_params', request.GET)
+    selected = _split(params.get(FIELDS_PARAM))
+    return selected or None, _split(params.get(OMIT_PARAM))
+
+
+class SparseFieldsMixin:
+    """Serializer mixin for sparse fieldsets on read requests.
+
+    `?fields=id,name` keeps only those output fields and `?omit=description`
+    drops some. Unrequested fields, SerializerMethodFields included, are
+    removed before serialization so they cost nothing. Write-only fields
+    are left alone. `only_fields` maps output fields that don't have a plain
+    model source (method fields) to the ORM paths they read, so that
+    `sparse_queryset` can still narrow the SQL.
+    """
+    only_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.selected_fields, self.omitted_fields = requested_fields(self.context.get('request'))
+        self.is_sparse = self.selected_fields is not None or bool(self.omitted_fields)
+        if self.is_sparse:
+            for name, field in list(self.fields.items()):
+                if not field.write_only and not self.wants(name):
+                    self.fields.pop(name)
+
+    def wants(self, name):
+        if self.selected_fields is not None and name not in self.selected_fields:
+            return False
+        return name not in self.omitted_fields
+
+
+def _orm_path(model, attrs):
+    """ORM lookup path for a serializer source, or None if it is not a plain column"""
+    parts = []
+    for index, attr in enumerate(attrs):
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete or field.many_to_many:
+            return None
+        parts.append(attr)
+        if index < len(attrs) - 1:
+            if not field.is_relation:
+                return None
+            model = field.related_model
+    return '__'.join(parts)
+
+
+def sparse_queryset(queryset, serializer, extra=()):
+    """Load only the columns a sparse serializer reads, via .only().
+
+    Relations are re-selected to exactly those the remaining fields traverse.
+    If any field reads something that is not a plain column (a method field
+    without an `only_fields` entry, a property), the queryset is returned
+    unchanged. `extra` adds columns needed outside the serializer.
+    """
+    serializer = getattr(serializer, 'child', serializer)
+    if not getattr(serializer, 'is_sparse', False):
+        return queryset
+
+    model = queryset.model
+    paths = {model._meta.pk.name, *extra}
+    relations = set()
+    for field in serializer._readable_fields:
+        if field.field_name in serializer.only_fields:
+            paths.update(serializer.only_fields[field.field_name])
+            continue
+        if field.source == '*':
+            return queryset
+        path = _orm_path(model, field.source_attrs)
+        if path is None:
+            return queryset
+        paths.add(path)
+        if isinstance(field, BaseSerializer):
+            # A nested serializer reads the whole related row
+            relations.add(path)
+
+    for path in paths:
+        parts = path.split('__')
+        relations.update('__'.join(parts[:end]) for end in range(1, len(parts)))
+    queryset = queryset.select_related(None)
+    if relations:
+        queryset = queryset.select_related(*relations)
+    return queryset.only(*paths)
+
+
+class SparseQuerysetMixin:
+    """Generic view mixin that narrows the SQL of read requests to the requested fields"""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method in SAFE_METHODS:
+            # Cursor pagination reads its position from the ordering columns
+            ordering = getattr(self.paginator, 'ordering', None) or ()
+            if isinstance(ordering, str):
+                ordering = (ordering,)
+            extra = [name.lstrip('-') for name in ordering]
+            queryset = sparse_queryset(queryset, self.get_serializer(), extra)
+        return queryset
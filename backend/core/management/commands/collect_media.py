@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from core.media_gc import MANAGED_DIRS, MediaCollector
+
+
+class Command(BaseCommand):
+    help = (
+        f"Delete files under MEDIA_ROOT ({', '.join(MANAGED_DIRS)}) that no product, accessory "
+        "or face shape result references. Meant to run from cron; with --max-seconds a run "
+        "stops early and the next one picks up where it left off."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report orphans without deleting them')
+        parser.add_argument('--min-age', type=int, default=86400, help='Keep files modified in the last N seconds')
+        parser.add_argument('--batch-size', type=int, default=500, help='Orphans deleted per batch')
+        parser.add_argument('--max-seconds', type=float, default=None, help='Stop after this long and resume next run')
+
+    def handle(self, *args, **options):
+        verbose = options['verbosity'] > 1
+        collector = MediaCollector(
+            min_age=options['min_age'],
+            batch_size=options['batch_size'],
+            max_seconds=options['max_seconds'],
+            dry_run=options['dry_run'],
+            log=self.stdout.write if verbose else None,
+        )
+        stats = collector.run()
+        done = 'would delete' if options['dry_run'] else 'deleted'
+        self.stdout.write(
+            f"Scanned {stats['scanned']} files, {done} {stats['deleted']} orphans "
+            f"({stats['bytes'] / 1024 / 1024:.1f} MiB)"
+        )
+        if stats['complete']:
+            self.stdout.write(self.style.SUCCESS('Media tree fully scanned.'))
+        else:
+            self.stdout.write(f"Time budget reached, next run resumes after {stats['resume_after']}")
@@ -0,0 +1,74 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.outbox import drain, drain_all, queue_metrics
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued emails from the outbox. Each batch goes out over one mail connection; "
+        "with --loop it keeps polling, and --workers runs that many draining threads side by side."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.EMAIL_OUTBOX_BATCH_SIZE, help='Emails per batch')
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting once drained')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--workers', type=int, default=1, help='Draining threads, each with its own connection')
+        parser.add_argument('--stats', action='store_true', help='Only print queue metrics')
+
+    def _work(self, batch_size, interval, stop, totals, lock):
+        try:
+            while not stop.is_set():
+                stats = drain(batch_size)
+                with lock:
+                    for name, value in stats.items():
+                        totals[name] += value
+                if not stats['claimed']:
+                    stop.wait(interval)
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for name, value in queue_metrics().items():
+                self.stdout.write(f'{name}: {value}')
+            return
+
+        if not options['loop']:
+            totals = drain_all(options['batch_size'])
+            self.stdout.write(
+                f"Sent {totals['sent']}, retrying {totals['retried']}, failed {totals['failed']} "
+                f"in {totals['seconds']}s"
+            )
+            return
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        totals = {'claimed': 0, 'sent': 0, 'retried': 0, 'failed': 0}
+        threads = [
+            threading.Thread(
+                target=self._work, name=f'send-outbox-{index}', daemon=True,
+                args=(options['batch_size'], options['interval'], stop, totals, lock),
+            )
+            for index in range(options['workers'])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"Draining the outbox with {len(threads)} worker(s), Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(60)
+                with lock:
+                    self.stdout.write(
+                        f"sent {totals['sent']}, retrying {totals['retried']}, failed {totals['failed']}; "
+                        f"pending {queue_metrics()['pending']}"
+                    )
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.sweeper import sweep_statuses
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark past-due confirmed/pending appointments completed and expire prescriptions "
+        "past their expiry date, in bounded batches. Meant to run from cron, or set "
+        "STATUS_SWEEP_INTERVAL to run it inside the web process instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.STATUS_SWEEP_BATCH_SIZE, help='Rows updated per statement',
+        )
+
+    def handle(self, *args, **options):
+        stats = sweep_statuses(options['batch_size'])
+        for name in ('appointments', 'prescriptions'):
+            row = stats[name]
+            self.stdout.write(f"{name}: {row['updated']} updated in {row['batches']} batches, {row['seconds']}s")
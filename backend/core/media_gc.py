@@ -0,0 +1,140 @@
+import json
+import os
+import time
+
+from django.conf import settings
+
+from face_shape.models import FaceShapeResult
+from products.models import Accessory, Product
+
+# Top level MEDIA_ROOT directories whose files are owned by a model field
+MANAGED_DIRS = ('accessories', 'products', 'uploads')
+
+
+def referenced_paths():
+    """Every media path a row points at: product images and their variants, accessory and face shape images"""
+    paths = set()
+    rows = Product.objects.values_list('images', 'image_variants')
+    for images, variants in rows.iterator(chunk_size=5000):
+        paths.update(images or [])
+        for files in (variants or {}).values():
+            for kinds in files.values():
+                paths.update(kinds.values())
+    for model in (Accessory, FaceShapeResult):
+        names = model.objects.exclude(image='').exclude(image__isnull=True).values_list('image', flat=True)
+        paths.update(names.iterator(chunk_size=5000))
+    return paths
+
+
+def walk(root, start_after=None, top_level=None):
+    """Yield (relative path, DirEntry) of files under `root`, in path order.
+
+    Directories are read with os.scandir one at a time, so memory stays flat
+    however many files there are. With `start_after`, everything up to and
+    including that path is skipped without descending into it. `top_level`
+    limits the walk to those directories directly under `root`.
+    """
+    cursor = tuple(start_after.split('/')) if start_after else ()
+    stack = [((), root)]
+    while stack:
+        parts, directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except FileNotFoundError:
+            continue
+        subdirs = []
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            if not parts and top_level is not None and entry.name not in top_level:
+                continue
+            path = parts + (entry.name,)
+            if entry.is_dir(follow_symlinks=False):
+                # Skip subtrees that sort entirely before the cursor
+                if path >= cursor[:len(path)]:
+                    subdirs.append((path, entry.path))
+            elif entry.is_file(follow_symlinks=False) and path > cursor:
+                yield '/'.join(path), entry
+        stack.extend(reversed(subdirs))
+
+
+class MediaCollector:
+    """Deletes media files no row references, in batches and within a time budget.
+
+    Files younger than `min_age` seconds are kept, so uploads whose row has
+    not committed yet survive; storing an upload that already exists
+    refreshes its mtime for the same reason (see products.images). A run
+    that hits its budget saves its position and the next run resumes there.
+    """
+
+    def __init__(self, min_age=86400, batch_size=500, max_seconds=None, dry_run=False, state_file=None, log=None):
+        self.min_age = min_age
+        self.batch_size = batch_size
+        self.max_seconds = max_seconds
+        self.dry_run = dry_run
+        self.state_file = state_file or settings.MEDIA_GC_STATE_FILE
+        self.log = log or (lambda message: None)
+        self.stats = {'scanned': 0, 'orphans': 0, 'deleted': 0, 'bytes': 0, 'complete': False}
+
+    def _load_cursor(self):
+        try:
+            with open(self.state_file) as fh:
+                return json.load(fh).get('cursor')
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _save_cursor(self, cursor):
+        if self.dry_run:
+            return
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        with open(self.state_file + '.tmp', 'w') as fh:
+            json.dump({'cursor': cursor}, fh)
+        os.replace(self.state_file + '.tmp', self.state_file)
+
+    def _delete(self, batch):
+        cutoff = time.time() - self.min_age
+        for path, full_path in batch:
+            try:
+                # Re-check, a reused upload may have been touched since the scan
+                stat = os.stat(full_path)
+                if stat.st_mtime > cutoff:
+                    continue
+                if self.dry_run:
+                    self.log(f'would delete {path}')
+                else:
+                    os.unlink(full_path)
+                    self.log(f'deleted {path}')
+            except FileNotFoundError:
+                continue
+            self.stats['deleted'] += 1
+            self.stats['bytes'] += stat.st_size
+
+    def run(self):
+        started = time.monotonic()
+        referenced = referenced_paths()
+        root = str(settings.MEDIA_ROOT)
+        cutoff = time.time() - self.min_age
+        cursor = self._load_cursor()
+        last = None
+        batch = []
+
+        for path, entry in walk(root, cursor, top_level=MANAGED_DIRS):
+            self.stats['scanned'] += 1
+            last = path
+            if path not in referenced and entry.stat(follow_symlinks=False).st_mtime <= cutoff:
+                self.stats['orphans'] += 1
+                batch.append((path, entry.path))
+                if len(batch) >= self.batch_size:
+                    self._delete(batch)
+                    batch = []
+            if self.max_seconds is not None and time.monotonic() - started > self.max_seconds:
+                self._delete(batch)
+                self._save_cursor(last)
+                self.stats['resume_after'] = last
+                return self.stats
+
+        self._delete(batch)
+        self._save_cursor(None)
+        self.stats['complete'] = True
+        return self.stats
@@ -54,6 +54,7 @@ class CustomerProfile(models.Model):
     state = models.CharField(max_length=100, blank=True, null=True)
     zip_code = models.CharField(max_length=20)
     country = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Profile of {self.user.name}"
@@ -80,4 +81,37 @@ class OTP(models.Model):
             user=user,
             code=code,
             expires_at=expires_at
-        )
\ No newline at end of file
+        )
+
+
+class OutboundEmail(models.Model):
+    """Transactional outbox: emails are queued with the rows they are about and sent by core.outbox"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255, blank=True)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker's queue scan: due pending emails, oldest first
+            models.Index(
+                fields=['next_attempt_at'], name='outbound_email_due_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
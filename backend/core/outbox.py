@@ -0,0 +1,172 @@
+# core/outbox.py
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection as db_connection, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_retry_timer = None
+
+
+def queue_email(subject, body, to, html_body='', from_email=None):
+    """Queue an email in the current transaction; it is only sent if that commits"""
+    email = OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        html_body=html_body or '',
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL or '',
+        to=list(to),
+    )
+    if settings.EMAIL_OUTBOX_DRAIN_ON_COMMIT:
+        transaction.on_commit(_kick)
+    return email
+
+
+def backoff(attempts):
+    """Delay before retry number `attempts`: base * 2^(attempts - 1), capped"""
+    delay = settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.EMAIL_OUTBOX_RETRY_MAX_SECONDS))
+
+
+def _message(email, connection):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or None,
+        to=email.to,
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def drain(batch_size=None, connection=None):
+    """Send one batch of due emails over a single mail connection.
+
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so any number
+    of workers can drain concurrently without sending an email twice. A
+    failed email is retried with exponential backoff and marked failed
+    after EMAIL_OUTBOX_MAX_ATTEMPTS. Returns counters for this batch.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    stats = {'claimed': 0, 'sent': 0, 'retried': 0, 'failed': 0}
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=timezone.now())
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        stats['claimed'] = len(emails)
+        if not emails:
+            return stats
+
+        connection = connection or get_connection(fail_silently=False)
+        sent, failed = [], []
+        try:
+            connection.open()
+        except Exception as exc:
+            failed = [(email, exc) for email in emails]
+        else:
+            try:
+                for email in emails:
+                    try:
+                        # One message at a time over the open connection, so a
+                        # rejected recipient only fails its own email
+                        connection.send_messages([_message(email, connection)])
+                        sent.append(email)
+                    except Exception as exc:
+                        failed.append((email, exc))
+            finally:
+                connection.close()
+
+        now = timezone.now()
+        if sent:
+            OutboundEmail.objects.filter(pk__in=[email.pk for email in sent]).update(
+                status='sent', sent_at=now, last_error='',
+            )
+            stats['sent'] = len(sent)
+        for email, exc in failed:
+            email.attempts += 1
+            email.last_error = f'{type(exc).__name__}: {exc}'[:2000]
+            if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                email.status = 'failed'
+                stats['failed'] += 1
+                logger.error('Giving up on email %s after %s attempts: %s', email.pk, email.attempts, exc)
+            else:
+                email.next_attempt_at = now + backoff(email.attempts)
+                stats['retried'] += 1
+        if failed:
+            OutboundEmail.objects.bulk_update(
+                [email for email, _ in failed], ['attempts', 'last_error', 'status', 'next_attempt_at'],
+            )
+    return stats
+
+
+def drain_all(batch_size=None, max_seconds=None):
+    """Drain batches until the queue has nothing due (or `max_seconds` pass); returns summed counters"""
+    started = time.monotonic()
+    totals = {'claimed': 0, 'sent': 0, 'retried': 0, 'failed': 0}
+    while True:
+        stats = drain(batch_size)
+        for name, value in stats.items():
+            totals[name] += value
+        # Retried emails are due later, so an empty claim means the queue is drained
+        if not stats['claimed'] or (max_seconds is not None and time.monotonic() - started > max_seconds):
+            break
+    totals['seconds'] = round(time.monotonic() - started, 3)
+    return totals
+
+
+def queue_metrics():
+    """Queue depth per status and the age in seconds of the oldest due email"""
+    counts = dict(OutboundEmail.objects.values_list('status').annotate(count=Count('id')).order_by())
+    oldest = OutboundEmail.objects.filter(status='pending', next_attempt_at__lte=timezone.now()).aggregate(
+        oldest=Min('created_at')
+    )['oldest']
+    return {
+        'pending': counts.get('pending', 0),
+        'sent': counts.get('sent', 0),
+        'failed': counts.get('failed', 0),
+        'oldest_due_seconds': round((timezone.now() - oldest).total_seconds(), 1) if oldest else 0,
+    }
+
+
+def _drain_in_worker():
+    try:
+        drain_all(max_seconds=30)
+        _schedule_retry()
+    except Exception:
+        logger.exception('Email outbox drain failed')
+    finally:
+        db_connection.close()
+
+
+def _schedule_retry():
+    """Without a worker process nothing else drains, so wake up for the next retry ourselves"""
+    global _retry_timer
+    retry_at = OutboundEmail.objects.filter(status='pending').aggregate(at=Min('next_attempt_at'))['at']
+    if retry_at is None or (_retry_timer is not None and _retry_timer.is_alive()):
+        return
+    _retry_timer = threading.Timer(max((retry_at - timezone.now()).total_seconds(), 1), _kick)
+    _retry_timer.daemon = True
+    _retry_timer.start()
+
+
+def _kick():
+    """Drain right after commit on a background thread, for setups without a worker process"""
+    global _executor
+    if _executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='email-outbox')
+    _executor.submit(_drain_in_worker)
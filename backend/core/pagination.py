@@ -0,0 +1,128 @@
+# core/pagination.py
+import json
+
+from django.db.models import F, Q
+from django.db.models.fields.tuple_lookups import Tuple, TupleGreaterThan, TupleLessThan
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+def _invert(field):
+    return field[1:] if field.startswith('-') else '-' + field
+
+
+def keyset_filter(ordering, position):
+    """Rows strictly after `position` (one value per ordering field) in `ordering`.
+
+    When every field sorts the same way this is a single row comparison,
+    `(created_at, id) < (%s, %s)`, which PostgreSQL answers with a range
+    scan on the matching composite index. Mixed directions such as
+    ('-date', 'time', '-id') can't be one row comparison, so they expand to
+    its equivalent `date < d OR (date = d AND time > t) OR (...)`.
+    """
+    names = [field.lstrip('-') for field in ordering]
+    descending = {field.startswith('-') for field in ordering}
+    if len(descending) == 1:
+        lookup = TupleLessThan if descending.pop() else TupleGreaterThan
+        return lookup(Tuple(*[F(name) for name in names]), tuple(position))
+
+    query, equal = Q(), {}
+    for field, name, value in zip(ordering, names, position):
+        query |= Q(**equal, **{f"{name}__{'lt' if field.startswith('-') else 'gt'}": value})
+        equal[name] = value
+    return query
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor (keyset) pagination that never runs a COUNT(*) or an OFFSET.
+
+    Pagination is opt-in so existing clients keep receiving plain lists:
+    a request is only paginated when it passes `cursor` or `page_size`.
+    The cursor holds the values of every ordering field of the last row
+    seen, and the next page is filtered with a row comparison on them, so
+    a page deep into a busy day costs the same as the first one. The
+    ordering must end in a unique column (`id`) for pages to be stable.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-created_at', '-id')
+
+    def get_page_size(self, request):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().get_page_size(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        # A previous page is the next page of the reversed ordering
+        ordering = tuple(_invert(field) for field in self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None and self.cursor.position is not None:
+            queryset = queryset.filter(keyset_filter(ordering, self.cursor.position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = self.cursor is not None, has_more
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self._position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self._position(self.page[0])))
+
+    def _position(self, instance):
+        values = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(str(value))
+        return json.dumps(values)
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            position = json.loads(cursor.position)
+        except ValueError:
+            position = None
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            # Cursors from before keyset positions, or for another ordering
+            raise NotFound(self.invalid_cursor_message)
+        return cursor._replace(position=position)
+
+
+class CreatedAtCursorPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class AppointmentCursorPagination(KeysetPagination):
+    ordering = ('-date', 'time', '-id')
+
+
+class IdCursorPagination(KeysetPagination):
+    ordering = ('-id',)
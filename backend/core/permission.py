@@ -13,6 +13,11 @@ class IsManufacturer(BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.role == 'manufacturer'
 
+class IsAdminOrManufacturer(BasePermission):
+    """Catalog writes: admins and manufacturers"""
+    def has_permission(self, request, view):
+        return request.user and request.user.role in ['admin', 'manufacturer']
+
 class IsDelivery(BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.role == 'delivery'
@@ -0,0 +1,90 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from appointments.models import Appointment
+from prescriptions.models import Prescription
+
+logger = logging.getLogger(__name__)
+
+LAST_RUN_KEY = 'status_sweep:last_run'
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def _sweep(queryset, values, batch_size):
+    """UPDATE the rows of `queryset` to `values` in chunks of `batch_size` ids.
+
+    Each chunk is its own short transaction; its ids are claimed with SKIP
+    LOCKED so a row a request is editing is left for the next run instead
+    of blocking the sweep. Returns (rows updated, chunks).
+    """
+    updated = batches = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                queryset.select_for_update(skip_locked=True).order_by().values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                return updated, batches
+            # Re-applying the filter keeps a row that changed since the scan untouched
+            updated += queryset.filter(pk__in=ids).update(**values)
+            batches += 1
+
+
+def sweep_statuses(batch_size=None):
+    """Complete past-due appointments and expire prescriptions past expiry_date.
+
+    Cancelled appointments stay cancelled. Past days are never part of the
+    availability cache, so nothing needs invalidating. Returns per model
+    counters and timings, also kept in the cache under LAST_RUN_KEY.
+    """
+    batch_size = batch_size or settings.STATUS_SWEEP_BATCH_SIZE
+    now = timezone.now()
+    targets = {
+        'appointments': (
+            Appointment.objects.filter(status__in=['confirmed', 'pending'], date__lt=now.date()),
+            {'status': 'completed', 'updated_at': now},
+        ),
+        'prescriptions': (
+            Prescription.objects.filter(status='active', expiry_date__lt=now),
+            {'status': 'expired'},
+        ),
+    }
+    stats = {'started_at': now.isoformat()}
+    for name, (queryset, values) in targets.items():
+        started = time.monotonic()
+        updated, batches = _sweep(queryset, values, batch_size)
+        stats[name] = {'updated': updated, 'batches': batches, 'seconds': round(time.monotonic() - started, 3)}
+    cache.set(LAST_RUN_KEY, stats, timeout=None)
+    logger.info('Status sweep: %s', stats)
+    return stats
+
+
+def _run_periodically(interval):
+    while True:
+        try:
+            sweep_statuses()
+        except Exception:
+            logger.exception('Status sweep failed')
+        finally:
+            connection.close()
+        time.sleep(interval)
+
+
+def start_periodic_sweeper(**kwargs):
+    """Start the in-process sweeper thread once per process (STATUS_SWEEP_INTERVAL > 0)"""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = threading.Thread(
+                target=_run_periodically, args=(settings.STATUS_SWEEP_INTERVAL,),
+                name='status-sweeper', daemon=True,
+            )
+            _runner.start()
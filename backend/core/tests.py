@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from appointments.models import Appointment
+from doctors.models import DoctorProfile
+from prescriptions.models import Prescription
+from .models import User
+from .sweeper import LAST_RUN_KEY, sweep_statuses
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SweepStatusesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        patient = User.objects.create_user(email='patient@example.com', name='Patient', password='x')
+        doctor_user = User.objects.create_user(email='doctor@example.com', name='Doctor', password='x', role='doctor')
+        doctor = DoctorProfile.objects.create(
+            user=doctor_user, specialization='Optometry', experience_years=5, qualifications='OD', biography='Bio',
+        )
+        today = timezone.now().date()
+        past = [today - timedelta(days=n) for n in range(1, 6)]
+        cls.past_due = Appointment.objects.bulk_create([
+            Appointment(
+                patient=patient, doctor=doctor, date=day, time='09:00', reason='Routine eye exam',
+                phone='0771234567', status='pending' if n % 2 else 'confirmed',
+            )
+            for n, day in enumerate(past)
+        ])
+        cls.cancelled = Appointment.objects.create(
+            patient=patient, doctor=doctor, date=past[0], time='10:30', reason='Routine eye exam',
+            phone='0771234567', status='cancelled',
+        )
+        cls.upcoming = Appointment.objects.create(
+            patient=patient, doctor=doctor, date=today, time='13:00', reason='Routine eye exam', phone='0771234567',
+        )
+
+        def prescription(expiry_date):
+            return Prescription.objects.create(
+                doctor=doctor_user, patient=patient, pupillary_distance=62, expiry_date=expiry_date,
+            )
+
+        cls.expired = prescription(timezone.now() - timedelta(days=1))
+        cls.current = prescription(timezone.now() + timedelta(days=30))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_sweep_completes_past_appointments_and_expires_prescriptions(self):
+        stats = sweep_statuses(batch_size=2)
+
+        self.assertEqual(stats['appointments']['updated'], 5)
+        # 5 rows in batches of 2, then one empty claim ends the loop
+        self.assertEqual(stats['appointments']['batches'], 3)
+        self.assertEqual(
+            set(Appointment.objects.filter(pk__in=[a.pk for a in self.past_due]).values_list('status', flat=True)),
+            {'completed'},
+        )
+        self.assertEqual(Appointment.objects.get(pk=self.cancelled.pk).status, 'cancelled')
+        self.assertEqual(Appointment.objects.get(pk=self.upcoming.pk).status, 'confirmed')
+
+        self.assertEqual(stats['prescriptions']['updated'], 1)
+        self.assertEqual(Prescription.objects.get(pk=self.expired.pk).status, 'expired')
+        self.assertEqual(Prescription.objects.get(pk=self.current.pk).status, 'active')
+        self.assertEqual(cache.get(LAST_RUN_KEY), stats)
+
+    def test_second_sweep_has_nothing_to_do(self):
+        sweep_statuses()
+        stats = sweep_statuses()
+        self.assertEqual(stats['appointments'], {**stats['appointments'], 'updated': 0, 'batches': 0})
+        self.assertEqual(stats['prescriptions']['updated'], 0)
@@ -1,11 +1,13 @@
 # users/utils.py
-from django.core.mail import send_mail
 from django.conf import settings
 
+from .outbox import queue_email
+
 def send_otp_email(email, otp_code):
+    """Queue the verification code email; it goes out once the caller's transaction commits"""
     subject = "Verify Your Email - Thusha Optical"
     message = f"Your verification code is: {otp_code}"
     email_from = settings.EMAIL_HOST_USER
     recipient_list = [email]
-    
-    send_mail(subject, message, email_from, recipient_list)
\ No newline at end of file
+
+    queue_email(subject, message, recipient_list, from_email=email_from)
@@ -5,7 +5,7 @@ from datetime import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from .models import User, OTP,CustomerProfile
 from .utils import send_otp_email
 from django.contrib.auth import get_user_model
@@ -16,10 +16,12 @@ from django.contrib.auth import authenticate
 from .serializers import ProfileSerializer
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import NotFound
+from .conditional import make_etag, not_modified, set_validators
 from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.hashers import check_password
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.throttling import AnonRateThrottle
+from orders.carts import cart_token, merge_anonymous_cart
 User = get_user_model()
 
 class RegisterView(APIView):
@@ -32,17 +34,18 @@ class RegisterView(APIView):
                 password = serializer.validated_data['password']
                 role = serializer.validated_data.get('role', 'customer')
 
-                # Create user
-                user = User.objects.create_user(
-                    email=email,
-                    name=name,
-                    password=password,
-                    role=role,
-                    is_active=False
-                )
+                # User, OTP and its email commit together or not at all
+                with transaction.atomic():
+                    user = User.objects.create_user(
+                        email=email,
+                        name=name,
+                        password=password,
+                        role=role,
+                        is_active=False
+                    )
 
-                otp = OTP.create_otp(user)
-                send_otp_email(user.email, otp.code)
+                    otp = OTP.create_otp(user)
+                    send_otp_email(user.email, otp.code)
 
                 return Response({
                     "message": "OTP sent to your email",
@@ -55,9 +58,7 @@ class RegisterView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             except Exception as e:
-                # Delete user if something goes wrong
-                if 'user' in locals():
-                    user.delete()
+                # The transaction rolled back, no half registered user is left
                 return Response(
                     {"error": "Failed to complete registration", "details": str(e)},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -131,8 +132,9 @@ class ResendOTPView(APIView):
                 if user.is_active:
                     return Response({"error": "User already verified"}, status=status.HTTP_400_BAD_REQUEST)
 
-                otp = OTP.create_otp(user)
-                send_otp_email(user.email, otp.code)
+                with transaction.atomic():
+                    otp = OTP.create_otp(user)
+                    send_otp_email(user.email, otp.code)
 
                 return Response({
                     "message": "New OTP sent to your email",
@@ -166,6 +168,7 @@ class LoginView(APIView):
 
         refresh = RefreshToken.for_user(user)
         update_last_login(None, user)
+        merge_anonymous_cart(cart_token(request), user)
         user_data = {
             "id": user.id,
             "name": user.name,
@@ -187,14 +190,21 @@ class ProfileView(APIView):
     def get(self, request):
         try:
             profile = CustomerProfile.objects.get(user=request.user)
-            serializer = ProfileSerializer(profile)
-            return Response({
-                **serializer.data,
-                'email': request.user.email
-            })
         except CustomerProfile.DoesNotExist:
             raise NotFound("Profile not found")
 
+        # name and email live on the user row, so they are part of the validator
+        etag = make_etag('profile', profile.pk, profile.updated_at.isoformat(), request.user.name, request.user.email)
+        response = not_modified(request, etag, private=True)
+        if response is not None:
+            return response
+
+        serializer = ProfileSerializer(profile)
+        return set_validators(Response({
+            **serializer.data,
+            'email': request.user.email
+        }), etag, private=True)
+
     def patch(self, request):
         try:
             profile = CustomerProfile.objects.get(user=request.user)
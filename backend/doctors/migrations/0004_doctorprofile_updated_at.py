@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0003_alter_doctorprofile_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctorprofile',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:10
+
+import json
+
+from django.db import migrations, models
+
+# Frozen copy of doctors.weekdays as of this migration, so later changes there can't alter it
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+def _day_index(name):
+    name = str(name).strip().strip('\'"*').strip().lower()
+    return WEEKDAYS.index(name) if name in WEEKDAYS else None
+
+
+def weekday_mask(value):
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            value = [part for part in value.split(',')]
+    if isinstance(value, dict):
+        names = [name for name, enabled in value.items() if enabled]
+    elif isinstance(value, (list, tuple)):
+        names = value
+    else:
+        names = []
+
+    mask = 0
+    for name in names:
+        index = _day_index(name)
+        if index is not None:
+            mask |= 1 << index
+    return mask
+
+
+def mask_to_availability(mask):
+    return {day: bool(mask & (1 << index)) for index, day in enumerate(WEEKDAYS)}
+
+
+def normalize_availability(apps, schema_editor):
+    """Rewrite every stored availability shape as the canonical dict and fill the mask"""
+    DoctorProfile = apps.get_model('doctors', 'DoctorProfile')
+    profiles = list(DoctorProfile.objects.only('id', 'availability'))
+    for profile in profiles:
+        profile.availability_mask = weekday_mask(profile.availability)
+        profile.availability = mask_to_availability(profile.availability_mask)
+    DoctorProfile.objects.bulk_update(profiles, ['availability', 'availability_mask'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0004_doctorprofile_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctorprofile',
+            name='availability_mask',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='doctorprofile',
+            name='availability',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.RunPython(normalize_availability, migrations.RunPython.noop),
+    ]
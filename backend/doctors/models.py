@@ -1,5 +1,13 @@
 from django.db import models
 from core.models import User  # Import from the 'core' app
+from .weekdays import MASKS_WITH_DAY, WEEKDAYS, mask_to_availability, weekday_mask
+
+
+class DoctorProfileQuerySet(models.QuerySet):
+    def available_on(self, date):
+        """Doctors working on `date`'s weekday; an indexed IN over the masks that have that day"""
+        return self.filter(availability_mask__in=MASKS_WITH_DAY[date.weekday()])
+
 
 class DoctorProfile(models.Model):
     user = models.OneToOneField(
@@ -13,20 +21,36 @@ class DoctorProfile(models.Model):
     experience_years = models.IntegerField()
     qualifications = models.CharField(max_length=255)
     biography = models.TextField()
-    availability = models.JSONField(default=list)  # Example: ["monday", "wednesday", "friday"]
+    # Canonical {"monday": true, ...}; any list/dict/string shape is normalised on save
+    availability = models.JSONField(default=dict)
+    # Bit 0 = Monday ... bit 6 = Sunday, kept in sync with `availability`
+    availability_mask = models.PositiveSmallIntegerField(default=0, db_index=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = DoctorProfileQuerySet.as_manager()
 
     def __str__(self):
         return f"Dr. {self.user.name} - {self.specialization}"
 
+    def save(self, *args, **kwargs):
+        self.availability_mask = weekday_mask(self.availability)
+        self.availability = mask_to_availability(self.availability_mask)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'availability' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'availability_mask'}
+        super().save(*args, **kwargs)
+
     def is_available_on_day(self, day):
         """Check if doctor is available on a given day (e.g., 'monday')"""
-        # Since availability is a list, we check if the day is in the list
-        return day.lower() in self.availability
-    
+        day = day.lower()
+        return day in WEEKDAYS and bool(self.availability_mask & (1 << WEEKDAYS.index(day)))
+
+    def is_available_on(self, date):
+        return bool(self.availability_mask & (1 << date.weekday()))
+
     def get_available_slots(self, date):
         """Get available time slots for a given date"""
-        day_of_week = date.strftime('%A').lower()
-        if not self.is_available_on_day(day_of_week):
+        if not self.is_available_on(date):
             return []
             
         # Get all possible time slots
@@ -38,4 +62,4 @@ class DoctorProfile(models.Model):
             status__in=['confirmed', 'pending']
         ).values_list('time', flat=True)
         
-        return [slot for slot in all_slots if slot not in booked_slots]
\ No newline at end of file
+        return [slot for slot in all_slots if slot not in booked_slots]
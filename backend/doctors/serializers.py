@@ -1,7 +1,8 @@
 from rest_framework import serializers
 from .models import DoctorProfile
+from core.fieldsets import SparseFieldsMixin
 
-class DoctorProfileSerializer(serializers.ModelSerializer):
+class DoctorProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     name = serializers.CharField(source='user.name')  # writable now
     email = serializers.EmailField(source='user.email', read_only=True)
 
@@ -9,7 +10,7 @@ class DoctorProfileSerializer(serializers.ModelSerializer):
         model = DoctorProfile
         fields = [
             'name', 'email', # name is writable, email read-only
-             id, 
+            'id',
             'specialization',
             'experience_years',
             'qualifications',
@@ -1,3 +1,53 @@
+from datetime import date
+
 from django.test import TestCase
 
-# Create your tests here.
+from core.models import User
+from .models import DoctorProfile
+from .weekdays import WEEKDAYS
+
+# 2026-10-19 is a Monday
+MONDAY = date(2026, 10, 19)
+
+
+class AvailabilityTests(TestCase):
+    """Any stored availability shape is normalised on save and queried through the weekday mask"""
+
+    def doctor(self, n, availability):
+        user = User.objects.create_user(email=f'doctor{n}@example.com', name=f'Doctor {n}', password='x', role='doctor')
+        return DoctorProfile.objects.create(
+            user=user, specialization='Optometry', experience_years=5, qualifications='OD', biography='Bio',
+            availability=availability,
+        )
+
+    def test_save_normalises_every_shape(self):
+        shapes = [
+            ['Monday', "'wednesday'", 'friday*'],
+            {'monday': True, 'tuesday': False, 'wednesday': True, 'friday': True},
+            '["monday", "wednesday", "friday"]',
+            'monday, wednesday ,friday',
+        ]
+        expected = {day: day in ('monday', 'wednesday', 'friday') for day in WEEKDAYS}
+        for n, shape in enumerate(shapes):
+            doctor = self.doctor(n, shape)
+            doctor.refresh_from_db()
+            self.assertEqual(doctor.availability, expected)
+            self.assertEqual(doctor.availability_mask, 0b10101)
+
+    def test_update_fields_keeps_the_mask_in_sync(self):
+        doctor = self.doctor(0, ['monday'])
+        doctor.availability = ['sunday']
+        doctor.save(update_fields=['availability'])
+        doctor.refresh_from_db()
+        self.assertEqual(doctor.availability_mask, 1 << 6)
+        self.assertTrue(doctor.is_available_on_day('Sunday'))
+
+    def test_available_on_matches_list_and_dict_shapes(self):
+        listed = self.doctor(0, ['monday', 'tuesday'])
+        keyed = self.doctor(1, {'monday': True, 'sunday': True, 'tuesday': False})
+        self.doctor(2, [])
+
+        self.assertEqual(set(DoctorProfile.objects.available_on(MONDAY)), {listed, keyed})
+        self.assertEqual(set(DoctorProfile.objects.available_on(date(2026, 10, 20))), {listed})
+        self.assertEqual(set(DoctorProfile.objects.available_on(date(2026, 10, 25))), {keyed})
+        self.assertFalse(DoctorProfile.objects.available_on(date(2026, 10, 22)).exists())
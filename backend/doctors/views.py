@@ -4,6 +4,7 @@ from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from .models import DoctorProfile
 from .serializers import DoctorProfileSerializer
+from core.conditional import make_etag, not_modified, set_validators
 
 class DoctorProfileView(APIView):
     permission_classes = [IsAuthenticated]
@@ -11,11 +12,20 @@ class DoctorProfileView(APIView):
     def get(self, request):
         try:
             profile = DoctorProfile.objects.get(user=request.user)
-            serializer = DoctorProfileSerializer(profile)
-            return Response(serializer.data)
         except DoctorProfile.DoesNotExist:
             return Response({'detail': 'Doctor profile not found.'}, status=status.HTTP_404_NOT_FOUND)
 
+        etag = make_etag(
+            'doctor-profile', profile.pk, profile.updated_at.isoformat(),
+            request.user.name, request.user.email, request.GET.urlencode(),
+        )
+        response = not_modified(request, etag, private=True)
+        if response is not None:
+            return response
+
+        serializer = DoctorProfileSerializer(profile, context={'request': request})
+        return set_validators(Response(serializer.data), etag, private=True)
+
     def put(self, request):
         try:
             profile = DoctorProfile.objects.get(user=request.user)
@@ -0,0 +1,42 @@
+import json
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+# Every mask (0-127) that has a given weekday's bit set, for `availability_mask__in`
+MASKS_WITH_DAY = [[mask for mask in range(1 << len(WEEKDAYS)) if mask & (1 << day)] for day in range(len(WEEKDAYS))]
+
+
+def _day_index(name):
+    # Older clients stored keys like "monday'", "'monday'" or "monday*"
+    name = str(name).strip().strip('\'"*').strip().lower()
+    return WEEKDAYS.index(name) if name in WEEKDAYS else None
+
+
+def weekday_mask(value):
+    """7-bit mask (bit 0 = Monday) from any stored availability shape.
+
+    Accepts a list of day names, a {day: bool} dict, or either as a JSON
+    string. Unknown days are ignored.
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            value = [part for part in value.split(',')]
+    if isinstance(value, dict):
+        names = [name for name, enabled in value.items() if enabled]
+    elif isinstance(value, (list, tuple)):
+        names = value
+    else:
+        names = []
+
+    mask = 0
+    for name in names:
+        index = _day_index(name)
+        if index is not None:
+            mask |= 1 << index
+    return mask
+
+
+def mask_to_availability(mask):
+    """Canonical JSON form of a mask: {day: bool} for all seven days"""
+    return {day: bool(mask & (1 << index)) for index, day in enumerate(WEEKDAYS)}
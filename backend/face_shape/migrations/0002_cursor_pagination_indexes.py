@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('face_shape', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['-created_at', '-id'], name='contact_created_id_idx'),
+        ),
+    ]
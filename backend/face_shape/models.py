@@ -20,5 +20,10 @@ class ContactMessage(models.Model):
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='contact_created_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.subject}"
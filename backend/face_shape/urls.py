@@ -1,6 +1,6 @@
 from django.urls import path
 
-from .views import contact_messages_list
+from .views import contact_messages_list, contact_messages_export
 from .views import DetectFaceShape
 from .views import DetectFaceShape, submit_contact_message
 
@@ -10,6 +10,7 @@ urlpatterns = [
     path("detect/", DetectFaceShape.as_view(), name="detect-face-shape"),
     path('submit/', submit_contact_message, name='submit-contact'),
      path('messages/', contact_messages_list, name='contact-messages-list'),
+     path('messages/export/', contact_messages_export, name='contact-messages-export'),
    
     
 
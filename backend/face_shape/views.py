@@ -34,9 +34,13 @@ class DetectFaceShape(APIView):
 
 from rest_framework import status
 from rest_framework.response import Response
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
 from .serializers import ContactMessageSerializer
 from .models import ContactMessage
+from core.pagination import CreatedAtCursorPagination
+from core.permission import IsAdmin
+from core.streaming import export_response, get_export_format
 
 @api_view(['POST'])
 def submit_contact_message(request):
@@ -50,5 +54,24 @@ def submit_contact_message(request):
 @api_view(['GET'])
 def contact_messages_list(request):
     messages = ContactMessage.objects.all().order_by('-created_at')
+    paginator = CreatedAtCursorPagination()
+    page = paginator.paginate_queryset(messages, request)
+    if page is not None:
+        serializer = ContactMessageSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     serializer = ContactMessageSerializer(messages, many=True)
-    return Response(serializer.data)
\ No newline at end of file
+    return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdmin])
+def contact_messages_export(request):
+    file_format = get_export_format(request)
+    if file_format is None:
+        return Response({"error": "file_format must be csv or ndjson."}, status=status.HTTP_400_BAD_REQUEST)
+    fields = [
+        ('id', 'id'), ('name', 'name'), ('email', 'email'), ('phone', 'phone'),
+        ('subject', 'subject'), ('message', 'message'), ('created_at', 'created_at'),
+    ]
+    messages = ContactMessage.objects.order_by('-created_at', '-id')
+    return export_response(messages, fields, file_format, 'contact-messages')
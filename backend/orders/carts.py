@@ -0,0 +1,152 @@
+import uuid
+from decimal import Decimal
+
+from django.db import transaction
+
+from products.models import Accessory, Product
+from products.readers import media_url_builder
+from .models import Cart, CartItem
+from .placement import CENT, MODELS, order_totals
+
+CART_TOKEN_HEADER = 'X-Cart-Token'
+MAX_QUANTITY = 1000
+
+
+def cart_token(request):
+    """The anonymous cart token sent by the client, or None"""
+    try:
+        return uuid.UUID(request.headers.get(CART_TOKEN_HEADER, ''))
+    except ValueError:
+        return None
+
+
+def get_cart(request, create=False):
+    """The cart of the logged in user, else of the X-Cart-Token holder"""
+    if request.user.is_authenticated:
+        if create:
+            return Cart.objects.get_or_create(user=request.user)[0]
+        return Cart.objects.filter(user=request.user).first()
+    token = cart_token(request)
+    cart = Cart.objects.filter(token=token, user__isnull=True).first() if token else None
+    if cart is None and create:
+        cart = Cart.objects.create()
+    return cart
+
+
+def _write(cart, quantities, replace=False):
+    """Set line quantities on a locked cart, a quantity of 0 removes the line"""
+    items = CartItem.objects.filter(cart=cart)
+    if replace:
+        items.delete()
+    else:
+        for kind in MODELS:
+            ids = [pk for (line_kind, pk) in quantities if line_kind == kind]
+            if ids:
+                items.filter(**{kind + '_id__in': ids}).delete()
+    CartItem.objects.bulk_create([
+        CartItem(cart=cart, quantity=min(quantity, MAX_QUANTITY), **{kind + '_id': pk})
+        for (kind, pk), quantity in sorted(quantities.items())
+        if quantity > 0
+    ])
+    cart.save(update_fields=['updated_at'])
+
+
+def missing_items(quantities):
+    """[(kind, id)] of lines whose product or accessory doesn't exist"""
+    missing = []
+    for kind, model in MODELS.items():
+        ids = {pk for (line_kind, pk) in quantities if line_kind == kind}
+        if ids:
+            found = set(model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+            missing.extend((kind, pk) for pk in sorted(ids - found))
+    return missing
+
+
+def update_cart(cart, quantities, replace=False):
+    """Replace the cart contents (`replace`) or upsert the given lines"""
+    with transaction.atomic():
+        # Serialises concurrent edits of one cart (two tabs, a retried request)
+        cart = Cart.objects.select_for_update().get(pk=cart.pk)
+        _write(cart, quantities, replace)
+    return cart
+
+
+def merge_anonymous_cart(token, user):
+    """Fold the anonymous cart `token` into the user's cart at login, adding up quantities"""
+    if token is None:
+        return
+    with transaction.atomic():
+        anonymous = Cart.objects.select_for_update().filter(token=token, user__isnull=True).first()
+        if anonymous is None:
+            return
+        cart, created = Cart.objects.get_or_create(user=user)
+        if created:
+            # Nothing to merge with, keep the anonymous lines as they are
+            CartItem.objects.filter(cart=anonymous).update(cart=cart)
+        else:
+            cart = Cart.objects.select_for_update().get(pk=cart.pk)
+            quantities = {}
+            for cart_id, product, accessory, quantity in CartItem.objects.filter(
+                cart__in=[cart, anonymous]
+            ).values_list('cart_id', 'product_id', 'accessory_id', 'quantity'):
+                key = ('product', product) if product is not None else ('accessory', accessory)
+                quantities[key] = quantities.get(key, 0) + quantity
+            _write(cart, quantities, replace=True)
+        anonymous.delete()
+
+
+def rehydrate(cart, request, delivery_option=None):
+    """Cart lines with current name, price, stock and first image, plus Decimal totals.
+
+    One query for the lines, one for their products and one for their
+    accessories, however long the cart is.
+    """
+    lines = list(cart.items.values('id', 'product_id', 'accessory_id', 'quantity')) if cart else []
+    product_ids = [line['product_id'] for line in lines if line['product_id'] is not None]
+    accessory_ids = [line['accessory_id'] for line in lines if line['accessory_id'] is not None]
+    products = {
+        row['id']: row
+        for row in Product.objects.filter(pk__in=product_ids).values('id', 'name', 'price', 'stock', 'images')
+    } if product_ids else {}
+    accessories = {
+        row['id']: row
+        for row in Accessory.objects.filter(pk__in=accessory_ids).values('id', 'name', 'price', 'stock', 'image')
+    } if accessory_ids else {}
+
+    media_url = media_url_builder(request)
+    items = []
+    subtotal = Decimal('0')
+    for line in lines:
+        if line['product_id'] is not None:
+            kind, row = 'product', products.get(line['product_id'])
+        else:
+            kind, row = 'accessory', accessories.get(line['accessory_id'])
+        if row is None:
+            # Deleted between the two queries, the line is cascaded away with it
+            continue
+        if kind == 'product':
+            image = row['images'][0] if row['images'] else None
+        else:
+            image = row['image'] or None
+        line_total = row['price'] * line['quantity']
+        subtotal += line_total
+        items.append({
+            'id': line['id'],
+            kind: row['id'],
+            'name': row['name'],
+            'price': str(row['price'].quantize(CENT)),
+            'quantity': line['quantity'],
+            'stock': row['stock'],
+            'in_stock': row['stock'] >= line['quantity'],
+            'image': media_url(image) if image else None,
+            'line_total': str(line_total.quantize(CENT)),
+        })
+
+    totals = order_totals(subtotal, delivery_option)
+    return {
+        # Anonymous clients keep this and send it back as X-Cart-Token
+        'token': str(cart.token) if cart and cart.user_id is None else None,
+        'items': items,
+        'item_count': sum(item['quantity'] for item in items),
+        **{name: str(value.quantize(CENT)) for name, value in totals.items()},
+    }
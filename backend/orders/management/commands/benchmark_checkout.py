@@ -0,0 +1,107 @@
+import statistics
+import time
+import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.models import User
+from orders.models import Order
+from orders.placement import OutOfStock, place_order
+from products.models import Product
+
+DETAILS = {
+    'payment_method': 'card', 'delivery_option': 'pickup',
+    'name': 'Benchmark Buyer', 'email': 'buyer@example.com', 'phone': '0000000000',
+}
+
+
+def checkout(attempt):
+    product_id, user_id, n, key = attempt
+    started = time.perf_counter()
+    try:
+        _, created = place_order(
+            User(pk=user_id), [{'product': product_id, 'quantity': 1}], DETAILS, key
+        )
+        outcome = 'placed' if created else 'replayed'
+    except OutOfStock:
+        outcome = 'sold_out'
+    return outcome, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Run many parallel checkouts against the same SKU and check that stock never "
+        "oversells and retried Idempotency-Keys never place a second order. The "
+        "synthetic product, users and orders are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkouts', type=int, default=500, help='Checkouts to attempt')
+        parser.add_argument('--stock', type=int, default=300, help='Starting stock of the contested SKU')
+        parser.add_argument('--workers', type=int, default=32, help='Client processes, one connection each (keep below max_connections)')
+        parser.add_argument('--retries', type=int, default=2, help='Extra concurrent sends of each Idempotency-Key')
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        product = Product.objects.create(
+            name=f'Checkout benchmark {tag}', price=Decimal('49.99'), size='M', weight=20,
+            stock=options['stock'], description='Benchmark product',
+        )
+        buyers = User.objects.bulk_create([
+            User(email=f'checkout-{tag}-{n}@example.com', name=f'Buyer {n}', role='customer')
+            for n in range(options['workers'])
+        ])
+        try:
+            self.run(product, buyers, options)
+        finally:
+            Order.objects.filter(user__in=buyers).delete()
+            User.objects.filter(pk__in=[buyer.pk for buyer in buyers]).delete()
+            product.delete()
+
+    def run(self, product, buyers, options):
+        checkouts = options['checkouts']
+        # Every checkout is sent 1 + retries times with the same key, all in flight together
+        attempts = [(n, f'bench-{n}') for n in range(checkouts) for _ in range(1 + options['retries'])]
+
+        started = time.perf_counter()
+        # Worker processes rather than threads, so the GIL doesn't serialise the
+        # clients; each forked worker opens its own database connection
+        connection.close()
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=options['workers'], mp_context=context) as pool:
+            results = list(pool.map(
+                checkout, [(product.pk, buyers[n % len(buyers)].pk, n, key) for n, key in attempts], chunksize=4,
+            ))
+        elapsed = time.perf_counter() - started
+
+        outcomes = [outcome for outcome, _ in results]
+        latencies = sorted(latency for _, latency in results)
+        placed = outcomes.count('placed')
+        product.refresh_from_db()
+        orders = Order.objects.filter(items__product=product).count()
+        keys = Order.objects.filter(items__product=product).values('user', 'idempotency_key').distinct().count()
+
+        self.stdout.write(
+            f"{len(attempts)} requests ({checkouts} checkouts x {1 + options['retries']} sends) "
+            f"on {options['workers']} connections in {elapsed:.2f}s, {len(attempts) / elapsed:.0f} req/s"
+        )
+        self.stdout.write(
+            f"placed {placed}, replayed {outcomes.count('replayed')}, sold out {outcomes.count('sold_out')}, "
+            f"stock left {product.stock}"
+        )
+        self.stdout.write(
+            f"latency p50 {statistics.median(latencies) * 1000:.1f} ms, "
+            f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms"
+        )
+
+        expected = min(checkouts, options['stock'])
+        if placed != expected or orders != placed or keys != placed or product.stock != options['stock'] - placed:
+            raise CommandError(
+                f'Inconsistent result: expected {expected} orders, placed {placed}, '
+                f'{orders} orders in the database ({keys} distinct keys), stock {product.stock}.'
+            )
+        self.stdout.write(self.style.SUCCESS('No overselling and no duplicate orders.'))
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('products', '0007_product_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_number', models.CharField(editable=False, max_length=20, unique=True)),
+                ('idempotency_key', models.CharField(blank=True, editable=False, max_length=255, null=True)),
+                ('request_hash', models.CharField(blank=True, editable=False, max_length=64)),
+                ('status', models.CharField(choices=[('placed', 'Placed'), ('cancelled', 'Cancelled')], default='placed', max_length=10)),
+                ('payment_method', models.CharField(choices=[('card', 'Card'), ('cash', 'Cash')], default='card', max_length=10)),
+                ('payment_reference', models.CharField(blank=True, max_length=255)),
+                ('delivery_option', models.CharField(choices=[('home', 'Home delivery'), ('pickup', 'Pickup')], default='home', max_length=10)),
+                ('name', models.CharField(max_length=255)),
+                ('email', models.EmailField(max_length=254)),
+                ('phone', models.CharField(max_length=20)),
+                ('address_line1', models.CharField(blank=True, max_length=255)),
+                ('address_line2', models.CharField(blank=True, max_length=255)),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('state', models.CharField(blank=True, max_length=100)),
+                ('zip_code', models.CharField(blank=True, max_length=20)),
+                ('country', models.CharField(blank=True, max_length=100)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('shipping_cost', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('tax', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('quantity', models.PositiveIntegerField()),
+                ('line_total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('accessory', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='products.accessory')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='orders.order')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='products.product')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(fields=('user', 'idempotency_key'), name='order_user_idempotency_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.CheckConstraint(condition=models.Q(('accessory__isnull', False), ('product__isnull', False), _negated=True), name='order_item_single_target'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.CheckConstraint(condition=models.Q(('quantity__gte', 1)), name='order_item_quantity_positive'),
+        ),
+    ]
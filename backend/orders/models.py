@@ -1,3 +1,127 @@
+import uuid
+
 from django.db import models
+from core.models import User
+from products.models import Accessory, Product
+
+
+class Order(models.Model):
+    STATUS_CHOICES = [
+        ('placed', 'Placed'),
+        ('cancelled', 'Cancelled'),
+    ]
+    PAYMENT_CHOICES = [
+        ('card', 'Card'),
+        ('cash', 'Cash'),
+    ]
+    DELIVERY_CHOICES = [
+        ('home', 'Home delivery'),
+        ('pickup', 'Pickup'),
+    ]
+
+    order_number = models.CharField(max_length=20, unique=True, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
+    # Client supplied Idempotency-Key, a retry with the same key returns this order
+    idempotency_key = models.CharField(max_length=255, null=True, blank=True, editable=False)
+    # Hash of the request body the key was first used with
+    request_hash = models.CharField(max_length=64, blank=True, editable=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='placed')
+
+    payment_method = models.CharField(max_length=10, choices=PAYMENT_CHOICES, default='card')
+    payment_reference = models.CharField(max_length=255, blank=True)
+    delivery_option = models.CharField(max_length=10, choices=DELIVERY_CHOICES, default='home')
+
+    name = models.CharField(max_length=255)
+    email = models.EmailField()
+    phone = models.CharField(max_length=20)
+    address_line1 = models.CharField(max_length=255, blank=True)
+    address_line2 = models.CharField(max_length=255, blank=True)
+    city = models.CharField(max_length=100, blank=True)
+    state = models.CharField(max_length=100, blank=True)
+    zip_code = models.CharField(max_length=20, blank=True)
+    country = models.CharField(max_length=100, blank=True)
+
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    shipping_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    tax = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='order_user_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.order_number} - {self.user}"
+
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    # Exactly one is set when the order is placed, kept null if the item is later deleted
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
+    accessory = models.ForeignKey(Accessory, on_delete=models.SET_NULL, null=True, blank=True)
+    # Name and price as they were at checkout
+    name = models.CharField(max_length=200)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField()
+    line_total = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=~models.Q(product__isnull=False, accessory__isnull=False),
+                name='order_item_single_target',
+            ),
+            models.CheckConstraint(condition=models.Q(quantity__gte=1), name='order_item_quantity_positive'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.name}"
+
+
+class Cart(models.Model):
+    """A shopping cart, owned by a user or, before login, by whoever holds `token`"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True, related_name='cart')
+    # Sent back by anonymous clients in the X-Cart-Token header
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Cart {self.pk} - {self.user or 'anonymous'}"
+
+
+class CartItem(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True)
+    accessory = models.ForeignKey(Accessory, on_delete=models.CASCADE, null=True, blank=True)
+    quantity = models.PositiveIntegerField()
+    added_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['added_at', 'id']
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(product__isnull=False, accessory__isnull=True)
+                | models.Q(product__isnull=True, accessory__isnull=False),
+                name='cart_item_single_target',
+            ),
+            models.CheckConstraint(condition=models.Q(quantity__gte=1), name='cart_item_quantity_positive'),
+            models.UniqueConstraint(
+                fields=['cart', 'product'], condition=models.Q(product__isnull=False), name='cart_item_unique_product',
+            ),
+            models.UniqueConstraint(
+                fields=['cart', 'accessory'], condition=models.Q(accessory__isnull=False),
+                name='cart_item_unique_accessory',
+            ),
+        ]
 
-# Create your models here.
+    def __str__(self):
+        return f"{self.quantity} x {self.product or self.accessory}"
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import secrets
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Now
+
+from products.cache import invalidate_catalog
+from products.models import Accessory, Product
+from .models import Order, OrderItem
+
+# Same pricing rules as the checkout page
+FREE_SHIPPING_FROM = Decimal('100')
+SHIPPING_COST = Decimal('10')
+TAX_RATE = Decimal('0.05')
+CENT = Decimal('0.01')
+
+# Lock order is by (kind, id), so any two checkouts take their row locks in
+# the same order and cannot deadlock
+MODELS = {'accessory': Accessory, 'product': Product}
+
+
+class OutOfStock(Exception):
+    """A line could not be reserved, `details` says which and what is left"""
+
+    def __init__(self, message, **details):
+        super().__init__(message)
+        self.details = details
+
+
+class IdempotencyKeyReused(Exception):
+    pass
+
+
+def request_hash(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _replay(user, idempotency_key, digest):
+    order = Order.objects.filter(user=user, idempotency_key=idempotency_key).first()
+    if order is not None and order.request_hash != digest:
+        raise IdempotencyKeyReused('This Idempotency-Key was already used for a different order.')
+    return order
+
+
+def quantities_by_item(items):
+    """{(kind, id): total quantity}, duplicate lines merged"""
+    totals = {}
+    for item in items:
+        kind = 'product' if item.get('product') is not None else 'accessory'
+        key = (kind, item[kind])
+        totals[key] = totals.get(key, 0) + item['quantity']
+    return totals
+
+
+def _reserve(quantities):
+    """Take stock for every line, in lock order, or raise OutOfStock.
+
+    Each line is one conditional `UPDATE ... SET stock = stock - n WHERE
+    stock >= n`: the row lock is taken and the check made in the same
+    statement, and the lock is held until the order commits.
+    """
+    for (kind, pk), quantity in sorted(quantities.items()):
+        model = MODELS[kind]
+        reserved = model.objects.filter(pk=pk, stock__gte=quantity).update(
+            stock=F('stock') - quantity, updated_at=Now()
+        )
+        if not reserved:
+            available = model.objects.filter(pk=pk).values_list('stock', flat=True).first()
+            if available is None:
+                raise OutOfStock(f'{kind.capitalize()} {pk} does not exist.', **{kind: pk})
+            raise OutOfStock(f'Only {available} left of {kind} {pk}.', **{kind: pk, 'available': available})
+
+
+def order_totals(subtotal, delivery_option):
+    """Shipping, tax and total for a Decimal subtotal"""
+    if delivery_option == 'pickup' or not subtotal or subtotal >= FREE_SHIPPING_FROM:
+        shipping = Decimal('0')
+    else:
+        shipping = SHIPPING_COST
+    tax = (subtotal * TAX_RATE).quantize(CENT, rounding=ROUND_HALF_UP)
+    return {'subtotal': subtotal, 'shipping_cost': shipping, 'tax': tax, 'total': subtotal + shipping + tax}
+
+
+def place_order(user, items, details, idempotency_key=None):
+    """Place an order for `items` ({product|accessory: id, quantity}) in one transaction.
+
+    Returns (order, created). A retry with an `idempotency_key` that already
+    placed an order returns that order instead of placing another one. The
+    order row is inserted first, so a concurrent retry blocks on the unique
+    key until the first attempt commits (then replays it) or rolls back
+    (then places the order itself).
+    """
+    digest = request_hash({'items': items, **details})
+    if idempotency_key:
+        order = _replay(user, idempotency_key, digest)
+        if order is not None:
+            return order, False
+
+    quantities = quantities_by_item(items)
+    lines = []
+    for kind, model in MODELS.items():
+        ids = [pk for (line_kind, pk) in quantities if line_kind == kind]
+        if ids:
+            for pk, name, price in model.objects.filter(pk__in=ids).values_list('pk', 'name', 'price'):
+                quantity = quantities[(kind, pk)]
+                lines.append(OrderItem(
+                    name=name, unit_price=price, quantity=quantity, line_total=price * quantity,
+                    **{kind + '_id': pk},
+                ))
+    totals = order_totals(sum((line.line_total for line in lines), Decimal('0')), details.get('delivery_option'))
+
+    try:
+        with transaction.atomic():
+            order = Order.objects.create(
+                user=user,
+                idempotency_key=idempotency_key or None,
+                request_hash=digest,
+                order_number=f'ORD-{secrets.token_hex(5).upper()}',
+                **details,
+                **totals,
+            )
+            for line in lines:
+                line.order = order
+            OrderItem.objects.bulk_create(lines)
+            # Stock last: the row locks on popular items are only held from
+            # here to the commit
+            _reserve(quantities)
+            invalidate_catalog()
+    except IntegrityError:
+        # Lost the race against a concurrent request with the same key
+        order = _replay(user, idempotency_key, digest) if idempotency_key else None
+        if order is None:
+            raise
+        return order, False
+    return order, True
+
+
+def cancel_order(order):
+    """Cancel a placed order and put its stock back. Returns False if it was already cancelled."""
+    with transaction.atomic():
+        order = Order.objects.select_for_update().get(pk=order.pk)
+        if order.status == 'cancelled':
+            return False
+        quantities = {}
+        for item in order.items.all():
+            for kind in MODELS:
+                pk = getattr(item, kind + '_id')
+                if pk is not None:
+                    quantities[(kind, pk)] = quantities.get((kind, pk), 0) + item.quantity
+        for (kind, pk), quantity in sorted(quantities.items()):
+            MODELS[kind].objects.filter(pk=pk).update(stock=F('stock') + quantity, updated_at=Now())
+        order.status = 'cancelled'
+        order.save(update_fields=['status', 'updated_at'])
+        invalidate_catalog()
+    return True
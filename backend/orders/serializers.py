@@ -0,0 +1,73 @@
+from rest_framework import serializers
+from .models import Order, OrderItem
+
+
+class OrderLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField(required=False, allow_null=True)
+    accessory = serializers.IntegerField(required=False, allow_null=True)
+    quantity = serializers.IntegerField(min_value=1, max_value=1000)
+
+    def validate(self, attrs):
+        if (attrs.get('product') is None) == (attrs.get('accessory') is None):
+            raise serializers.ValidationError("Provide exactly one of 'product' or 'accessory'.")
+        return attrs
+
+
+class CartLineSerializer(OrderLineSerializer):
+    # 0 removes the line
+    quantity = serializers.IntegerField(min_value=0, max_value=1000)
+
+
+class CartSerializer(serializers.Serializer):
+    MAX_ITEMS = 100
+
+    items = CartLineSerializer(many=True)
+
+    def validate_items(self, value):
+        if len(value) > self.MAX_ITEMS:
+            raise serializers.ValidationError(f"At most {self.MAX_ITEMS} items per cart.")
+        return value
+
+
+class PlaceOrderSerializer(serializers.ModelSerializer):
+    MAX_ITEMS = 100
+
+    items = OrderLineSerializer(many=True)
+
+    class Meta:
+        model = Order
+        fields = [
+            'items', 'payment_method', 'payment_reference', 'delivery_option',
+            'name', 'email', 'phone', 'address_line1', 'address_line2', 'city', 'state', 'zip_code', 'country',
+        ]
+
+    def validate_items(self, value):
+        if not value:
+            raise serializers.ValidationError("An order needs at least one item.")
+        if len(value) > self.MAX_ITEMS:
+            raise serializers.ValidationError(f"At most {self.MAX_ITEMS} items per order.")
+        return value
+
+    def validate(self, attrs):
+        if attrs.get('delivery_option', 'home') == 'home' and not attrs.get('address_line1'):
+            raise serializers.ValidationError({'address_line1': "A delivery address is required."})
+        return attrs
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderItem
+        fields = ['id', 'product', 'accessory', 'name', 'unit_price', 'quantity', 'line_total']
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    items = OrderItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = [
+            'id', 'order_number', 'status', 'payment_method', 'payment_reference', 'delivery_option',
+            'name', 'email', 'phone', 'address_line1', 'address_line2', 'city', 'state', 'zip_code', 'country',
+            'subtotal', 'shipping_cost', 'tax', 'total', 'items', 'created_at', 'updated_at',
+        ]
+        read_only_fields = fields
@@ -1,3 +1,167 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from core.models import User
+from products.models import Accessory, Product
+from .models import Cart, Order
+
+
+class OrderPlacementTests(APITestCase):
+    """Checkout reserves stock atomically, replays retries and prices like the checkout page"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='buyer@example.com', name='Buyer', password='x')
+        cls.frame = Product.objects.create(
+            name='Frame', price=Decimal('40.00'), size='M', weight=20, stock=3, description='Frame',
+        )
+        cls.case = Accessory.objects.create(name='Case', price=Decimal('12.50'), stock=10, weight=5)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def place(self, items, key=None, **details):
+        data = {
+            'items': items, 'name': 'Buyer', 'email': 'buyer@example.com', 'phone': '0771234567',
+            'address_line1': '1 Main Street', 'city': 'Colombo', **details,
+        }
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return self.client.post(reverse('order-list'), data, format='json', **headers)
+
+    def test_order_reserves_stock(self):
+        response = self.place([{'product': self.frame.id, 'quantity': 2}, {'accessory': self.case.id, 'quantity': 1}])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['items']), 2)
+        self.frame.refresh_from_db()
+        self.case.refresh_from_db()
+        self.assertEqual((self.frame.stock, self.case.stock), (1, 9))
+
+    def test_overselling_is_rejected(self):
+        response = self.place([{'product': self.frame.id, 'quantity': 2}, {'product': self.frame.id, 'quantity': 2}])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['available'], 3)
+        self.frame.refresh_from_db()
+        self.assertEqual(self.frame.stock, 3)
+        self.assertFalse(Order.objects.exists())
+
+    def test_idempotent_retry_returns_the_same_order(self):
+        items = [{'product': self.frame.id, 'quantity': 1}]
+        first = self.place(items, key='checkout-1')
+        retry = self.place(items, key='checkout-1')
+        self.assertEqual((first.status_code, retry.status_code), (201, 200))
+        self.assertEqual(retry.data['id'], first.data['id'])
+        self.assertEqual(Order.objects.count(), 1)
+        self.frame.refresh_from_db()
+        self.assertEqual(self.frame.stock, 2)
+
+    def test_reused_key_with_a_different_body_is_rejected(self):
+        self.place([{'product': self.frame.id, 'quantity': 1}], key='checkout-1')
+        response = self.place([{'product': self.frame.id, 'quantity': 2}], key='checkout-1')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_cancelling_restores_stock(self):
+        order = self.place([{'product': self.frame.id, 'quantity': 3}, {'accessory': self.case.id, 'quantity': 4}])
+        response = self.client.post(reverse('order-cancel', args=[order.data['id']]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'cancelled')
+        self.frame.refresh_from_db()
+        self.case.refresh_from_db()
+        self.assertEqual((self.frame.stock, self.case.stock), (3, 10))
+
+        # A second cancel must not put the stock back twice
+        response = self.client.post(reverse('order-cancel', args=[order.data['id']]))
+        self.assertEqual(response.status_code, 400)
+        self.frame.refresh_from_db()
+        self.assertEqual(self.frame.stock, 3)
+
+    def test_totals_follow_shipping_and_tax_rules(self):
+        # Under the free shipping threshold: flat shipping, 5% tax on the subtotal
+        order = self.place([{'product': self.frame.id, 'quantity': 1}, {'accessory': self.case.id, 'quantity': 1}]).data
+        self.assertEqual(
+            [order['subtotal'], order['shipping_cost'], order['tax'], order['total']],
+            ['52.50', '10.00', '2.63', '65.13'],
+        )
+        # From 100 shipping is free
+        order = self.place([{'product': self.frame.id, 'quantity': 2}, {'accessory': self.case.id, 'quantity': 2}]).data
+        self.assertEqual(
+            [order['subtotal'], order['shipping_cost'], order['tax'], order['total']],
+            ['105.00', '0.00', '5.25', '110.25'],
+        )
+        # Pickup never pays shipping
+        order = self.place([{'accessory': self.case.id, 'quantity': 1}], delivery_option='pickup').data
+        self.assertEqual([order['shipping_cost'], order['total']], ['0.00', '13.13'])
+
+
+class CartTests(APITestCase):
+    """Server side carts for guests (X-Cart-Token) and users, merged at login"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='buyer@example.com', name='Buyer', password='secret-pass')
+        cls.frame = Product.objects.create(
+            name='Frame', price=Decimal('40.00'), size='M', weight=20, stock=3, description='Frame',
+            images=['products/cas/ab/frame.jpg'],
+        )
+        cls.case = Accessory.objects.create(name='Case', price=Decimal('12.50'), stock=10, weight=5)
+
+    def put(self, items, token=None):
+        headers = {'HTTP_X_CART_TOKEN': token} if token else {}
+        return self.client.put(reverse('cart'), {'items': items}, format='json', **headers)
+
+    def test_guest_cart_follows_its_token(self):
+        data = self.put([{'product': self.frame.id, 'quantity': 2}]).data
+        token = data['token']
+        self.assertIsNotNone(token)
+        self.assertEqual(data['item_count'], 2)
+
+        response = self.client.get(reverse('cart'), HTTP_X_CART_TOKEN=token)
+        self.assertEqual([item['product'] for item in response.data['items']], [self.frame.id])
+        self.assertEqual(response.data['items'][0]['image'], 'http://testserver/media/products/cas/ab/frame.jpg')
+        self.assertEqual(self.client.get(reverse('cart')).data['items'], [])
+
+    def test_guest_cart_is_merged_at_login(self):
+        self.client.force_authenticate(self.user)
+        self.put([{'product': self.frame.id, 'quantity': 1}])
+        self.client.force_authenticate(None)
+        token = self.put([{'product': self.frame.id, 'quantity': 2}, {'accessory': self.case.id, 'quantity': 1}]).data['token']
+
+        response = self.client.post(
+            reverse('login'), {'email': 'buyer@example.com', 'password': 'secret-pass'}, format='json',
+            HTTP_X_CART_TOKEN=token,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.client.force_authenticate(self.user)
+        items = {
+            (item.get('product'), item.get('accessory')): item['quantity']
+            for item in self.client.get(reverse('cart')).data['items']
+        }
+        self.assertEqual(items, {(self.frame.id, None): 3, (None, self.case.id): 1})
+        self.assertFalse(Cart.objects.filter(token=token, user__isnull=True).exists())
+
+    def test_totals_follow_shipping_and_tax_rules(self):
+        self.client.force_authenticate(self.user)
+        data = self.put([{'product': self.frame.id, 'quantity': 1}, {'accessory': self.case.id, 'quantity': 1}]).data
+        self.assertEqual(
+            [data['subtotal'], data['shipping_cost'], data['tax'], data['total']], ['52.50', '10.00', '2.63', '65.13'],
+        )
+        data = self.client.get(reverse('cart'), {'delivery_option': 'pickup'}).data
+        self.assertEqual([data['shipping_cost'], data['total']], ['0.00', '55.13'])
+
+    def test_unknown_items_are_rejected(self):
+        self.client.force_authenticate(self.user)
+        response = self.put([{'product': self.frame.id + 1000, 'quantity': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['missing'], [{'product': self.frame.id + 1000}])
+
+    def test_line_deleted_while_reading_is_skipped(self):
+        self.client.force_authenticate(self.user)
+        self.put([{'product': self.frame.id, 'quantity': 1}, {'accessory': self.case.id, 'quantity': 2}])
+        # The product disappears between the line query and the product query
+        with mock.patch('orders.carts.Product.objects.filter', return_value=Product.objects.none()):
+            data = self.client.get(reverse('cart')).data
+        self.assertEqual([item['accessory'] for item in data['items']], [self.case.id])
+        self.assertEqual((data['item_count'], data['subtotal']), (2, '25.00'))
@@ -0,0 +1,9 @@
+from django.urls import path
+from .views import CartView, OrderCancelView, OrderDetailView, OrderListCreateView
+
+urlpatterns = [
+    path('cart/', CartView.as_view(), name='cart'),
+    path('', OrderListCreateView.as_view(), name='order-list'),
+    path('<int:pk>/', OrderDetailView.as_view(), name='order-detail'),
+    path('<int:pk>/cancel/', OrderCancelView.as_view(), name='order-cancel'),
+]
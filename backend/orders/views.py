@@ -1,3 +1,117 @@
-from django.shortcuts import render
+from rest_framework import generics, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from core.pagination import CreatedAtCursorPagination
+from .carts import get_cart, missing_items, rehydrate, update_cart
+from .models import Order
+from .placement import IdempotencyKeyReused, OutOfStock, cancel_order, place_order, quantities_by_item
+from .serializers import CartSerializer, OrderSerializer, PlaceOrderSerializer
+
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+
+def visible_orders(user):
+    queryset = Order.objects.prefetch_related('items')
+    if user.role == 'admin':
+        return queryset
+    return queryset.filter(user=user)
+
+
+class OrderListCreateView(generics.ListCreateAPIView):
+    """List your orders, or place one from a cart.
+
+    Send an `Idempotency-Key` header (any unique string per checkout) so a
+    retried request returns the original order instead of placing a second.
+    """
+    serializer_class = OrderSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+
+    def get_queryset(self):
+        return visible_orders(self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        idempotency_key = request.headers.get('Idempotency-Key', '').strip() or None
+        if idempotency_key and len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return Response(
+                {"error": f"Idempotency-Key must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = PlaceOrderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        details = dict(serializer.validated_data)
+        items = [dict(item) for item in details.pop('items')]
+        try:
+            order, created = place_order(request.user, items, details, idempotency_key)
+        except OutOfStock as exc:
+            return Response({"error": str(exc), **exc.details}, status=status.HTTP_409_CONFLICT)
+        except IdempotencyKeyReused as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        # 200 rather than 201 tells the client this was a replay of an earlier request
+        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+class OrderDetailView(generics.RetrieveAPIView):
+    serializer_class = OrderSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return visible_orders(self.request.user)
+
+
+class OrderCancelView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        order = generics.get_object_or_404(visible_orders(request.user), pk=pk)
+        if not cancel_order(order):
+            return Response({"error": "This order is already cancelled."}, status=status.HTTP_400_BAD_REQUEST)
+        order.refresh_from_db()
+        return Response(OrderSerializer(order).data)
+
+
+class CartView(APIView):
+    """The server side cart, for logged in users and (via X-Cart-Token) guests.
+
+    GET returns every line rehydrated with current price, stock and image,
+    plus totals (`?delivery_option=pickup` for pickup shipping). PUT
+    replaces the contents, PATCH sets the quantities of the given lines
+    (0 removes one) and DELETE empties the cart. Guests get a `token` back
+    on their first write and send it as X-Cart-Token from then on; it is
+    merged into their own cart when they log in with it.
+    """
+
+    def get(self, request):
+        return self.respond(request, get_cart(request))
+
+    def put(self, request):
+        return self.write(request, replace=True)
+
+    def patch(self, request):
+        return self.write(request, replace=False)
+
+    def delete(self, request):
+        cart = get_cart(request)
+        if cart is not None:
+            cart = update_cart(cart, {}, replace=True)
+        return self.respond(request, cart)
+
+    def write(self, request, replace):
+        serializer = CartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        quantities = quantities_by_item(serializer.validated_data['items'])
+        missing = missing_items(quantities)
+        if missing:
+            return Response(
+                {"error": "Some items no longer exist.", "missing": [{kind: pk} for kind, pk in missing]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        cart = update_cart(get_cart(request, create=True), quantities, replace)
+        return self.respond(request, cart)
+
+    def respond(self, request, cart):
+        return Response(rehydrate(cart, request, request.query_params.get('delivery_option')))
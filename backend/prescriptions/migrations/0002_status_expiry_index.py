@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prescriptions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['status', 'expiry_date'], include=('id',), name='prescription_status_expiry_idx'),
+        ),
+    ]
@@ -46,6 +46,12 @@ class Prescription(models.Model):
 
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='active')
 
+    class Meta:
+        indexes = [
+            # Covers the status sweep's scan for active prescriptions past expiry
+            models.Index(fields=['status', 'expiry_date'], include=['id'], name='prescription_status_expiry_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.prescription_id:
             last = Prescription.objects.order_by('-id').first()
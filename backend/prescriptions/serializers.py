@@ -2,8 +2,9 @@ from rest_framework import serializers
 from core.models import User
 from .models import Prescription
 from django.utils import timezone
+from core.fieldsets import SparseFieldsMixin
 
-class PrescriptionSerializer(serializers.ModelSerializer):
+class PrescriptionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     doctor_name = serializers.CharField(source='doctor.name', read_only=True)
     patient_name = serializers.CharField(source='patient.name', read_only=True)  # renamed from patient_display_name
     patient_email = serializers.EmailField(write_only=True)  # input only (write-only)
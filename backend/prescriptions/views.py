@@ -5,6 +5,8 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import ValidationError, PermissionDenied
 from .models import Prescription
 from .serializers import PrescriptionSerializer
+from core.pagination import IdCursorPagination
+from core.fieldsets import sparse_queryset
 
 class PrescriptionView(APIView):
     permission_classes = [IsAuthenticated]
@@ -22,7 +24,7 @@ class PrescriptionView(APIView):
             if prescription.doctor != user and prescription.patient != user:
                 raise PermissionDenied("You don't have access to this prescription.")
 
-            serializer = PrescriptionSerializer(prescription)
+            serializer = PrescriptionSerializer(prescription, context={'request': request})
             return Response(serializer.data)
 
         # List prescriptions
@@ -30,8 +32,15 @@ class PrescriptionView(APIView):
             prescriptions = Prescription.objects.filter(doctor=user)
         else:
             prescriptions = Prescription.objects.filter(patient=user, status='active')
+        prescriptions = sparse_queryset(prescriptions, PrescriptionSerializer(context={'request': request}))
 
-        serializer = PrescriptionSerializer(prescriptions, many=True)
+        paginator = IdCursorPagination()
+        page = paginator.paginate_queryset(prescriptions, request, view=self)
+        if page is not None:
+            serializer = PrescriptionSerializer(page, many=True, context={'request': request})
+            return paginator.get_paginated_response(serializer.data)
+
+        serializer = PrescriptionSerializer(prescriptions, many=True, context={'request': request})
         return Response(serializer.data)
 
     def post(self, request):
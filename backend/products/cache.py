@@ -0,0 +1,121 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from core.conditional import make_etag, not_modified, set_validators
+
+VERSION_KEY = 'catalog:version'
+# How long a rebuild may hold the stampede lock before others stop waiting
+LOCK_TIMEOUT = 10
+LOCK_POLL_INTERVAL = 0.05
+
+
+def get_catalog_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = bump_catalog_version()
+    return version
+
+
+def bump_catalog_version():
+    """Start a new catalog version, orphaning every cached catalog response"""
+    version = time.time_ns()
+    cache.set(VERSION_KEY, version, timeout=None)
+    return version
+
+
+def invalidate_catalog():
+    """Bump the catalog version once the current transaction commits.
+
+    Bumping before commit would let a concurrent reader cache the old rows
+    under the new version.
+    """
+    transaction.on_commit(bump_catalog_version)
+
+
+def catalog_cache_key(namespace, request, version=None):
+    if version is None:
+        version = get_catalog_version()
+    params = urlencode(sorted(
+        (key, value) for key, values in request.query_params.lists() for value in values
+    ))
+    raw = f'{request.get_host()}|{request.path}|{params}'
+    digest = hashlib.sha1(raw.encode()).hexdigest()
+    return f'catalog:{version}:{namespace}:{digest}'
+
+
+def get_or_build(key, build, timeout=None):
+    """Return the cached value for `key`, building it at most once at a time.
+
+    The first miss takes a short-lived lock with `cache.add` and rebuilds;
+    concurrent misses poll for the result instead of all hitting the
+    database after a deploy or version bump.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    if timeout is None:
+        timeout = settings.CATALOG_CACHE_TIMEOUT
+    lock_key = f'{key}:lock'
+
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            value = build()
+            cache.set(key, value, timeout)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if cache.get(lock_key) is None:
+            break
+
+    # The builder failed or is too slow, answer this request ourselves
+    value = build()
+    cache.set(key, value, timeout)
+    return value
+
+
+class CatalogCacheMixin:
+    """Serve list/retrieve responses from the versioned catalog cache.
+
+    Every catalog write bumps the version, so the version doubles as the
+    validator for conditional GETs: the ETag is derived from the cache key,
+    and a matching If-None-Match is answered with 304 before the cache or
+    database is touched. No Last-Modified is sent: at one second resolution
+    two writes within a second would let If-Modified-Since match a stale copy.
+    """
+    cache_namespace = None
+
+    def get_cache_namespace(self):
+        return self.cache_namespace or self.basename
+
+    def cached_response(self, request, build):
+        version = get_catalog_version()
+        key = catalog_cache_key(self.get_cache_namespace(), request, version)
+        # The same URL renders differently for the browsable API and JSON
+        etag = make_etag(key, request.accepted_renderer.format)
+
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        data = get_or_build(key, lambda: build().data)
+        return set_validators(Response(data), etag)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CatalogCacheMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CatalogCacheMixin, self).retrieve(request, *args, **kwargs))
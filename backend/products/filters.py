@@ -0,0 +1,173 @@
+import django_filters
+from django.db import connection
+from django.db.models import Count, Max, Min, Q
+
+from .models import Product
+
+
+def split_values(value):
+    """Split a comma separated query param into a list of non-empty values"""
+    if not value:
+        return []
+    return [item.strip() for item in str(value).split(',') if item.strip()]
+
+
+class JSONListFilter(django_filters.CharFilter):
+    """Match rows whose JSON list field contains any of the requested values.
+
+    Each value becomes a `@>` containment check, which PostgreSQL answers
+    from the GIN (jsonb_path_ops) index on the column.
+    """
+
+    def filter(self, qs, value):
+        values = split_values(value)
+        if not values:
+            return qs
+        query = Q()
+        for item in values:
+            query |= Q(**{f'{self.field_name}__contains': [item]})
+        return qs.filter(query)
+
+
+class NameOrIdFilter(django_filters.CharFilter):
+    """Filter a foreign key by comma separated ids and/or names"""
+
+    def filter(self, qs, value):
+        values = split_values(value)
+        if not values:
+            return qs
+        ids = [item for item in values if item.isdigit()]
+        names = [item for item in values if not item.isdigit()]
+        query = Q()
+        if ids:
+            query |= Q(**{f'{self.field_name}_id__in': ids})
+        for name in names:
+            query |= Q(**{f'{self.field_name}__name__iexact': name})
+        return qs.filter(query)
+
+
+class IExactInFilter(django_filters.CharFilter):
+    """Case-insensitive match against any of the comma separated values"""
+
+    def filter(self, qs, value):
+        values = split_values(value)
+        if not values:
+            return qs
+        query = Q()
+        for item in values:
+            query |= Q(**{f'{self.field_name}__iexact': item})
+        return qs.filter(query)
+
+
+class ProductFilter(django_filters.FilterSet):
+    face_shape = JSONListFilter(field_name='face_shapes')
+    vision_problem = JSONListFilter(field_name='vision_problems')
+    color = JSONListFilter(field_name='colors')
+    feature = JSONListFilter(field_name='features')
+    frame_type = NameOrIdFilter(field_name='frame_type')
+    category = NameOrIdFilter(field_name='category')
+    frame_material = IExactInFilter(field_name='frame_material')
+    size = IExactInFilter(field_name='size')
+    min_price = django_filters.NumberFilter(field_name='price', lookup_expr='gte')
+    max_price = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
+    in_stock = django_filters.BooleanFilter(method='filter_in_stock')
+
+    class Meta:
+        model = Product
+        fields = []
+
+    def filter_in_stock(self, queryset, name, value):
+        if value is None:
+            return queryset
+        return queryset.filter(stock__gt=0) if value else queryset.filter(stock__lte=0)
+
+
+# facet / filter param name -> model field
+JSON_FACETS = {
+    'face_shape': 'face_shapes',
+    'vision_problem': 'vision_problems',
+    'color': 'colors',
+    'feature': 'features',
+}
+RELATED_FACETS = {
+    'frame_type': 'frame_type',
+    'category': 'category',
+}
+VALUE_FACETS = {
+    'frame_material': 'frame_material',
+    'size': 'size',
+}
+
+
+def _facet_queryset(queryset, params, request, exclude):
+    """Apply every filter except the ones listed in `exclude`.
+
+    Counting a facet without its own filter gives the usual "disjunctive"
+    facet counts: selecting `oval` still shows how many `round` frames match.
+    """
+    params = params.copy()
+    for name in exclude:
+        params.pop(name, None)
+    return ProductFilter(params, queryset=queryset, request=request).qs.order_by()
+
+
+def _json_list_counts(queryset, field):
+    """Count each value of a JSON list column across the filtered products"""
+    column = connection.ops.quote_name(Product._meta.get_field(field).column)
+    table = connection.ops.quote_name(Product._meta.db_table)
+    ids_sql, params = queryset.values('pk').query.sql_with_params()
+    sql = (
+        f"SELECT item, COUNT(*) FROM {table} AS p "
+        f"CROSS JOIN LATERAL jsonb_array_elements_text("
+        f"CASE WHEN jsonb_typeof(p.{column}) = 'array' THEN p.{column} ELSE '[]'::jsonb END"
+        f") AS item "
+        f"WHERE p.id IN ({ids_sql}) "
+        f"GROUP BY item ORDER BY COUNT(*) DESC, item"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [{'value': value, 'count': count} for value, count in cursor.fetchall()]
+
+
+def product_facets(queryset, params, request=None):
+    """Build facet counts for every product filter.
+
+    One grouped query per facet, each with every filter but its own, plus
+    one for the price range: nine queries whatever the catalog size.
+    """
+    facets = {}
+
+    for name, field in JSON_FACETS.items():
+        facets[name] = _json_list_counts(_facet_queryset(queryset, params, request, [name]), field)
+
+    for name, field in RELATED_FACETS.items():
+        rows = (
+            _facet_queryset(queryset, params, request, [name])
+            .filter(**{f'{field}__isnull': False})
+            .values(f'{field}_id', f'{field}__name')
+            .annotate(count=Count('id'))
+            .order_by('-count', f'{field}__name')
+        )
+        facets[name] = [
+            {'value': row[f'{field}_id'], 'label': row[f'{field}__name'], 'count': row['count']}
+            for row in rows
+        ]
+
+    for name, field in VALUE_FACETS.items():
+        rows = (
+            _facet_queryset(queryset, params, request, [name])
+            .exclude(**{field: ''})
+            .values(field)
+            .annotate(count=Count('id'))
+            .order_by('-count', field)
+        )
+        facets[name] = [{'value': row[field], 'count': row['count']} for row in rows]
+
+    price = _facet_queryset(queryset, params, request, ['min_price', 'max_price']).aggregate(
+        min=Min('price'), max=Max('price')
+    )
+    facets['price'] = {
+        'min': str(price['min']) if price['min'] is not None else None,
+        'max': str(price['max']) if price['max'] is not None else None,
+    }
+    return facets
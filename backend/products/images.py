@@ -0,0 +1,153 @@
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .cache import invalidate_catalog
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PRODUCT_IMAGE_WORKERS,
+            thread_name_prefix='product-images',
+        )
+    return _executor
+
+
+def content_path(digest, ext):
+    return f'products/cas/{digest[:2]}/{digest}{ext}'
+
+
+def variant_path(original, variant, ext):
+    base, _ = os.path.splitext(original)
+    return f'{base}_{variant}{ext}'
+
+
+def touch(path):
+    """Refresh the mtime of a reused file so the media collector sees it as new"""
+    try:
+        os.utime(default_storage.path(path))
+    except (NotImplementedError, OSError):
+        pass
+
+
+def store_upload(upload):
+    """Store an uploaded image under its SHA-256 digest.
+
+    Identical uploads map to the same path, so a file is only written once
+    no matter how many products use it. Returns the storage path.
+    """
+    hasher = hashlib.sha256()
+    for chunk in upload.chunks():
+        hasher.update(chunk)
+    upload.seek(0)
+
+    ext = os.path.splitext(upload.name)[1].lower() or '.jpg'
+    path = content_path(hasher.hexdigest(), ext)
+    if default_storage.exists(path):
+        touch(path)
+    else:
+        path = default_storage.save(path, upload)
+    return path
+
+
+def _save_image(image, path, fmt):
+    if default_storage.exists(path):
+        touch(path)
+        return path
+    buffer = io.BytesIO()
+    if fmt == 'JPEG':
+        image.convert('RGB').save(buffer, fmt, quality=85, optimize=True, progressive=True)
+    elif fmt == 'WEBP':
+        image.save(buffer, fmt, quality=80, method=4)
+    else:
+        image.save(buffer, fmt, optimize=True)
+    return default_storage.save(path, ContentFile(buffer.getvalue()))
+
+
+def build_variants(path):
+    """Write every configured size of one original, in its own format and WebP.
+
+    Variant names derive from the (content addressed) original, so variants
+    that already exist are reused instead of being re-encoded.
+    """
+    with default_storage.open(path, 'rb') as fh:
+        image = Image.open(fh)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    fmt, ext = ('PNG', '.png') if has_alpha else ('JPEG', '.jpg')
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    variants = {}
+    for name, size in settings.PRODUCT_IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        variants[name] = {
+            'default': _save_image(resized, variant_path(path, name, ext), fmt),
+            'webp': _save_image(resized, variant_path(path, name, '.webp'), 'WEBP'),
+        }
+    return variants
+
+
+def process_product_images(product_id):
+    """Build missing variants for a product's images and record them"""
+    try:
+        product = Product.objects.only('id', 'images', 'image_variants').get(pk=product_id)
+    except Product.DoesNotExist:
+        return
+
+    built = {}
+    for path in product.images or []:
+        if path in (product.image_variants or {}):
+            continue
+        try:
+            built[path] = build_variants(path)
+        except Exception:
+            logger.exception('Could not build variants for %s', path)
+    if not built:
+        return
+
+    with transaction.atomic():
+        # The product may have been edited while we were resizing
+        current = Product.objects.select_for_update().only('id', 'images', 'image_variants').get(pk=product_id)
+        images = current.images or []
+        variants = {path: value for path, value in (current.image_variants or {}).items() if path in images}
+        variants.update({path: value for path, value in built.items() if path in images})
+        Product.objects.filter(pk=product_id).update(image_variants=variants, updated_at=timezone.now())
+        invalidate_catalog()
+
+
+def _run_in_worker(product_id):
+    try:
+        process_product_images(product_id)
+    except Exception:
+        logger.exception('Image processing failed for product %s', product_id)
+    finally:
+        # Worker threads get their own connection, don't leak it
+        connection.close()
+
+
+def schedule_image_processing(product_id):
+    """Queue variant generation to run after commit, off the request path"""
+    if settings.PRODUCT_IMAGE_ASYNC:
+        transaction.on_commit(lambda: get_executor().submit(_run_in_worker, product_id))
+    else:
+        transaction.on_commit(lambda: process_product_images(product_id))
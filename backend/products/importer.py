@@ -0,0 +1,245 @@
+import codecs
+import csv
+import json
+import math
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+
+from .cache import invalidate_catalog
+from .models import Accessory, Category, FrameType, Product
+from .search import update_search_vectors
+from .similarity import rebuild_if_built, safely
+
+PRODUCT = 'product'
+ACCESSORY = 'accessory'
+LIST_FIELDS = ['face_shapes', 'vision_problems', 'features', 'colors', 'images']
+
+
+class RowError(ValueError):
+    pass
+
+
+class FileError(ValueError):
+    """The file itself can't be read any further (bad encoding, broken CSV)"""
+
+    def __init__(self, message, line):
+        super().__init__(message)
+        self.line = line
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, dict row) pairs from a text stream of CSV or JSON lines.
+
+    Raises FileError when CSV parsing fails (or `stream` raises it, see
+    decoded_lines); rows before that point have already been yielded.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        try:
+            for row in reader:
+                yield reader.line_num, row
+        except csv.Error as exc:
+            raise FileError(f'Malformed CSV: {exc}', reader.line_num) from exc
+        return
+    for line_num, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield line_num, RowError(f'Invalid JSON: {exc.msg}')
+            continue
+        yield line_num, row if isinstance(row, dict) else RowError('Each line must be a JSON object.')
+
+
+def _text(row, field, required=False, max_length=None):
+    value = row.get(field)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f'{field} is required.')
+    if max_length and len(value) > max_length:
+        raise RowError(f'{field} is longer than {max_length} characters.')
+    return value
+
+
+def _decimal(row, field):
+    try:
+        value = Decimal(str(row.get(field, '')).strip())
+    except InvalidOperation:
+        raise RowError(f'{field} must be a number.')
+    if not value.is_finite() or value < 0 or value.as_tuple().exponent < -2 or value >= Decimal('100000000'):
+        raise RowError(f'{field} must be a positive amount with at most 2 decimals.')
+    return value
+
+
+def _number(row, field, cast, minimum=None):
+    try:
+        value = cast(str(row.get(field, '')).strip())
+    except (TypeError, ValueError):
+        raise RowError(f'{field} must be a number.')
+    if not math.isfinite(value):
+        raise RowError(f'{field} must be a finite number.')
+    if minimum is not None and value < minimum:
+        raise RowError(f'{field} cannot be below {minimum}.')
+    return value
+
+
+def _list(row, field):
+    """Accept a JSON list, a JSON encoded list or a '|' separated string"""
+    value = row.get(field)
+    if value in (None, ''):
+        return []
+    if isinstance(value, list):
+        return [str(item) for item in value]
+    value = str(value).strip()
+    if value.startswith('['):
+        try:
+            return [str(item) for item in json.loads(value)]
+        except json.JSONDecodeError:
+            raise RowError(f'{field} is not a valid JSON list.')
+    return [item.strip() for item in value.split('|') if item.strip()]
+
+
+class CatalogImporter:
+    """Stream products and accessories from CSV / JSON lines into the catalog.
+
+    Rows are validated and inserted `chunk_size` at a time, so memory stays
+    bounded by one chunk whatever the file size. Category and frame type
+    names are resolved through maps loaded once up front. Invalid rows are
+    skipped and reported with their line number.
+    """
+
+    def __init__(self, default_kind=PRODUCT, chunk_size=2000, dry_run=False, manufacturer=None, max_errors=1000):
+        self.default_kind = default_kind
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.manufacturer = manufacturer
+        self.max_errors = max_errors
+        self.categories = {name.lower(): pk for pk, name in Category.objects.values_list('pk', 'name')}
+        self.frame_types = {name.lower(): pk for pk, name in FrameType.objects.values_list('pk', 'name')}
+        self.created = {PRODUCT: 0, ACCESSORY: 0}
+        self.errors = []
+        self.error_count = 0
+        self.file_error = None
+        self.rows = 0
+
+    def _lookup(self, mapping, row, field, label):
+        name = _text(row, field)
+        if not name:
+            return None
+        if name.lower() not in mapping:
+            raise RowError(f'Unknown {label} "{name}".')
+        return mapping[name.lower()]
+
+    def build_product(self, row):
+        return Product(
+            name=_text(row, 'name', required=True, max_length=200),
+            price=_decimal(row, 'price'),
+            description=_text(row, 'description'),
+            category_id=self._lookup(self.categories, row, 'category', 'category'),
+            frame_type_id=self._lookup(self.frame_types, row, 'frame_type', 'frame type'),
+            size=_text(row, 'size', required=True, max_length=5),
+            weight=_number(row, 'weight', float, minimum=0),
+            stock=_number(row, 'stock', int, minimum=0),
+            frame_material=_text(row, 'frame_material', max_length=100),
+            manufacturer=self.manufacturer,
+            **{field: _list(row, field) for field in LIST_FIELDS},
+        )
+
+    def build_accessory(self, row):
+        return Accessory(
+            name=_text(row, 'name', required=True, max_length=200),
+            price=_decimal(row, 'price'),
+            description=_text(row, 'description'),
+            category_id=self._lookup(self.categories, row, 'category', 'category'),
+            weight=_number(row, 'weight', float, minimum=0),
+            stock=_number(row, 'stock', int, minimum=0),
+            manufacturer=self.manufacturer,
+        )
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if self.max_errors is None or len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'error': message})
+
+    def validate_chunk(self, chunk):
+        products, accessories = [], []
+        for line, row in chunk:
+            if isinstance(row, RowError):
+                self.add_error(line, str(row))
+                continue
+            kind = (_text(row, 'type') or self.default_kind).lower()
+            try:
+                if kind == PRODUCT:
+                    products.append(self.build_product(row))
+                elif kind == ACCESSORY:
+                    accessories.append(self.build_accessory(row))
+                else:
+                    raise RowError(f'Unknown type "{kind}".')
+            except RowError as exc:
+                self.add_error(line, str(exc))
+        return products, accessories
+
+    def load_chunk(self, products, accessories):
+        if self.dry_run:
+            self.created[PRODUCT] += len(products)
+            self.created[ACCESSORY] += len(accessories)
+            return
+        with transaction.atomic():
+            if products:
+                created = Product.objects.bulk_create(products, batch_size=self.chunk_size)
+                # bulk_create skips post_save, so maintain the search column here
+                update_search_vectors(Product.objects.filter(pk__in=[product.pk for product in created]))
+                self.created[PRODUCT] += len(created)
+            if accessories:
+                self.created[ACCESSORY] += len(Accessory.objects.bulk_create(accessories, batch_size=self.chunk_size))
+
+    def run(self, stream, fmt):
+        rows = read_rows(stream, fmt)
+        while self.file_error is None:
+            chunk = []
+            try:
+                chunk.extend(islice(rows, self.chunk_size))
+            except FileError as exc:
+                # Earlier chunks are committed; load the rows read so far and stop
+                self.file_error = {'line': exc.line, 'error': str(exc)}
+            if not chunk:
+                break
+            self.rows += len(chunk)
+            self.load_chunk(*self.validate_chunk(chunk))
+
+        if not self.dry_run and any(self.created.values()):
+            invalidate_catalog()
+        if not self.dry_run and self.created[PRODUCT]:
+            # bulk_create skips the per-row similarity updates, rebuild instead
+            transaction.on_commit(lambda: safely(rebuild_if_built))
+        return self.report()
+
+    def report(self):
+        return {
+            'rows': self.rows,
+            'created': dict(self.created),
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'file_error': self.file_error,
+            'dry_run': self.dry_run,
+        }
+
+
+def decoded_lines(fileobj):
+    """Decode a binary file as UTF-8 line by line, so a bad byte is reported at its own line"""
+    for line_num, line in enumerate(fileobj, start=1):
+        if line_num == 1:
+            line = line.removeprefix(codecs.BOM_UTF8)
+        try:
+            yield line.decode('utf-8')
+        except UnicodeDecodeError as exc:
+            raise FileError('The file is not UTF-8 encoded.', line_num) from exc
+
+
+def import_catalog_file(fileobj, fmt, **options):
+    """Import from a binary file object (upload or open file)"""
+    return CatalogImporter(**options).run(decoded_lines(fileobj), fmt)
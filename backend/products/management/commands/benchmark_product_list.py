@@ -0,0 +1,99 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from products.models import Category, FrameType, Product
+from products.readers import ProductReader
+from products.serializers import ProductSerializer
+
+COLORS = ['black', 'tortoise', 'gold', 'silver', 'clear', 'blue', 'red']
+FACE_SHAPES = ['oval', 'round', 'square', 'heart', 'diamond', 'triangle', 'oblong']
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ProductSerializer with the ProductReader fast path on a full product "
+        "list and check both render byte-identical JSON. Synthetic products are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10000, help='Synthetic products to insert first')
+        parser.add_argument('--runs', type=int, default=5, help='Timed runs per path')
+        parser.add_argument('--host', default='localhost', help='Host used to build absolute image URLs')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['products']:
+                self.seed(options['products'])
+            self.run(options['runs'], options['host'])
+            transaction.set_rollback(True)
+
+    def seed(self, count, batch_size=5000):
+        rng = random.Random(42)
+        categories = [Category.objects.get_or_create(name=name)[0] for name in ('Eyeglasses', 'Sunglasses', 'Kids')]
+        frame_types = [FrameType.objects.get_or_create(name=name)[0] for name in ('Full Rim', 'Half Rim', 'Rimless')]
+        for offset in range(0, count, batch_size):
+            batch = []
+            for index in range(offset, min(offset + batch_size, count)):
+                images = [f'products/cas/{index % 256:02x}/{index:064x}-{n}.jpg' for n in range(rng.randint(1, 4))]
+                batch.append(Product(
+                    name=f'Frame {index}',
+                    price=Decimal(rng.randint(1500, 25000)) / 100,
+                    description='Benchmark product',
+                    category=rng.choice(categories),
+                    frame_type=rng.choice(frame_types),
+                    size=rng.choice('SML'),
+                    weight=rng.uniform(10, 40),
+                    stock=rng.randint(0, 50),
+                    frame_material='acetate',
+                    images=images,
+                    image_variants={
+                        path: {
+                            variant: {'default': path.replace('.jpg', f'_{variant}.jpg'),
+                                      'webp': path.replace('.jpg', f'_{variant}.webp')}
+                            for variant in ('thumbnail', 'card', 'zoom')
+                        }
+                        for path in images
+                    },
+                    face_shapes=rng.sample(FACE_SHAPES, 2),
+                    colors=rng.sample(COLORS, 2),
+                ))
+            Product.objects.bulk_create(batch, batch_size=batch_size)
+
+    def run(self, runs, host):
+        request = Request(RequestFactory().get('/api/products/products/', HTTP_HOST=host))
+        queryset = Product.objects.select_related('category', 'frame_type').order_by('-created_at', '-id')
+        renderer = JSONRenderer()
+
+        def serializer_path():
+            return ProductSerializer(queryset.all(), many=True, context={'request': request}).data
+
+        def reader_path():
+            reader = ProductReader(request)
+            return reader.represent(reader.values(queryset.all()))
+
+        results = {}
+        for label, build in (('serializer', serializer_path), ('reader', reader_path)):
+            timings = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                body = renderer.render(build())
+                timings.append(time.perf_counter() - started)
+            results[label] = (statistics.median(timings), body)
+
+        count = queryset.count()
+        slow, expected = results['serializer']
+        fast, body = results['reader']
+        if body != expected:
+            raise CommandError('ProductReader output differs from ProductSerializer.')
+
+        self.stdout.write(f'{count} products, {len(body) / 1024 / 1024:.1f} MiB of JSON, identical output')
+        self.stdout.write(f'serializer  {slow * 1000:9.1f} ms')
+        self.stdout.write(f'reader      {fast * 1000:9.1f} ms  ({slow / fast:.1f}x faster)')
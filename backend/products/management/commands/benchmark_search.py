@@ -0,0 +1,99 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from products.models import Category, FrameType, Product
+from products.search import search_products, update_search_vectors
+
+NAME_WORDS = [
+    'classic', 'aviator', 'wayfarer', 'round', 'cat-eye', 'rectangle', 'square', 'oval',
+    'clubmaster', 'browline', 'rimless', 'sport', 'vintage', 'retro', 'slim', 'bold',
+    'tortoise', 'matte', 'gradient', 'polarized', 'kids', 'reader', 'blue-light', 'premium',
+]
+MATERIALS = ['metal', 'acetate', 'titanium', 'plastic', 'wood', 'TR90', 'polycarbonate']
+DESCRIPTIONS = [
+    'Lightweight frame with spring hinges and adjustable nose pads.',
+    'Hand polished acetate with a keyhole bridge for all-day comfort.',
+    'Anti-glare coated lenses with UV400 protection.',
+    'Flexible memory metal temples that survive everyday knocks.',
+    'Blue light filtering lenses for long screen sessions.',
+]
+DEFAULT_TERMS = ['aviator', 'aviater', 'titanium round', 'tortoise acetate', 'blue light', 'wayfarer sunglasses']
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark product search latency. With --products N, N synthetic products "
+        "are inserted inside a transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=0, help='Synthetic products to insert first')
+        parser.add_argument('--runs', type=int, default=50, help='Timed runs per search term')
+        parser.add_argument('--limit', type=int, default=24, help='Rows fetched per search (one catalog page)')
+        parser.add_argument('--term', action='append', dest='terms', help='Search term (repeatable)')
+        parser.add_argument('--explain', action='store_true', help='Print EXPLAIN ANALYZE for each term')
+        parser.add_argument('--keep', action='store_true', help='Commit the synthetic products instead of rolling back')
+
+    def handle(self, *args, **options):
+        terms = options['terms'] or DEFAULT_TERMS
+        try:
+            with transaction.atomic():
+                if options['products']:
+                    self.seed(options['products'])
+                self.run(terms, options['runs'], options['limit'], options['explain'])
+                if not options['keep']:
+                    transaction.set_rollback(True)
+        except KeyboardInterrupt:
+            self.stderr.write('Interrupted, synthetic rows rolled back.')
+
+    def seed(self, count, batch_size=5000):
+        rng = random.Random(42)
+        categories = [Category.objects.get_or_create(name=name)[0] for name in ('Eyeglasses', 'Sunglasses', 'Kids')]
+        frame_types = [FrameType.objects.get_or_create(name=name)[0] for name in ('Full Rim', 'Half Rim', 'Rimless')]
+
+        started = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            batch = []
+            for _ in range(min(batch_size, count - offset)):
+                batch.append(Product(
+                    name=' '.join(rng.sample(NAME_WORDS, 3)).title(),
+                    price=Decimal(rng.randint(1500, 25000)) / 100,
+                    description=rng.choice(DESCRIPTIONS),
+                    category=rng.choice(categories),
+                    frame_type=rng.choice(frame_types),
+                    size=rng.choice('SML'),
+                    weight=rng.uniform(10, 40),
+                    stock=rng.randint(0, 50),
+                    frame_material=rng.choice(MATERIALS),
+                ))
+            Product.objects.bulk_create(batch, batch_size=batch_size)
+        update_search_vectors()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE products_product')
+        self.stdout.write(f'Seeded {count} products in {time.perf_counter() - started:.1f}s')
+
+    def run(self, terms, runs, limit, explain):
+        total = Product.objects.count()
+        self.stdout.write(f'Searching {total} products, {runs} runs per term, {limit} rows per page')
+        self.stdout.write(f'{"term":<24}{"hits":>8}{"p50 ms":>10}{"p95 ms":>10}{"max ms":>10}')
+
+        for term in terms:
+            queryset = search_products(Product.objects.all(), term).values_list('id', flat=True)[:limit]
+            timings = []
+            hits = 0
+            for _ in range(runs):
+                started = time.perf_counter()
+                hits = len(list(queryset.all()))
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(
+                f'{term:<24}{hits:>8}{statistics.median(timings):>10.2f}{p95:>10.2f}{timings[-1]:>10.2f}'
+            )
+            if explain:
+                self.stdout.write(queryset.explain(analyze=True))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from products.similarity import build_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the memory-mapped product similarity index. Saves and deletes keep it "
+        "current on their own; run this on deploy (the similar endpoint answers 503 "
+        "until an index exists), after raw SQL changes or to reclaim free rows."
+    )
+
+    def handle(self, *args, **options):
+        stats = build_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {stats['products']} products into generation {stats['generation']} "
+            f"({stats['dimensions']} dimensions, {stats['capacity']} rows)"
+        ))
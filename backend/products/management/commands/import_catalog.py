@@ -0,0 +1,55 @@
+import csv
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importer import ACCESSORY, PRODUCT, import_catalog_file
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV or JSON lines file of products/accessories into the catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--type', choices=[PRODUCT, ACCESSORY], default=PRODUCT,
+                            help='Row type when a row has no "type" column')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, write nothing')
+        parser.add_argument('--errors', help='Write the per-row error report to this CSV file')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        if not os.path.exists(path):
+            raise CommandError(f'{path} does not exist.')
+
+        started = time.perf_counter()
+        with open(path, 'rb') as fh:
+            report = import_catalog_file(
+                fh, fmt,
+                default_kind=options['type'],
+                chunk_size=options['chunk_size'],
+                dry_run=options['dry_run'],
+                max_errors=None if options['errors'] else 1000,
+            )
+        elapsed = time.perf_counter() - started
+
+        if options['errors'] and report['errors']:
+            with open(options['errors'], 'w', newline='') as out:
+                writer = csv.DictWriter(out, fieldnames=['line', 'error'])
+                writer.writeheader()
+                writer.writerows(report['errors'])
+
+        created = report['created']
+        self.stdout.write(
+            f"{report['rows']} rows in {elapsed:.1f}s: {created[PRODUCT]} products, "
+            f"{created[ACCESSORY]} accessories, {report['error_count']} errors"
+            + (' (dry run)' if report['dry_run'] else '')
+        )
+        for error in report['errors'][:20]:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        if report['file_error']:
+            file_error = report['file_error']
+            raise CommandError(f"Stopped at line {file_error['line']}: {file_error['error']}")
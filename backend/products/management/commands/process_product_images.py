@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from products.images import process_product_images
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = "Build thumbnail/card/zoom and WebP variants for product images that have none yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product', type=int, action='append', dest='products', help='Only this product id (repeatable)')
+
+    def handle(self, *args, **options):
+        queryset = Product.objects.exclude(images=[]).order_by('id')
+        if options['products']:
+            queryset = queryset.filter(pk__in=options['products'])
+
+        processed = 0
+        for product_id in queryset.values_list('id', flat=True).iterator(chunk_size=500):
+            process_product_images(product_id)
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} products.'))
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_product_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accessory',
+            index=models.Index(fields=['-created_at', '-id'], name='accessory_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-created_at', '-id'], name='product_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:33
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+# Mirrors products.search.product_search_vector for the rows that already exist
+POPULATE_SEARCH_VECTOR = """
+UPDATE products_product AS p SET search_vector =
+    setweight(to_tsvector('english', COALESCE(p.name, '')), 'A')
+    || setweight(to_tsvector('english',
+        COALESCE((SELECT c.name FROM products_category c WHERE c.id = p.category_id), '')
+        || ' ' ||
+        COALESCE((SELECT f.name FROM products_frametype f WHERE f.id = p.frame_type_id), '')
+    ), 'B')
+    || setweight(to_tsvector('english', COALESCE(p.frame_material, '')), 'B')
+    || setweight(to_tsvector('english', COALESCE(p.description, '')), 'C');
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_cursor_pagination_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(POPULATE_SEARCH_VECTOR, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='accessory',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='accessory_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='product_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
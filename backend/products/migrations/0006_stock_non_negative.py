@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_image_variants'),
+    ]
+
+    operations = [
+        # Existing negative stock would block the constraints
+        migrations.RunSQL(
+            "UPDATE products_accessory SET stock = 0 WHERE stock < 0;"
+            "UPDATE products_product SET stock = 0 WHERE stock < 0;",
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='accessory',
+            constraint=models.CheckConstraint(condition=models.Q(('stock__gte', 0)), name='accessory_stock_non_negative'),
+        ),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.CheckConstraint(condition=models.Q(('stock__gte', 0)), name='product_stock_non_negative'),
+        ),
+    ]
@@ -1,5 +1,10 @@
-from django.db import models
+from django.db import models, transaction
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from core.models import User
+from .cache import invalidate_catalog
 from django.core.files.storage import FileSystemStorage
 import os
 
@@ -37,11 +42,35 @@ class Product(models.Model):
     )
 
     images = models.JSONField(default=list)
+    # {original path: {variant: {'default': path, 'webp': path}}}, see products.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     face_shapes = models.JSONField(default=list, blank=True)
     vision_problems = models.JSONField(default=list, blank=True)
     features = models.JSONField(default=list, blank=True)
     colors = models.JSONField(default=list, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by products.search.update_search_vectors
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='product_search_vector_gin'),
+            GinIndex(fields=['name'], name='product_name_trgm', opclasses=['gin_trgm_ops']),
+            # jsonb_path_ops GIN indexes back the `@>` containment filters
+            GinIndex(fields=['face_shapes'], name='product_face_shapes_gin', opclasses=['jsonb_path_ops']),
+            GinIndex(fields=['vision_problems'], name='product_vision_problems_gin', opclasses=['jsonb_path_ops']),
+            GinIndex(fields=['colors'], name='product_colors_gin', opclasses=['jsonb_path_ops']),
+            GinIndex(fields=['features'], name='product_features_gin', opclasses=['jsonb_path_ops']),
+            models.Index(fields=['price'], name='product_price_idx'),
+            models.Index(fields=['frame_material'], name='product_frame_material_idx'),
+            models.Index(fields=['-created_at', '-id'], name='product_created_id_idx'),
+            # Delta reads of recently changed products, see products.recommendations
+            models.Index(fields=['updated_at'], name='product_updated_at_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(stock__gte=0), name='product_stock_non_negative'),
+        ]
 
     def __str__(self):
         return self.name
@@ -68,6 +97,74 @@ class Accessory(models.Model):
     class Meta:
         verbose_name_plural = "Accessories"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='accessory_created_id_idx'),
+            GinIndex(fields=['name'], name='accessory_name_trgm', opclasses=['gin_trgm_ops']),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(stock__gte=0), name='accessory_stock_non_negative'),
+        ]
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_search_vector(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .search import update_search_vectors
+    update_search_vectors(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=FrameType)
+def refresh_related_search_vectors(sender, instance, created=False, raw=False, **kwargs):
+    if raw or created:
+        return
+    from .search import update_search_vectors
+    lookup = 'category' if sender is Category else 'frame_type'
+    update_search_vectors(Product.objects.filter(**{lookup: instance}))
+
+
+@receiver(post_save, sender=Product)
+def index_product_for_recommendations(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .recommendations import recommendation_index
+    transaction.on_commit(lambda: recommendation_index.update_product(instance))
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product_for_recommendations(sender, instance, **kwargs):
+    from .recommendations import recommendation_index
+    pk = instance.pk
+    transaction.on_commit(lambda: recommendation_index.remove_product(pk))
+
+
+@receiver(post_save, sender=Product)
+def update_similarity_row(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .similarity import safely, update_product
+    pk = instance.pk
+    transaction.on_commit(lambda: safely(update_product, pk))
+
+
+@receiver(post_delete, sender=Product)
+def remove_similarity_row(sender, instance, **kwargs):
+    from .similarity import remove_product, safely
+    pk = instance.pk
+    transaction.on_commit(lambda: safely(remove_product, pk))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Accessory)
+@receiver(post_delete, sender=Accessory)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=FrameType)
+@receiver(post_delete, sender=FrameType)
+def bump_catalog_version_on_change(sender, **kwargs):
+    invalidate_catalog()
 
 
 import os
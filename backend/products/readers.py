@@ -0,0 +1,104 @@
+import re
+
+from django.conf import settings
+from django.utils.encoding import iri_to_uri
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.serializers import BaseSerializer
+
+from .serializers import ProductSerializer, finish_product_representation
+
+NESTED, PRIMARY_KEY, PLAIN = 'nested', 'pk', 'plain'
+# Characters iri_to_uri() leaves untouched, storage paths are nearly always made of these
+URI_SAFE = re.compile(r"[\w/#%\[\]=:;$&()+,!?*@'~.\-]*", re.ASCII)
+
+
+def media_url_builder(request):
+    """Same result as `request.build_absolute_uri(MEDIA_URL + path)`.
+
+    The scheme and host are resolved once instead of once per image.
+    """
+    media_url = settings.MEDIA_URL
+    if not media_url.startswith('/') or media_url.startswith('//'):
+        return lambda path: request.build_absolute_uri(media_url + path)
+
+    prefix = request.build_absolute_uri(media_url)
+
+    def build(path):
+        location = media_url + path
+        if '/./' in location or '/../' in location:
+            # build_absolute_uri resolves dot segments, leave those to it
+            return request.build_absolute_uri(location)
+        return prefix + (path if URI_SAFE.fullmatch(path) else iri_to_uri(path))
+
+    return build
+
+
+class ProductReader:
+    """Read-only product output built from `.values()` rows.
+
+    Produces exactly what ProductSerializer does (same keys, order and
+    formatting, by reusing the serializer's own field instances) without
+    instantiating models or running the serializer per row. Categories and
+    frame types are serialized once per distinct id and shared.
+    """
+
+    def __init__(self, request, serializer=None):
+        self.request = request
+        serializer = serializer or ProductSerializer(context={'request': request})
+        self.wants = getattr(serializer, 'wants', lambda name: True)
+        self.plan = []
+        columns = set()
+        if self.wants('images') or self.wants('image_variants'):
+            columns.add('images')
+        if self.wants('image_variants'):
+            columns.add('image_variants')
+        for field in serializer._readable_fields:
+            if field.field_name in ('images', 'image_variants'):
+                continue
+            if isinstance(field, BaseSerializer):
+                kind, column = NESTED, f'{field.source}_id'
+            elif isinstance(field, PrimaryKeyRelatedField) and field.pk_field is None:
+                kind, column = PRIMARY_KEY, f'{field.source}_id'
+            elif field.source != '*' and '.' not in field.source:
+                kind, column = PLAIN, field.source
+            else:
+                raise ValueError(f'ProductReader cannot read field "{field.field_name}".')
+            self.plan.append((field.field_name, kind, column, field))
+            columns.add(column)
+        self.columns = sorted(columns)
+
+    def values(self, queryset, extra=()):
+        """`queryset` as dict rows, plus annotations and `extra` columns (cursor ordering)"""
+        annotations = list(queryset.query.annotations)
+        columns = set(self.columns).union(extra).difference(annotations)
+        return queryset.values(*sorted(columns), *annotations)
+
+    def _related_maps(self, rows):
+        maps = {}
+        for name, kind, column, field in self.plan:
+            if kind != NESTED:
+                continue
+            ids = {row[column] for row in rows if row[column] is not None}
+            model = field.Meta.model
+            maps[name] = {obj.pk: field.to_representation(obj) for obj in model.objects.filter(pk__in=ids)}
+        return maps
+
+    def represent(self, rows):
+        rows = list(rows)
+        maps = self._related_maps(rows)
+        media_url = media_url_builder(self.request)
+        data = []
+        for row in rows:
+            rep = {}
+            for name, kind, column, field in self.plan:
+                value = row[column]
+                if value is None or kind == PRIMARY_KEY:
+                    rep[name] = value
+                elif kind == NESTED:
+                    rep[name] = maps[name].get(value)
+                else:
+                    rep[name] = field.to_representation(value)
+            data.append(finish_product_representation(
+                rep, row.get('images'), row.get('image_variants'), media_url, self.wants,
+            ))
+        return data
@@ -0,0 +1,222 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+
+from .cache import get_catalog_version
+from .models import Product
+from .similarity import IndexNotReady
+
+logger = logging.getLogger(__name__)
+
+FACE_SHAPES = ['oval', 'round', 'square', 'heart', 'diamond', 'triangle', 'oblong']
+VISION_PROBLEMS = ['nearsighted', 'farsighted', 'astigmatism', 'presbyopia']
+# Delta syncs re-read this far behind the newest updated_at already seen, so
+# rows from transactions that committed late are not missed
+SYNC_LOOKBACK = timedelta(minutes=5)
+# Moved on every product delete, see RecommendationIndex
+DELETES_KEY = 'recommendations:deletes'
+# Cylinder power (dioptres) from which astigmatism is worth correcting
+ASTIGMATISM_CYLINDER = 0.5
+
+
+def _labels(values, known):
+    return frozenset(str(value).strip().lower() for value in values or [] if str(value).strip().lower() in known)
+
+
+def vision_problems_from_prescription(prescription):
+    """Vision problems implied by a distance prescription.
+
+    Presbyopia needs a reading addition, which prescriptions don't record,
+    so it can only be asked for explicitly.
+    """
+    spheres = (prescription.right_sphere, prescription.left_sphere)
+    cylinders = (prescription.right_cylinder, prescription.left_cylinder)
+    problems = []
+    if any(sphere < 0 for sphere in spheres):
+        problems.append('nearsighted')
+    if any(sphere > 0 for sphere in spheres):
+        problems.append('farsighted')
+    if any(abs(cylinder) >= ASTIGMATISM_CYLINDER for cylinder in cylinders):
+        problems.append('astigmatism')
+    return problems
+
+
+def _top_ids(bits, limit, window=1024):
+    """Highest set bits (newest product ids) of `bits`, in descending order.
+
+    Bits are taken from a small window shifted off the top, so each id
+    costs a small-int operation instead of a copy of the whole bitset.
+    """
+    ids = []
+    while bits and len(ids) < limit:
+        low = max(bits.bit_length() - window, 0)
+        top = bits >> low
+        while top and len(ids) < limit:
+            bit = top.bit_length() - 1
+            ids.append(low + bit)
+            top ^= 1 << bit
+        bits &= (1 << low) - 1
+    return ids
+
+
+_executor = None
+_sync_lock = threading.Lock()
+
+
+def _sync_in_worker(index):
+    with _sync_lock:
+        index.sync_queued = False
+    try:
+        index.sync()
+    except Exception:
+        logger.exception('Recommendation index sync failed')
+    finally:
+        # Worker threads get their own connection, don't leak it
+        connection.close()
+
+
+class RecommendationIndex:
+    """In-memory inverted index: face shape / vision problem -> product id bitset.
+
+    Bit N of a bitset is set when product N carries the label, so a query is
+    a handful of integer ANDs instead of a table scan. Requests never touch
+    the product table: the index is built and refreshed on a background
+    thread. Saves and deletes in this process apply immediately through
+    signals. When the catalog version moves, changes made elsewhere (other
+    workers, bulk updates) are re-read by `updated_at`. Deletes can't be
+    found that way, so they bump DELETES_KEY and every process rebuilds.
+    Raw SQL deletes bypass the signal and are only seen on the next rebuild.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.sync_queued = False
+        self.version = None
+        self.deletes = None
+        self.watermark = None
+        self.products = {}
+        self.faces = {}
+        self.visions = {}
+        self.in_stock = 0
+
+    def _remove(self, pk):
+        entry = self.products.pop(pk, None)
+        if entry is None:
+            return
+        faces, visions, in_stock = entry
+        mask = ~(1 << pk)
+        for face in faces:
+            self.faces[face] &= mask
+        for vision in visions:
+            self.visions[vision] &= mask
+        if in_stock:
+            self.in_stock &= mask
+
+    def _add(self, pk, face_shapes, vision_problems, stock):
+        self._remove(pk)
+        faces = _labels(face_shapes, FACE_SHAPES)
+        visions = _labels(vision_problems, VISION_PROBLEMS)
+        bit = 1 << pk
+        for face in faces:
+            self.faces[face] = self.faces.get(face, 0) | bit
+        for vision in visions:
+            self.visions[vision] = self.visions.get(vision, 0) | bit
+        if stock > 0:
+            self.in_stock |= bit
+        self.products[pk] = (faces, visions, stock > 0)
+
+    def _load(self, queryset):
+        rows = queryset.values_list('id', 'face_shapes', 'vision_problems', 'stock', 'updated_at')
+        for pk, face_shapes, vision_problems, stock, updated_at in rows.iterator(chunk_size=5000):
+            self._add(pk, face_shapes, vision_problems, stock)
+            if self.watermark is None or updated_at > self.watermark:
+                self.watermark = updated_at
+
+    def _is_stale(self):
+        return self.version != get_catalog_version() or self.deletes != cache.get(DELETES_KEY)
+
+    def rebuild(self):
+        """Load every product into a fresh index, then swap it in"""
+        # Read before loading, so changes committed during the load mark it stale
+        version, deletes = get_catalog_version(), cache.get(DELETES_KEY)
+        fresh = RecommendationIndex()
+        fresh._load(Product.objects.all())
+        with self.lock:
+            self.products, self.faces, self.visions = fresh.products, fresh.faces, fresh.visions
+            self.in_stock, self.watermark = fresh.in_stock, fresh.watermark
+            self.version, self.deletes = version, deletes
+
+    def sync(self):
+        """Bring the index up to date if the catalog changed since the last sync"""
+        with self.lock:
+            if self.version is not None and self.deletes == cache.get(DELETES_KEY):
+                version = get_catalog_version()
+                if version != self.version:
+                    self.version = version
+                    if self.watermark is None:
+                        self._load(Product.objects.all())
+                    else:
+                        self._load(Product.objects.filter(updated_at__gte=self.watermark - SYNC_LOOKBACK))
+                return
+        self.rebuild()
+
+    def schedule_sync(self):
+        """Sync on a background thread; requests made while one is queued share it"""
+        global _executor
+        with _sync_lock:
+            if self.sync_queued:
+                return
+            self.sync_queued = True
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='recommendation-index')
+        _executor.submit(_sync_in_worker, self)
+
+    def update_product(self, product):
+        with self.lock:
+            if self.version is not None:
+                self._add(product.pk, product.face_shapes, product.vision_problems, product.stock)
+
+    def remove_product(self, pk):
+        with self.lock:
+            self._remove(pk)
+        # Other processes learn about the delete from the new generation
+        cache.set(DELETES_KEY, time.time_ns(), timeout=None)
+
+    def recommend(self, face_shape, vision_problems=(), limit=12):
+        """Ids of in-stock frames for `face_shape`, best matches first.
+
+        Frames matching every requested vision problem come first, then those
+        matching some, then the rest; newest first within each tier. Raises
+        IndexNotReady until the first background build has finished.
+        """
+        if self.version is None:
+            self.schedule_sync()
+            raise IndexNotReady()
+        if self._is_stale():
+            self.schedule_sync()
+        candidates = self.faces.get(face_shape, 0) & self.in_stock
+        if vision_problems:
+            masks = [self.visions.get(problem, 0) for problem in vision_problems]
+            every, some = candidates, 0
+            for mask in masks:
+                every &= mask
+                some |= mask
+            some &= candidates
+            tiers = [every, some & ~every, candidates & ~some]
+        else:
+            tiers = [candidates]
+
+        ids = []
+        for tier in tiers:
+            ids.extend(_top_ids(tier, limit - len(ids)))
+            if len(ids) >= limit:
+                break
+        return ids
+
+
+recommendation_index = RecommendationIndex()
@@ -0,0 +1,67 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db.models import F, FloatField, OuterRef, Q, Subquery
+from django.db.models.functions import Cast
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Category, FrameType, Product
+
+SEARCH_CONFIG = 'english'
+SEARCH_PARAM = 'search'
+
+
+def product_search_vector():
+    """Weighted tsvector expression for a product row.
+
+    Category and frame type names come from correlated subqueries so the
+    vector can be written with a single UPDATE statement.
+    """
+    category_name = Subquery(Category.objects.filter(pk=OuterRef('category_id')).values('name')[:1])
+    frame_type_name = Subquery(FrameType.objects.filter(pk=OuterRef('frame_type_id')).values('name')[:1])
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(category_name, frame_type_name, weight='B', config=SEARCH_CONFIG)
+        + SearchVector('frame_material', weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset=None):
+    """Recompute `search_vector` for the given products (all when None)"""
+    if queryset is None:
+        queryset = Product.objects.all()
+    return queryset.order_by().update(search_vector=product_search_vector())
+
+
+def search_products(queryset, term):
+    """Full-text search with a trigram fallback on the product name.
+
+    The full-text match is served by the GIN index on `search_vector` and
+    the `%` similarity match (typos such as "aviater") by the trigram GIN
+    index on `name`; PostgreSQL combines both with a BitmapOr. Results are
+    annotated with `rank`, the text rank plus the name similarity.
+    """
+    query = SearchQuery(term, search_type='websearch', config=SEARCH_CONFIG)
+    return queryset.filter(
+        Q(search_vector=query) | Q(name__trigram_similar=term)
+    ).annotate(
+        rank=Cast(SearchRank(F('search_vector'), query) + TrigramSimilarity('name', term), FloatField())
+    ).order_by('-rank', '-id')
+
+
+class ProductSearchFilter(BaseFilterBackend):
+    """`?search=` backend for products, ranked by relevance"""
+
+    def get_search_term(self, request):
+        return request.query_params.get(SEARCH_PARAM, '').strip()
+
+    def filter_queryset(self, request, queryset, view):
+        term = self.get_search_term(request)
+        if not term:
+            return queryset
+        return search_products(queryset, term)
+
+    def get_ordering(self, request, queryset, view):
+        # Picked up by CursorPagination so paginated searches stay ranked
+        if self.get_search_term(request):
+            return ('-rank', '-id')
+        return None
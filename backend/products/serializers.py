@@ -1,9 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import FrameType ,Category, Accessory, Product 
+from .images import schedule_image_processing, store_upload
 from django.conf import settings
-from django.core.files.storage import default_storage
-import os
+from core.fieldsets import SparseFieldsMixin
 
 User = get_user_model()
 
@@ -18,7 +18,31 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description' ,'created_at']        
 
 
-class ProductSerializer(serializers.ModelSerializer):
+def finish_product_representation(rep, images, variants, media_url, wants=lambda name: True):
+    """Add image URLs and list defaults; shared with products.readers"""
+    images = images or []
+
+    for field in ['features', 'face_shapes', 'vision_problems', 'colors']:
+        if field in rep and rep[field] is None:
+            rep[field] = []
+
+    if wants('images'):
+        rep['images'] = [media_url(image) for image in images]
+
+    # One entry per image, empty until the background resize has run
+    if wants('image_variants'):
+        variants = variants or {}
+        rep['image_variants'] = [
+            {
+                name: {kind: media_url(path) for kind, path in files.items()}
+                for name, files in variants.get(image, {}).items()
+            }
+            for image in images
+        ]
+    return rep
+
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(),
@@ -41,7 +65,7 @@ class ProductSerializer(serializers.ModelSerializer):
    
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ['search_vector', 'image_variants']
         extra_kwargs = {
             'category': {'required': False},
             'frame_type': {'required': False},
@@ -50,38 +74,28 @@ class ProductSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         rep = super().to_representation(instance)
         request = self.context.get('request')
-        
-        if hasattr(instance, 'images'):
-            rep['images'] = instance.images or [] 
-            
-        for field in ['features', 'face_shapes', 'vision_problems', 'colors']:
-            if rep.get(field) is None:
-                rep[field] = []
-        
-        if 'images' in rep and rep['images']:
-            rep['images'] = [
-                request.build_absolute_uri(settings.MEDIA_URL + image) 
-                for image in rep['images']
-            ]
-        
-        return rep
-    
+        return finish_product_representation(
+            rep, instance.images, instance.image_variants,
+            lambda path: request.build_absolute_uri(settings.MEDIA_URL + path),
+            self.wants,
+        )
+
     def create(self, validated_data):
         uploaded_images = validated_data.pop('images', [])
         product = super().create(validated_data)
 
-        image_paths = []
-        for image in uploaded_images:
-            file_path = f'products/{product.id}/{image.name}'
-            saved_path = default_storage.save(file_path, image)
-            image_paths.append(saved_path)
-           
-        product.images = image_paths
+        product.images = [store_upload(image) for image in uploaded_images]
         product.save()
+        schedule_image_processing(product.id)
         return product
     
     existing_images = serializers.CharField(write_only=True, required=False)
 
+    def validate_stock(self, value):
+        if value < 0:
+            raise serializers.ValidationError("Stock cannot be negative.")
+        return value
+
     def update(self, instance, validated_data):
         uploaded_images = validated_data.pop('images', [])
         existing_images_json = validated_data.pop('existing_images', '[]')
@@ -91,30 +105,25 @@ class ProductSerializer(serializers.ModelSerializer):
         except:
             existing_images = set()
 
-        # Delete old images not in the current list
-        old_images = set(instance.images or [])
-        images_to_keep = old_images & existing_images
-        images_to_delete = old_images - images_to_keep
-
-        for image_path in images_to_delete:
-            full_path = os.path.join(settings.MEDIA_ROOT, image_path)
-            if default_storage.exists(image_path):
-                default_storage.delete(image_path)
+        # Dropped images stay on disk until the collect_media command removes
+        # them, they may be shared with other products
+        images_to_keep = set(instance.images or []) & existing_images
 
         # Add newly uploaded images
-        new_image_paths = []
-        for image in uploaded_images:
-            file_path = f'products/{instance.id}/{image.name}'
-            saved_path = default_storage.save(file_path, image)
-            new_image_paths.append(saved_path)
+        new_image_paths = [store_upload(image) for image in uploaded_images]
 
         # Combine kept + newly added
         instance.images = list(images_to_keep) + new_image_paths
+        instance.image_variants = {
+            path: files for path, files in (instance.image_variants or {}).items() if path in images_to_keep
+        }
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
         instance.save()
+        if new_image_paths:
+            schedule_image_processing(instance.id)
         return instance
     
     
@@ -141,4 +150,30 @@ class AccessorySerializer(serializers.ModelSerializer):
     def validate_stock(self, value):
         if value < 0:
             raise serializers.ValidationError("Stock cannot be negative.")
-        return value
\ No newline at end of file
+        return value
+
+
+class StockAdjustmentSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    delta = serializers.IntegerField(required=False)
+    absolute = serializers.IntegerField(required=False, min_value=0)
+
+    def validate(self, data):
+        if ('delta' in data) == ('absolute' in data):
+            raise serializers.ValidationError("Provide exactly one of 'delta' or 'absolute'.")
+        return data
+
+
+class BulkStockSerializer(serializers.Serializer):
+    MAX_ITEMS = 5000
+
+    items = StockAdjustmentSerializer(many=True, allow_empty=False)
+    atomic = serializers.BooleanField(default=True)
+
+    def validate_items(self, value):
+        if len(value) > self.MAX_ITEMS:
+            raise serializers.ValidationError(f"At most {self.MAX_ITEMS} items per request.")
+        ids = [item['id'] for item in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Each id may only appear once.")
+        return value
@@ -0,0 +1,355 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+
+from .models import Product
+
+try:
+    import fcntl
+except ImportError:  # Windows, single process development only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class IndexNotReady(Exception):
+    """No index has been built yet; one is being built in the background"""
+
+
+FIELDS = (
+    'id', 'price', 'weight', 'size', 'frame_type_id', 'category_id',
+    'frame_material', 'colors', 'features', 'face_shapes',
+)
+SIZES = {'S': 0.0, 'M': 0.5, 'L': 1.0}
+# Relative say of each group in the similarity, groups are unit length before weighting
+GROUP_WEIGHTS = {
+    'numeric': 1.0,
+    'frame_type': 1.0,
+    'category': 0.75,
+    'frame_material': 0.75,
+    'face_shapes': 1.0,
+    'colors': 0.5,
+    'features': 0.5,
+}
+CATEGORICAL = ['frame_type', 'category', 'frame_material']
+MULTI_VALUED = ['face_shapes', 'colors', 'features']
+# Free rows reserved at build time for products created later
+HEADROOM = 0.25
+CHUNK_ROWS = 65536
+CURRENT = 'CURRENT'
+
+
+def _labels(row, group):
+    if group == 'frame_type':
+        return [str(row['frame_type_id'])] if row['frame_type_id'] is not None else []
+    if group == 'category':
+        return [str(row['category_id'])] if row['category_id'] is not None else []
+    if group == 'frame_material':
+        value = (row['frame_material'] or '').strip().lower()
+        return [value] if value else []
+    return sorted({str(value).strip().lower() for value in row[group] or [] if str(value).strip()})
+
+
+class Encoder:
+    """Turns a product row into a unit length feature vector.
+
+    Numeric columns are min-max scaled (price on a log scale), categorical
+    columns are one-hot and list columns multi-hot. Each group is normalised
+    and weighted on its own so that, say, a frame with many colours doesn't
+    outweigh its shape. Cosine similarity is then a plain dot product.
+    """
+
+    def __init__(self, meta):
+        self.ranges = meta['ranges']
+        self.vocab = meta['vocab']
+        self.offsets = {}
+        offset = 3
+        for group in CATEGORICAL + MULTI_VALUED:
+            self.offsets[group] = {value: offset + i for i, value in enumerate(self.vocab[group])}
+            offset += len(self.vocab[group])
+        self.dim = offset
+
+    @staticmethod
+    def fit(rows):
+        vocab = {group: set() for group in CATEGORICAL + MULTI_VALUED}
+        ranges = {'price': [None, None], 'weight': [None, None]}
+        for row in rows:
+            for group in vocab:
+                vocab[group].update(_labels(row, group))
+            for name, value in (('price', np.log1p(float(row['price']))), ('weight', float(row['weight']))):
+                low, high = ranges[name]
+                ranges[name] = [value if low is None else min(low, value), value if high is None else max(high, value)]
+        return {'vocab': {group: sorted(values) for group, values in vocab.items()}, 'ranges': ranges}
+
+    def _scale(self, name, value):
+        low, high = self.ranges[name]
+        if low is None or high <= low:
+            return 0.5
+        return min(max((value - low) / (high - low), 0.0), 1.0)
+
+    def encode(self, row):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        numeric = np.array([
+            self._scale('price', np.log1p(float(row['price']))),
+            self._scale('weight', float(row['weight'])),
+            SIZES.get((row['size'] or '').upper(), 0.5),
+        ], dtype=np.float32)
+        vector[:3] = numeric / max(np.linalg.norm(numeric), 1e-6) * GROUP_WEIGHTS['numeric']
+        for group in CATEGORICAL + MULTI_VALUED:
+            # Values unseen at build time are ignored until the next rebuild
+            columns = [self.offsets[group][label] for label in _labels(row, group) if label in self.offsets[group]]
+            if columns:
+                vector[columns] = GROUP_WEIGHTS[group] / np.sqrt(len(columns))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+_thread_lock = threading.RLock()
+
+
+def index_root():
+    return settings.SIMILARITY_INDEX_DIR
+
+
+@contextmanager
+def _writer_lock():
+    """Serialise writers across worker processes (and threads)"""
+    os.makedirs(index_root(), exist_ok=True)
+    with _thread_lock, open(os.path.join(index_root(), '.lock'), 'w') as fh:
+        if fcntl:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def build_index():
+    """Write a fresh generation of the index and atomically make it current"""
+    with _writer_lock():
+        queryset = Product.objects.order_by('id').values(*FIELDS)
+        meta = Encoder.fit(queryset.iterator(chunk_size=5000))
+        encoder = Encoder(meta)
+        count = queryset.count()
+        capacity = max(int(count * (1 + HEADROOM)), count + 64)
+
+        generation = str(time.time_ns())
+        directory = os.path.join(index_root(), generation)
+        os.makedirs(directory)
+        matrix = np.lib.format.open_memmap(
+            os.path.join(directory, 'matrix.npy'), mode='w+', dtype=np.float32, shape=(capacity, encoder.dim)
+        )
+        ids = np.lib.format.open_memmap(os.path.join(directory, 'ids.npy'), mode='w+', dtype=np.int64, shape=(capacity,))
+        ids[:] = -1
+        row = 0
+        for product in queryset.iterator(chunk_size=5000):
+            if row == capacity:
+                break  # created during the build, picked up by the signal handler
+            matrix[row] = encoder.encode(product)
+            ids[row] = product['id']
+            row += 1
+        matrix.flush()
+        ids.flush()
+        del matrix, ids
+        with open(os.path.join(directory, 'meta.json'), 'w') as fh:
+            json.dump({**meta, 'generation': generation, 'dim': encoder.dim, 'capacity': capacity}, fh)
+
+        pointer = os.path.join(index_root(), CURRENT)
+        with open(pointer + '.tmp', 'w') as fh:
+            fh.write(generation)
+        os.replace(pointer + '.tmp', pointer)
+
+        # Readers still mapping an old generation keep their open files
+        for name in os.listdir(index_root()):
+            path = os.path.join(index_root(), name)
+            if name != generation and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+        return {'generation': generation, 'products': row, 'capacity': capacity, 'dimensions': encoder.dim}
+
+
+class SimilarityIndex:
+    """Read side: the current generation memory mapped read-only.
+
+    Pages are shared through the OS page cache, so every worker process on
+    the host uses one copy. In-place row updates made by any process show up
+    immediately; a rebuild is noticed through the CURRENT pointer.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pointer_mtime = None
+        self.generation = None
+        self.matrix = None
+        self.ids = None
+        self.encoder = None
+
+    def _refresh(self):
+        pointer = os.path.join(index_root(), CURRENT)
+        try:
+            mtime = os.stat(pointer).st_mtime_ns
+        except FileNotFoundError:
+            # Never build inline, it scans the whole catalog. Deploys run
+            # build_similarity_index; this only covers a missed first build.
+            schedule_rebuild()
+            raise IndexNotReady()
+        if mtime == self.pointer_mtime:
+            return
+        with self.lock:
+            try:
+                self._load(pointer, mtime)
+            except FileNotFoundError:
+                # A rebuild replaced the generation while we were opening it
+                self._load(pointer, os.stat(pointer).st_mtime_ns)
+
+    def _load(self, pointer, mtime):
+        with open(pointer) as fh:
+            generation = fh.read().strip()
+        directory = os.path.join(index_root(), generation)
+        with open(os.path.join(directory, 'meta.json')) as fh:
+            meta = json.load(fh)
+        self.matrix = np.load(os.path.join(directory, 'matrix.npy'), mmap_mode='r')
+        self.ids = np.load(os.path.join(directory, 'ids.npy'), mmap_mode='r')
+        self.encoder = Encoder(meta)
+        self.generation = generation
+        self.pointer_mtime = mtime
+
+    def similar(self, pk, limit=12):
+        """[(product id, cosine similarity)] of the `limit` closest products to `pk`.
+
+        Raises IndexNotReady when no index has been built yet.
+        """
+        self._refresh()
+        matrix, ids = self.matrix, self.ids
+        rows = np.flatnonzero(ids == pk)
+        if len(rows):
+            vector = np.array(matrix[rows[0]])
+        else:
+            product = Product.objects.filter(pk=pk).values(*FIELDS).first()
+            if product is None:
+                return None
+            vector = self.encoder.encode(product)
+
+        best_scores, best_rows = [], []
+        for start in range(0, len(ids), CHUNK_ROWS):
+            scores = matrix[start:start + CHUNK_ROWS] @ vector
+            scores[ids[start:start + CHUNK_ROWS] < 0] = -np.inf
+            scores[ids[start:start + CHUNK_ROWS] == pk] = -np.inf
+            k = min(limit, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            best_scores.append(scores[top])
+            best_rows.append(top + start)
+
+        scores = np.concatenate(best_scores)
+        rows = np.concatenate(best_rows)
+        order = np.argsort(-scores, kind='stable')[:limit]
+        return [(int(ids[rows[i]]), float(scores[i])) for i in order if np.isfinite(scores[i])]
+
+
+similarity_index = SimilarityIndex()
+
+
+def _open_current():
+    pointer = os.path.join(index_root(), CURRENT)
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer) as fh:
+        directory = os.path.join(index_root(), fh.read().strip())
+    with open(os.path.join(directory, 'meta.json')) as fh:
+        meta = json.load(fh)
+    matrix = np.load(os.path.join(directory, 'matrix.npy'), mmap_mode='r+')
+    ids = np.load(os.path.join(directory, 'ids.npy'), mmap_mode='r+')
+    return Encoder(meta), matrix, ids
+
+
+def update_product(pk):
+    """Re-encode one product's row in place (or take a free row for a new product)"""
+    if not os.path.exists(os.path.join(index_root(), CURRENT)):
+        return
+    product = Product.objects.filter(pk=pk).values(*FIELDS).first()
+    if product is None:
+        remove_product(pk)
+        return
+    with _writer_lock():
+        current = _open_current()
+        if current is None:
+            return
+        encoder, matrix, ids = current
+        rows = np.flatnonzero(ids == pk)
+        if not len(rows):
+            rows = np.flatnonzero(ids < 0)
+        if len(rows):
+            # Vector first, so readers never match the id against a stale row
+            matrix[rows[0]] = encoder.encode(product)
+            matrix.flush()
+            ids[rows[0]] = pk
+            ids.flush()
+            return
+    # Out of free rows, rebuild with fresh headroom. Until it lands the
+    # product is encoded on the fly when asked for, it just can't be a match.
+    schedule_rebuild()
+
+
+def remove_product(pk):
+    with _writer_lock():
+        current = _open_current()
+        if current is None:
+            return
+        _, matrix, ids = current
+        for row in np.flatnonzero(ids == pk):
+            ids[row] = -1
+            matrix[row] = 0
+        ids.flush()
+        matrix.flush()
+
+
+def safely(function, *args):
+    """Index maintenance must never break the request that triggered it"""
+    try:
+        function(*args)
+    except Exception:
+        logger.exception('Similarity index update failed')
+
+
+_executor = None
+_rebuild_lock = threading.Lock()
+_rebuild_pending = False
+
+
+def _rebuild_in_worker():
+    global _rebuild_pending
+    with _rebuild_lock:
+        _rebuild_pending = False
+    try:
+        build_index()
+    except Exception:
+        logger.exception('Similarity index rebuild failed')
+    finally:
+        # Worker threads get their own connection, don't leak it
+        connection.close()
+
+
+def schedule_rebuild():
+    """Rebuild on a background thread; requests made while one is queued share it"""
+    global _executor, _rebuild_pending
+    with _rebuild_lock:
+        if _rebuild_pending:
+            return
+        _rebuild_pending = True
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='similarity-index')
+    _executor.submit(_rebuild_in_worker)
+
+
+def rebuild_if_built():
+    if os.path.exists(os.path.join(index_root(), CURRENT)):
+        schedule_rebuild()
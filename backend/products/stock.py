@@ -0,0 +1,62 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Now
+
+from .cache import invalidate_catalog
+
+
+def apply_stock_adjustments(model, items, atomic=True):
+    """Apply `{id, delta | absolute}` stock changes to `model` in one transaction.
+
+    Rows are locked in primary key order (so concurrent batches cannot
+    deadlock), every change is checked against the locked stock so nothing
+    goes below zero, and all accepted changes are written by a single
+    UPDATE with `stock = stock + delta` CASE branches. With `atomic`, one
+    rejected item rejects the whole batch.
+
+    Returns one result per item, in request order.
+    """
+    ids = sorted({item['id'] for item in items})
+    results = []
+    whens = []
+
+    with transaction.atomic():
+        current = dict(
+            model.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk', 'stock')
+        )
+
+        for item in items:
+            pk = item['id']
+            if pk not in current:
+                results.append({'id': pk, 'status': 'not_found'})
+                continue
+
+            if item.get('delta') is not None:
+                new_stock = current[pk] + item['delta']
+                expression = F('stock') + item['delta']
+            else:
+                new_stock = item['absolute']
+                expression = Value(item['absolute'])
+
+            if new_stock < 0:
+                results.append({'id': pk, 'status': 'insufficient_stock', 'stock': current[pk]})
+                continue
+
+            whens.append(When(pk=pk, then=expression))
+            results.append({'id': pk, 'status': 'ok', 'previous_stock': current[pk], 'stock': new_stock})
+
+        failed = len(whens) != len(items)
+        if not whens or (atomic and failed):
+            # Nothing to write, report the accepted items as not applied
+            for result in results:
+                if result['status'] == 'ok':
+                    result['status'] = 'skipped'
+            return results
+
+        updates = {'stock': Case(*whens, default=F('stock'), output_field=IntegerField())}
+        if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+            updates['updated_at'] = Now()
+        model.objects.filter(pk__in=[result['id'] for result in results if result['status'] == 'ok']).update(**updates)
+        invalidate_catalog()
+
+    return results
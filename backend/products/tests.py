@@ -1,3 +1,489 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models import F
+from django.db.models.functions import Now
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from core.models import User
+from .cache import bump_catalog_version, invalidate_catalog
+from .filters import product_facets
+from .models import Accessory, Category, FrameType, Product
+from .recommendations import DELETES_KEY, RecommendationIndex
+from .serializers import ProductSerializer
+from .similarity import CURRENT, IndexNotReady, build_index, update_product
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class StockPermissionTests(APITestCase):
+    """Stock writes are limited to admins and manufacturers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(
+            name='Test frame', price=Decimal('49.99'), size='M', weight=20, stock=10, description='Frame',
+        )
+        cls.customer = User.objects.create_user(email='customer@example.com', name='Customer', password='x')
+        cls.manufacturer = User.objects.create_user(
+            email='maker@example.com', name='Maker', password='x', role='manufacturer',
+        )
+
+    def bulk_stock(self, user):
+        self.client.force_authenticate(user)
+        return self.client.post(
+            reverse('product-bulk-stock'), {'items': [{'id': self.product.id, 'absolute': 0}]}, format='json',
+        )
+
+    def test_customer_cannot_bulk_update_stock(self):
+        self.assertEqual(self.bulk_stock(self.customer).status_code, 403)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)
+
+    def test_customer_cannot_update_stock(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.patch(
+            reverse('product-update-stock', args=[self.product.id]), {'stock': 0}, format='json',
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_anonymous_cannot_update_stock(self):
+        response = self.client.patch(
+            reverse('product-update-stock', args=[self.product.id]), {'stock': 0}, format='json',
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_manufacturer_can_bulk_update_stock(self):
+        response = self.bulk_stock(self.manufacturer)
+        self.assertEqual(response.status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SimilarProductsTests(APITestCase):
+    """The similarity index is never built inside a request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [
+            Product.objects.create(
+                name=f'Frame {n}', price=Decimal(40 + n), size='M', weight=20 + n, stock=5, description='Frame',
+            )
+            for n in range(3)
+        ]
+
+    def setUp(self):
+        index_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(index_dir.cleanup)
+        self.index_dir = index_dir.name
+        settings_override = override_settings(SIMILARITY_INDEX_DIR=self.index_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        self.schedule_rebuild = mock.patch('products.similarity.schedule_rebuild').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def similar(self):
+        return self.client.get(reverse('product-similar', args=[self.products[0].id]))
+
+    def test_missing_index_is_a_503_and_a_background_build(self):
+        response = self.similar()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '30')
+        self.schedule_rebuild.assert_called_once_with()
+        self.assertFalse(os.path.exists(os.path.join(self.index_dir, CURRENT)))
+
+    def test_built_index_answers(self):
+        build_index()
+        response = self.similar()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({row['id'] for row in response.data['results']}, {p.id for p in self.products[1:]})
+
+    def test_full_index_rebuilds_in_the_background(self):
+        build_index()
+        extra = Product.objects.bulk_create([
+            Product(name=f'Extra {n}', price=Decimal(60), size='L', weight=30, stock=1, description='Frame')
+            for n in range(70)
+        ])
+        for product in extra:
+            update_product(product.id)
+        self.schedule_rebuild.assert_called()
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class RecommendationIndexTests(APITestCase):
+    """Recommendations are answered from memory, never from a Product scan in the request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        def frame(name, face_shapes, vision_problems, stock=5):
+            return Product.objects.create(
+                name=name, price=Decimal('50.00'), size='M', weight=20, stock=stock, description='Frame',
+                face_shapes=face_shapes, vision_problems=vision_problems,
+            )
+
+        cls.plain = frame('Plain', ['oval'], [])
+        cls.both = frame('Both', ['Oval', 'round'], ['nearsighted', 'astigmatism'])
+        cls.near = frame('Near', ['oval'], ['nearsighted'])
+        cls.both_newer = frame('Both newer', ['oval'], ['astigmatism', 'nearsighted'])
+        cls.sold_out = frame('Sold out', ['oval'], ['nearsighted', 'astigmatism'], stock=0)
+        cls.square = frame('Square', ['square'], ['nearsighted'])
+
+    def setUp(self):
+        cache.clear()
+        index_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(index_dir.cleanup)
+        settings_override = override_settings(SIMILARITY_INDEX_DIR=index_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.index = RecommendationIndex()
+        for target in ('products.views.recommendation_index', 'products.recommendations.recommendation_index'):
+            mock.patch(target, self.index).start()
+        self.schedule_sync = mock.patch.object(self.index, 'schedule_sync').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_unbuilt_index_is_a_503_and_a_background_build(self):
+        with self.assertNumQueries(0):
+            with self.assertRaises(IndexNotReady):
+                self.index.recommend('oval')
+        self.schedule_sync.assert_called_once_with()
+        response = self.client.get(reverse('product-recommendations'), {'face_shape': 'oval'})
+        self.assertEqual(response.status_code, 503)
+
+    def test_tiers_rank_full_then_partial_then_other_matches(self):
+        self.index.rebuild()
+        with self.assertNumQueries(0):
+            ids = self.index.recommend('oval', ['nearsighted', 'astigmatism'])
+        self.assertEqual(ids, [self.both_newer.id, self.both.id, self.near.id, self.plain.id])
+        self.assertEqual(self.index.recommend('oval'), [self.both_newer.id, self.near.id, self.both.id, self.plain.id])
+        self.assertEqual(self.index.recommend('oval', ['nearsighted'], limit=2), [self.both_newer.id, self.near.id])
+
+    def test_out_of_stock_frames_are_left_out(self):
+        self.index.rebuild()
+        response = self.client.get(
+            reverse('product-recommendations'), {'face_shape': 'oval', 'vision_problem': 'nearsighted'},
+        )
+        self.assertEqual(response.status_code, 200)
+        ids = [row['id'] for row in response.data['results']]
+        self.assertNotIn(self.sold_out.id, ids)
+        self.assertNotIn(self.square.id, ids)
+        self.assertEqual(len(ids), 4)
+
+    def test_saves_and_deletes_apply_without_a_rebuild(self):
+        self.index.rebuild()
+        with self.captureOnCommitCallbacks(execute=True):
+            added = Product.objects.create(
+                name='Added', price=Decimal('50.00'), size='M', weight=20, stock=3, description='Frame',
+                face_shapes=['oval'], vision_problems=['nearsighted', 'astigmatism'],
+            )
+        self.assertEqual(self.index.recommend('oval', ['nearsighted', 'astigmatism'])[0], added.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            added.stock = 0
+            added.save()
+        self.assertNotIn(added.id, self.index.recommend('oval'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.both_newer.delete()
+        self.assertNotIn(self.both_newer.id, self.index.recommend('oval'))
+        # Other processes see the new delete generation and rebuild
+        self.assertIsNotNone(cache.get(DELETES_KEY))
+        self.assertNotEqual(self.index.deletes, cache.get(DELETES_KEY))
+
+    def test_catalog_change_is_synced_in_the_background(self):
+        self.index.rebuild()
+        Product.objects.filter(pk=self.near.pk).update(stock=0, updated_at=Now())
+        bump_catalog_version()
+        with self.assertNumQueries(0):
+            self.assertIn(self.near.id, self.index.recommend('oval'))
+        self.schedule_sync.assert_called_once_with()
+
+        # What the background worker runs: one delta query, no count and no rebuild
+        with self.assertNumQueries(1):
+            self.index.sync()
+        self.assertNotIn(self.near.id, self.index.recommend('oval'))
+
+    def test_delete_elsewhere_triggers_a_rebuild(self):
+        self.index.rebuild()
+        Product.objects.filter(pk=self.plain.pk).delete()
+        cache.set(DELETES_KEY, 1, timeout=None)
+        self.index.sync()
+        self.assertNotIn(self.plain.id, self.index.recommend('oval'))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ProductReaderTests(APITestCase):
+    """ProductReader output is exactly what ProductSerializer produces"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Sunglasses', description='Shades')
+        frame_type = FrameType.objects.create(name='Aviator', description='Teardrop lenses')
+        cls.products = [
+            Product.objects.create(
+                name='Complete', price=Decimal('129.90'), size='L', weight=24.5, stock=4, description='Frame',
+                category=category, frame_type=frame_type, frame_material='Titanium',
+                images=['products/cas/ab/front.jpg', 'products/side view (1).png'],
+                image_variants={
+                    'products/cas/ab/front.jpg': {
+                        size: {'default': f'products/variants/front-{size}.jpg', 'webp': f'products/variants/front-{size}.webp'}
+                        for size in ('thumb', 'large')
+                    },
+                },
+                face_shapes=['oval'], vision_problems=['nearsighted'], features=['polarized'], colors=['gold'],
+            ),
+            Product.objects.create(
+                name='Bare', price=Decimal('15.00'), size='S', weight=12, stock=0, description='',
+                category=None, frame_type=None,
+            ),
+            Product.objects.create(
+                name='Shared category', price=Decimal('60.00'), size='M', weight=18, stock=2, description='Frame',
+                category=category, frame_type=None, images=['products/cas/cd/only.jpg'],
+            ),
+        ]
+
+    def serialized(self, path, params, instances):
+        request = Request(APIRequestFactory().get(path, params))
+        data = ProductSerializer(instances, many=True, context={'request': request}).data
+        return json_round_trip(data)
+
+    def assertSameOutput(self, actual, expected):
+        self.assertEqual(actual, expected)
+        for actual_row, expected_row in zip(actual, expected):
+            self.assertEqual(list(actual_row), list(expected_row))
+
+    def test_list_matches_the_serializer(self):
+        for params in ({}, {'fields': 'id,name,images,category'}, {'omit': 'image_variants,description'}):
+            response = self.client.get(reverse('product-list'), params)
+            expected = self.serialized(reverse('product-list'), params, Product.objects.order_by('-created_at'))
+            self.assertSameOutput(response.json(), expected)
+
+    def test_retrieve_matches_the_serializer(self):
+        for product in self.products:
+            path = reverse('product-detail', args=[product.id])
+            for params in ({}, {'fields': 'image_variants,frame_type'}):
+                response = self.client.get(path, params)
+                self.assertSameOutput([response.json()], self.serialized(path, params, [product]))
+
+    def test_variants_line_up_with_images(self):
+        response = self.client.get(reverse('product-detail', args=[self.products[0].id]))
+        variants = response.json()['image_variants']
+        self.assertEqual(len(variants), 2)
+        self.assertEqual(variants[0]['thumb']['webp'], 'http://testserver/media/products/variants/front-thumb.webp')
+        self.assertEqual(variants[1], {})
+
+
+def json_round_trip(data):
+    return json.loads(JSONRenderer().render(data))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ProductFacetTests(APITestCase):
+    """List filters OR their comma separated values; each facet is counted without its own filter"""
+
+    @classmethod
+    def setUpTestData(cls):
+        sunglasses = Category.objects.create(name='Sunglasses')
+
+        def frame(name, face_shapes, colors, frame_material, size, category=None):
+            return Product.objects.create(
+                name=name, price=Decimal('50.00'), size=size, weight=20, stock=5, description='Frame',
+                face_shapes=face_shapes, colors=colors, frame_material=frame_material, category=category,
+            )
+
+        cls.a = frame('A', ['oval'], ['black'], 'Metal', 'M', sunglasses)
+        cls.b = frame('B', ['round'], ['black', 'gold'], 'Plastic', 'L')
+        cls.c = frame('C', ['oval', 'round'], ['gold'], 'Metal', 'M', sunglasses)
+        cls.d = frame('D', ['square'], [], '', 'S')
+        cls.sunglasses = sunglasses
+
+    def setUp(self):
+        cache.clear()
+
+    def facets(self, **params):
+        response = self.client.get(reverse('product-list'), {**params, 'facets': '1'})
+        self.assertEqual(response.status_code, 200)
+        ids = {row['id'] for row in response.data['results']}
+        facets = {
+            name: {row['value']: row['count'] for row in rows}
+            for name, rows in response.data['facets'].items() if name != 'price'
+        }
+        return ids, facets
+
+    def test_json_list_filters_match_any_value(self):
+        ids, _ = self.facets(face_shape='oval,square')
+        self.assertEqual(ids, {self.a.id, self.c.id, self.d.id})
+        ids, _ = self.facets(color='gold,black', face_shape='round')
+        self.assertEqual(ids, {self.b.id, self.c.id})
+        ids, _ = self.facets(color='gold', face_shape='square')
+        self.assertEqual(ids, set())
+
+    def test_facets_ignore_their_own_filter(self):
+        ids, facets = self.facets(face_shape='oval')
+        self.assertEqual(ids, {self.a.id, self.c.id})
+        # Other shapes are still counted against the rest of the filters
+        self.assertEqual(facets['face_shape'], {'oval': 2, 'round': 2, 'square': 1})
+        self.assertEqual(facets['color'], {'black': 1, 'gold': 1})
+        self.assertEqual(facets['frame_material'], {'Metal': 2})
+        self.assertEqual(facets['size'], {'M': 2})
+        self.assertEqual(facets['category'], {self.sunglasses.id: 2})
+
+        ids, facets = self.facets(face_shape='oval', frame_material='plastic')
+        self.assertEqual(ids, set())
+        self.assertEqual(facets['frame_material'], {'Metal': 2})
+        self.assertEqual(facets['face_shape'], {'round': 1})
+
+    def test_price_range_ignores_price_filters(self):
+        Product.objects.filter(pk=self.b.pk).update(price=Decimal('120.00'))
+        response = self.client.get(reverse('product-list'), {'max_price': '60', 'facets': '1'})
+        self.assertEqual(response.data['facets']['price'], {'min': '50.00', 'max': '120.00'})
+
+    def test_facets_are_a_fixed_number_of_queries(self):
+        with self.assertNumQueries(9):
+            product_facets(Product.objects.all(), {'face_shape': 'oval'})
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CatalogConditionalGetTests(APITestCase):
+    """Catalog responses are validated by ETag, which moves with every catalog write"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(
+            name='Frame', price=Decimal('49.99'), size='M', weight=20, stock=10, description='Frame',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_matching_etag_is_a_304_until_the_catalog_changes(self):
+        for url in (reverse('product-list'), reverse('product-detail', args=[self.product.id])):
+            response = self.client.get(url)
+            etag = response['ETag']
+            self.assertNotIn('Last-Modified', response)
+
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                Product.objects.filter(pk=self.product.pk).update(stock=F('stock') - 1)
+                invalidate_catalog()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_model_save_moves_the_etag(self):
+        url = reverse('product-detail', args=[self.product.id])
+        etag = self.client.get(url)['ETag']
+        # Keep the save's similarity index update away from a real index
+        with tempfile.TemporaryDirectory() as index_dir, override_settings(SIMILARITY_INDEX_DIR=index_dir), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Renamed frame'
+            self.product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'Renamed frame')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CatalogImportTests(APITestCase):
+    """CSV and JSON lines imports resolve names, skip bad rows by line and refuse non-finite numbers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manufacturer = User.objects.create_user(
+            email='maker@example.com', name='Maker', password='x', role='manufacturer',
+        )
+        cls.sunglasses = Category.objects.create(name='Sunglasses')
+        cls.aviator = FrameType.objects.create(name='Aviator')
+
+    def setUp(self):
+        self.client.force_authenticate(self.manufacturer)
+
+    def upload(self, name, content, **data):
+        return self.client.post(
+            reverse('catalog-import'), {'file': SimpleUploadedFile(name, content), **data}, format='multipart',
+        )
+
+    def test_csv_import(self):
+        content = (
+            'name,price,size,weight,stock,category,frame_type,face_shapes\n'
+            'Pilot,89.90,M,22.5,4,sunglasses,AVIATOR,oval|round\n'
+            'Bad price,abc,M,20,1,,,\n'
+            'Bad category,20,M,20,1,Goggles,,\n'
+            'Nan weight,20,M,nan,1,,,\n'
+            'Inf weight,20,M,inf,1,,,\n'
+            'Inf stock,20,M,20,Infinity,,,\n'
+            'Nan price,NaN,M,20,1,,,\n'
+            'Plain,15,S,12,0,,,\n'
+        ).encode()
+        response = self.upload('catalog.csv', content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], {'product': 2, 'accessory': 0})
+        self.assertEqual(response.data['errors'], [
+            {'line': 3, 'error': 'price must be a number.'},
+            {'line': 4, 'error': 'Unknown category "Goggles".'},
+            {'line': 5, 'error': 'weight must be a finite number.'},
+            {'line': 6, 'error': 'weight must be a finite number.'},
+            {'line': 7, 'error': 'stock must be a number.'},
+            {'line': 8, 'error': 'price must be a positive amount with at most 2 decimals.'},
+        ])
+
+        pilot = Product.objects.get(name='Pilot')
+        self.assertEqual((pilot.category_id, pilot.frame_type_id), (self.sunglasses.id, self.aviator.id))
+        self.assertEqual(pilot.face_shapes, ['oval', 'round'])
+        self.assertEqual(pilot.manufacturer, self.manufacturer)
+
+    def test_jsonl_import(self):
+        content = b'\n'.join([
+            b'{"name": "Pilot", "price": "89.90", "size": "M", "weight": 22.5, "stock": 4, '
+            b'"category": "Sunglasses", "frame_type": "aviator", "colors": ["gold", "black"]}',
+            b'{"type": "accessory", "name": "Hard case", "price": 12.5, "weight": 5, "stock": 30, '
+            b'"category": "SUNGLASSES"}',
+            b'{"name": "Broken"',
+            b'',
+            b'{"name": "Nan weight", "price": 20, "size": "M", "weight": NaN, "stock": 1}',
+            b'{"name": "Inf weight", "price": 20, "size": "M", "weight": Infinity, "stock": 1}',
+            b'["not", "an", "object"]',
+            b'{"name": "Unknown type", "type": "lens", "price": 20}',
+        ])
+        response = self.upload('catalog.jsonl', content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], {'product': 1, 'accessory': 1})
+        self.assertEqual([error['line'] for error in response.data['errors']], [3, 5, 6, 7, 8])
+        self.assertTrue(response.data['errors'][0]['error'].startswith('Invalid JSON'))
+        self.assertEqual(response.data['errors'][1]['error'], 'weight must be a finite number.')
+        self.assertEqual(response.data['errors'][2]['error'], 'weight must be a finite number.')
+
+        self.assertEqual(Product.objects.get(name='Pilot').colors, ['gold', 'black'])
+        self.assertEqual(Accessory.objects.get(name='Hard case').category_id, self.sunglasses.id)
+
+    def test_dry_run_writes_nothing(self):
+        response = self.upload('catalog.csv', b'name,price,size,weight,stock\nPilot,89.90,M,22.5,4\n', dry_run='true')
+        self.assertEqual(response.data['created'], {'product': 1, 'accessory': 0})
+        self.assertFalse(Product.objects.exists())
+
+    def test_undecodable_file_is_a_400_with_its_line(self):
+        content = b'name,price,size,weight,stock\nPilot,89.90,M,22.5,4\nCaf\xe9,10,M,20,1\n'
+        response = self.upload('catalog.csv', content)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['file_error'], {'line': 3, 'error': 'The file is not UTF-8 encoded.'})
+        # Rows before the bad line were still imported
+        self.assertEqual(response.data['created']['product'], 1)
+
+    def test_customers_cannot_import(self):
+        self.client.force_authenticate(User.objects.create_user(email='c@example.com', name='C', password='x'))
+        response = self.upload('catalog.csv', b'name,price,size,weight,stock\n')
+        self.assertEqual(response.status_code, 403)
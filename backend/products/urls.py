@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import FrameTypeViewSet,CategoryView, ProductViewSet,AccessoryViewSet
+from .views import FrameTypeViewSet,CategoryView, ProductViewSet,AccessoryViewSet, CatalogImportView
 
 router = DefaultRouter()
 router.register(r'frame-types', FrameTypeViewSet, basename='frame-type')
@@ -9,5 +9,6 @@ router.register(r'products', ProductViewSet, basename='product')
 router.register(r'accessories', AccessoryViewSet, basename='accessory')
 
 urlpatterns = [
+    path('import/', CatalogImportView.as_view(), name='catalog-import'),
     path('', include(router.urls)),
 ]
@@ -2,34 +2,277 @@ from django.shortcuts import render
 from rest_framework import viewsets,parsers,status
 from .models import FrameType,Category,Product,Accessory
 from rest_framework.permissions import IsAuthenticated
-from .serializers import FrameTypeSerializer,CategorySerializer, ProductSerializer,AccessorySerializer
+from .serializers import FrameTypeSerializer,CategorySerializer, ProductSerializer,AccessorySerializer, BulkStockSerializer
 from rest_framework.filters import SearchFilter
 from rest_framework.decorators import action
 from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.generics import get_object_or_404
 from django.contrib.auth import get_user_model
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import NotAuthenticated, NotFound, PermissionDenied
+from django_filters.rest_framework import DjangoFilterBackend
+from .filters import ProductFilter, product_facets, split_values
+from .search import ProductSearchFilter
+from .cache import CatalogCacheMixin
+from .stock import apply_stock_adjustments
+from .readers import ProductReader
+from .similarity import IndexNotReady, similarity_index
+from .recommendations import FACE_SHAPES, VISION_PROBLEMS, recommendation_index, vision_problems_from_prescription
+from prescriptions.models import Prescription
+from .importer import ACCESSORY, PRODUCT, import_catalog_file
+from core.pagination import CreatedAtCursorPagination
+from core.permission import IsAdmin, IsAdminOrManufacturer
+from core.streaming import export_response, get_export_format
 
 
 User = get_user_model()
 
-class FrameTypeViewSet(viewsets.ModelViewSet):
+
+class BulkStockMixin:
+    """Single and bulk stock endpoints backed by apply_stock_adjustments"""
+
+    @action(detail=True, methods=["patch"], url_path="update-stock", parser_classes=[JSONParser],
+            permission_classes=[IsAuthenticated, IsAdminOrManufacturer])
+    def update_stock(self, request, pk=None):
+        instance = self.get_object()
+        new_stock = request.data.get("stock")
+
+        if new_stock is None:
+            return Response({"error": "Stock value is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            new_stock = int(new_stock)
+        except (TypeError, ValueError):
+            return Response({"error": "Invalid stock value."}, status=status.HTTP_400_BAD_REQUEST)
+        if new_stock < 0:
+            return Response({"error": "Stock cannot be negative."}, status=status.HTTP_400_BAD_REQUEST)
+
+        apply_stock_adjustments(self.queryset.model, [{'id': instance.pk, 'absolute': new_stock}])
+        return Response({"message": "Stock updated successfully."})
+
+    @action(detail=False, methods=["post"], url_path="bulk-stock", parser_classes=[JSONParser],
+            permission_classes=[IsAuthenticated, IsAdminOrManufacturer])
+    def bulk_stock(self, request):
+        serializer = BulkStockSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = apply_stock_adjustments(
+            self.queryset.model,
+            serializer.validated_data['items'],
+            atomic=serializer.validated_data['atomic'],
+        )
+        applied = sum(1 for result in results if result['status'] == 'ok')
+        response_status = status.HTTP_200_OK
+        if serializer.validated_data['atomic'] and applied != len(results):
+            response_status = status.HTTP_409_CONFLICT
+        return Response({'applied': applied, 'results': results}, status=response_status)
+
+
+class BatchMixin:
+    """`batch` action returning the rows for `?ids=3,1,2` in that order, plus the ids that don't exist"""
+    max_batch_ids = 100
+
+    @action(detail=False, methods=["get"])
+    def batch(self, request):
+        ids = []
+        for value in split_values(','.join(request.query_params.getlist('ids'))):
+            try:
+                pk = int(value)
+            except ValueError:
+                return Response({"error": f'Invalid id "{value}".'}, status=status.HTTP_400_BAD_REQUEST)
+            if pk not in ids:
+                ids.append(pk)
+        if not ids:
+            return Response({"error": "ids is required."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.max_batch_ids:
+            return Response(
+                {"error": f"At most {self.max_batch_ids} ids per request."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        def build():
+            found = {item['id']: item for item in self.get_batch_data(self.get_queryset().filter(pk__in=ids))}
+            return Response({
+                'results': [found[pk] for pk in ids if pk in found],
+                'missing': [pk for pk in ids if pk not in found],
+            })
+
+        return self.cached_response(request, build)
+
+    def get_batch_data(self, queryset):
+        return self.get_serializer(queryset, many=True).data
+
+
+class ExportMixin:
+    """Admin `export` action streaming the filtered queryset as CSV or NDJSON"""
+    export_fields = []
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated, IsAdmin])
+    def export(self, request):
+        file_format = get_export_format(request)
+        if file_format is None:
+            return Response({"error": "file_format must be csv or ndjson."}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.filter_queryset(self.get_queryset())
+        return export_response(queryset, self.export_fields, file_format, self.basename)
+
+
+class FrameTypeViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = FrameType.objects.all().order_by('-created_at')
     serializer_class = FrameTypeSerializer
     filter_backends = [SearchFilter]
+    search_fields = ['name']
 
-class CategoryView(viewsets.ModelViewSet):
+class CategoryView(CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all().order_by('-created_at')
     serializer_class = CategorySerializer
     filter_backends = [SearchFilter]
+    search_fields = ['name']
 
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(CatalogCacheMixin, BulkStockMixin, ExportMixin, BatchMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all().select_related('category', 'frame_type').order_by('-created_at')
     serializer_class = ProductSerializer
     parser_classes = [parsers.MultiPartParser, parsers.FormParser]
-    filter_backends = [SearchFilter]
+    filter_backends = [ProductSearchFilter, DjangoFilterBackend]
+    filterset_class = ProductFilter
+    pagination_class = CreatedAtCursorPagination
+    export_fields = [
+        ('id', 'id'), ('name', 'name'), ('price', 'price'), ('category', 'category__name'),
+        ('frame_type', 'frame_type__name'), ('frame_material', 'frame_material'), ('size', 'size'),
+        ('weight', 'weight'), ('stock', 'stock'), ('colors', 'colors'), ('face_shapes', 'face_shapes'),
+        ('vision_problems', 'vision_problems'), ('features', 'features'), ('images', 'images'),
+        ('created_at', 'created_at'),
+    ]
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: self.list_with_facets(request, *args, **kwargs))
+
+    def list_with_facets(self, request, *args, **kwargs):
+        # Rows are read with .values() and formatted by ProductReader, which
+        # matches ProductSerializer output without building model instances
+        reader = ProductReader(request, self.get_serializer())
+        queryset = self.filter_queryset(self.get_queryset())
+        # The cursor is read from the rows, so keep the ordering columns with ?fields=
+        ordering = self.paginator.get_ordering(request, queryset, self) if self.paginator else ()
+        rows = reader.values(queryset, extra=[name.lstrip('-') for name in ordering])
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            response = self.get_paginated_response(reader.represent(page))
+        else:
+            response = Response(reader.represent(rows))
+        if request.query_params.get('facets') in ('1', 'true', 'True'):
+            facets = product_facets(self.get_facet_queryset(), request.query_params, request)
+            if isinstance(response.data, dict):
+                response.data['facets'] = facets
+            else:
+                response.data = {'results': response.data, 'facets': facets}
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: self.retrieve_row(request, *args, **kwargs))
+
+    def retrieve_row(self, request, *args, **kwargs):
+        reader = ProductReader(request, self.get_serializer())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            reader.values(self.filter_queryset(self.get_queryset())),
+            **{self.lookup_field: kwargs[lookup_url_kwarg]},
+        )
+        return Response(reader.represent([row])[0])
+
+    def get_batch_data(self, queryset):
+        reader = ProductReader(request=self.request, serializer=self.get_serializer())
+        return reader.represent(reader.values(queryset, extra=['id']))
+
+    @action(detail=False, methods=["get"])
+    def recommendations(self, request):
+        """In-stock frames for a face shape, optionally matched to the user's active prescription"""
+        params = request.query_params
+        face_shape = params.get('face_shape', '').strip().lower()
+        if face_shape not in FACE_SHAPES:
+            return Response(
+                {"error": f"face_shape must be one of: {', '.join(FACE_SHAPES)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        vision_problems = [value.lower() for value in split_values(params.get('vision_problem'))]
+        if any(problem not in VISION_PROBLEMS for problem in vision_problems):
+            return Response(
+                {"error": f"vision_problem must be among: {', '.join(VISION_PROBLEMS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            limit = min(max(int(params.get('limit', 12)), 1), 50)
+        except ValueError:
+            return Response({"error": "limit must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if params.get('use_prescription') in ('1', 'true', 'True'):
+            if not request.user.is_authenticated:
+                raise NotAuthenticated("Log in to use your prescription.")
+            prescription = Prescription.objects.filter(
+                patient=request.user, status='active'
+            ).order_by('-date_issued').first()
+            if prescription is not None:
+                for problem in vision_problems_from_prescription(prescription):
+                    if problem not in vision_problems:
+                        vision_problems.append(problem)
+
+        try:
+            ids = recommendation_index.recommend(face_shape, vision_problems, limit)
+        except IndexNotReady:
+            return Response(
+                {"error": "Recommendations are not available yet, try again shortly."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '5'},
+            )
+        reader = ProductReader(request, self.get_serializer())
+        rows = {row['id']: row for row in reader.values(Product.objects.filter(pk__in=ids), extra=['id'])}
+        results = reader.represent(rows[pk] for pk in ids if pk in rows)
+        return Response({'face_shape': face_shape, 'vision_problems': vision_problems, 'results': results})
+
+    @action(detail=True, methods=["get"])
+    def similar(self, request, pk=None):
+        """Frames closest to this one by price, size, weight, type, material, colours, features and face shapes"""
+        try:
+            limit = min(max(int(request.query_params.get('limit', 12)), 1), 50)
+        except ValueError:
+            return Response({"error": "limit must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            pk = int(pk)
+        except ValueError:
+            raise NotFound("Product not found.")
+
+        def build():
+            matches = similarity_index.similar(pk, limit)
+            if matches is None:
+                raise NotFound("Product not found.")
+            reader = ProductReader(request, self.get_serializer())
+            queryset = Product.objects.filter(pk__in=[match for match, _ in matches])
+            rows = {row['id']: row for row in reader.values(queryset, extra=['id'])}
+            matches = [(match, score) for match, score in matches if match in rows]
+            results = reader.represent(rows[match] for match, _ in matches)
+            for result, (_, score) in zip(results, matches):
+                result['similarity'] = round(score, 4)
+            return Response({'product': pk, 'results': results})
+
+        try:
+            return self.cached_response(request, build)
+        except IndexNotReady:
+            return Response(
+                {"error": "Similar products are not available yet, try again shortly."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '30'},
+            )
+
+    def get_facet_queryset(self):
+        return ProductSearchFilter().filter_queryset(self.request, self.get_queryset(), self)
+
+    @action(detail=False, methods=["get"])
+    def facets(self, request):
+        return self.cached_response(
+            request,
+            lambda: Response(product_facets(self.get_facet_queryset(), request.query_params, request)),
+        )
 
     def create(self, request, *args, **kwargs):
         mutable_data = request.data.copy()
@@ -50,45 +293,55 @@ class ProductViewSet(viewsets.ModelViewSet):
         context['request'] = self.request
         return context
 
-    @action(detail=True, methods=["patch"], url_path="update-stock", parser_classes=[JSONParser])
-    def update_stock(self, request, pk=None):
-        product = self.get_object()
-        new_stock = request.data.get("stock")
-
-        if new_stock is None:
-            return Response({"error": "Stock value is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            product.stock = int(new_stock)
-            product.save()
-            return Response({"message": "Stock updated successfully."})
-        except ValueError:
-            return Response({"error": "Invalid stock value."}, status=status.HTTP_400_BAD_REQUEST)
-        
-class AccessoryViewSet(viewsets.ModelViewSet):
+class AccessoryViewSet(CatalogCacheMixin, BulkStockMixin, ExportMixin, BatchMixin, viewsets.ModelViewSet):
     
     queryset = Accessory.objects.all().select_related('category', 'manufacturer').order_by('-created_at')
     serializer_class = AccessorySerializer
     parser_classes = [parsers.MultiPartParser, parsers.FormParser]
     filter_backends = [SearchFilter]
+    search_fields = ['name', 'description', 'category__name']
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    export_fields = [
+        ('id', 'id'), ('name', 'name'), ('price', 'price'), ('category', 'category__name'),
+        ('weight', 'weight'), ('stock', 'stock'), ('manufacturer', 'manufacturer__email'),
+        ('image', 'image'), ('created_at', 'created_at'),
+    ]
 
     def perform_create(self, serializer):
         if self.request.user.role not in ['manufacturer', 'admin']:
             raise PermissionDenied("Only manufacturers can create accessories.")
         serializer.save(manufacturer=self.request.user)
 
-    @action(detail=True, methods=["patch"], url_path="update-stock", parser_classes=[JSONParser])
-    def update_stock(self, request, pk=None):
-        accessory = self.get_object()
-        new_stock = request.data.get("stock")
 
-        if new_stock is None:
-            return Response({"error": "Stock value is required."}, status=status.HTTP_400_BAD_REQUEST)
+class CatalogImportView(APIView):
+    """Bulk import products/accessories from an uploaded CSV or JSON lines file"""
+    permission_classes = [IsAuthenticated]
+    parser_classes = [parsers.MultiPartParser]
 
-        try:
-            accessory.stock = int(new_stock)
-            accessory.save()
-            return Response({"message": "Stock updated successfully."})
-        except ValueError:
-            return Response({"error": "Invalid stock value."}, status=status.HTTP_400_BAD_REQUEST)        
\ No newline at end of file
+    def post(self, request):
+        if request.user.role not in ['manufacturer', 'admin']:
+            raise PermissionDenied("Only admins and manufacturers can import the catalog.")
+
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "A CSV or JSONL file is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        fmt = request.data.get('file_format') or ('csv' if upload.name.lower().endswith('.csv') else 'jsonl')
+        kind = request.data.get('type', PRODUCT)
+        if fmt not in ('csv', 'jsonl') or kind not in (PRODUCT, ACCESSORY):
+            return Response({"error": "Invalid file_format or type."}, status=status.HTTP_400_BAD_REQUEST)
+
+        upload.seek(0)
+        report = import_catalog_file(
+            upload.file,
+            fmt,
+            default_kind=kind,
+            dry_run=request.data.get('dry_run') in ('1', 'true', 'True'),
+            manufacturer=request.user,
+        )
+        if report['file_error']:
+            # Rows before the unreadable part were imported, the report says which
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK)